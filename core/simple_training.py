@@ -86,6 +86,27 @@ def create_sample_training_data():
     print(f"✅ Created {len(samples)} training samples")
     return samples
 
+def build_feature_encoder(training_data, version):
+    """Build the categorical vocabulary artifact used by the serving encoder"""
+    # Column positions of the vocabulary-encoded features in training samples
+    categorical_columns = {
+        'BASKET_TYPE': 1,
+        'STORE_REGION': 2,
+        'PROD_CODE_20': 6,
+        'PROD_CODE_30': 7
+    }
+    
+    # Code 0 is the unknown bucket, known values get 1..K in sorted order
+    return {
+        "format_version": 1,
+        "version": version,
+        "unknown_code": 0,
+        "vocabularies": {
+            name: sorted({row[idx] for row in training_data})
+            for name, idx in categorical_columns.items()
+        }
+    }
+
 def train_model():
     """Train the model (mock training process)"""
     print("🤖 Training Random Forest model...")
@@ -142,9 +163,12 @@ def train_model():
     print(f"   📈 Accuracy: {training_metrics['model_performance']['accuracy']:.3f}")
     print(f"   📈 F1-Score: {training_metrics['model_performance']['f1_score']:.3f}")
     
-    return model, training_metrics
+    # Build categorical vocabulary from training data
+    feature_encoder = build_feature_encoder(training_data, version="1.0.0")
+    
+    return model, training_metrics, feature_encoder
 
-def save_model_locally(model, metrics):
+def save_model_locally(model, metrics, feature_encoder):
     """Save model and metrics locally"""
     print("💾 Saving model artifacts...")
     
@@ -169,6 +193,10 @@ def save_model_locally(model, metrics):
     with open("artifacts/model_metrics.json", "w") as f:
         json.dump(metrics, f, indent=2)
     
+    # Save categorical encoder next to model info
+    with open("artifacts/feature_encoder.json", "w") as f:
+        json.dump(feature_encoder, f, indent=2)
+    
     # Create a simple model representation
     with open("artifacts/model.txt", "w") as f:
         f.write("Mock Random Forest Model for Retail Price Sensitivity\n")
@@ -198,7 +226,11 @@ def upload_to_s3():
         cmd3 = f'aws s3 cp artifacts/model.txt s3://{bucket}/artifacts/retail-price-sensitivity-model.txt'
         result3 = subprocess.run(cmd3, shell=True, capture_output=True, text=True)
         
-        if all(r.returncode == 0 for r in [result1, result2, result3]):
+        # Upload feature encoder
+        cmd4 = f'aws s3 cp artifacts/feature_encoder.json s3://{bucket}/artifacts/feature_encoder.json'
+        result4 = subprocess.run(cmd4, shell=True, capture_output=True, text=True)
+        
+        if all(r.returncode == 0 for r in [result1, result2, result3, result4]):
             print("✅ All artifacts uploaded to S3 successfully!")
             
             # List uploaded files
@@ -209,7 +241,7 @@ def upload_to_s3():
                 print(list_result.stdout)
         else:
             print("❌ Some uploads failed")
-            for i, result in enumerate([result1, result2, result3], 1):
+            for i, result in enumerate([result1, result2, result3, result4], 1):
                 if result.returncode != 0:
                     print(f"   Upload {i} error: {result.stderr}")
     
@@ -235,10 +267,10 @@ def main():
     
     try:
         # Step 1: Train model
-        model, metrics = train_model()
+        model, metrics, feature_encoder = train_model()
         
         # Step 2: Save artifacts locally  
-        save_model_locally(model, metrics)
+        save_model_locally(model, metrics, feature_encoder)
         
         # Step 3: Upload to S3
         upload_to_s3()
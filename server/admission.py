@@ -0,0 +1,409 @@
+"""
+Admission Control for Retail Price Sensitivity Prediction
+Per-request deadlines, load shedding on queueing delay and a batch concurrency limit
+"""
+
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Absolute deadline in epoch seconds, e.g. set by a gateway that already spent part of the budget
+DEADLINE_HEADER = b"x-request-deadline"
+
+# Relative budget in milliseconds, counted from arrival at this server
+TIMEOUT_HEADER = b"x-request-timeout-ms"
+
+# Scoring routes, with or without the /models/{model_version} prefix
+SINGLE_PATH = re.compile(r"^(/models/[^/]+)?/predict$")
+BATCH_PATH = re.compile(r"^(/models/[^/]+)?/predict/(batch|batch/columnar|stream|arrow)$")
+STREAM_PATH = re.compile(r"^(/models/[^/]+)?/predict/stream$")
+
+# How often the event loop probe measures scheduling lag
+LOOP_PROBE_INTERVAL = 0.05
+
+# Deadline of the request being served, read by the inference executor and micro-batcher
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline passes before its work starts"""
+
+
+def current_deadline() -> Optional[float]:
+    """Deadline of the current request in epoch seconds, None without one"""
+    return _deadline.get()
+
+
+@contextmanager
+def request_deadline(deadline: Optional[float]):
+    """Make deadline the current one for the code inside the block"""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def parse_deadline(headers, received_at: float, default_timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Deadline of a request from its headers
+
+    Args:
+        headers: Raw ASGI header pairs
+        received_at: Arrival time in epoch seconds
+        default_timeout: Budget in seconds for requests without a deadline header
+
+    Returns:
+        Deadline in epoch seconds, the earlier one when both headers are set
+
+    Raises:
+        ValueError: If a header is not a number
+    """
+    deadlines = []
+    for name, value in headers:
+        if name == DEADLINE_HEADER:
+            deadline = float(value)
+        elif name == TIMEOUT_HEADER:
+            deadline = received_at + float(value) / 1000
+        else:
+            continue
+        if not math.isfinite(deadline):
+            raise ValueError(f"Invalid {name.decode()} header")
+        deadlines.append(deadline)
+    if deadlines:
+        return min(deadlines)
+    if default_timeout:
+        return received_at + default_timeout
+    return None
+
+
+def call_before_deadline(deadline: Optional[float], fn: Callable, *args) -> Tuple[float, bool, Any]:
+    """
+    Run fn on a pool worker unless the deadline passed while the call was queued
+
+    Module-level so process-pool workers can unpickle it. Times are epoch
+    seconds, which all processes on the host share.
+
+    Returns:
+        (time the worker picked the call up, whether it had expired, fn's result)
+    """
+    started_at = time.time()
+    if deadline is not None and started_at >= deadline:
+        return started_at, True, None
+    return started_at, False, fn(*args)
+
+
+class QueueDelayMonitor:
+    """CoDel-style overload detection on one source of queueing delay
+
+    The source is overloaded once every sample for a whole interval was
+    above target: short bursts that drain within the interval never trip
+    it, a standing queue does. Without samples for an interval the queue
+    is taken to be empty.
+    """
+
+    def __init__(self, target: float, interval: float):
+        """
+        Args:
+            target: Acceptable queueing delay in seconds
+            interval: How long the delay must stay above target, in seconds
+        """
+        self.target = target
+        self.interval = interval
+
+        self._above_since: Optional[float] = None
+        self._last_sample = 0.0
+        self.last_delay = 0.0
+        self.max_delay = 0.0
+
+    def observe(self, delay: float, now: float):
+        """Record one queueing delay sample, in seconds"""
+        self._last_sample = now
+        self.last_delay = delay
+        self.max_delay = max(self.max_delay, delay)
+        if delay < self.target:
+            self._above_since = None
+        elif self._above_since is None:
+            self._above_since = now
+
+    def overloaded(self, now: float) -> bool:
+        """Whether the delay has stayed above target for an interval"""
+        if self._above_since is None or now - self._last_sample > self.interval:
+            return False
+        return now - self._above_since >= self.interval
+
+    def get_stats(self, now: float) -> Dict[str, Any]:
+        """Get the latest and largest delay seen"""
+        return {
+            "overloaded": self.overloaded(now),
+            "last_delay_ms": round(self.last_delay * 1000, 3),
+            "max_delay_ms": round(self.max_delay * 1000, 3)
+        }
+
+
+class AdmissionController:
+    """Decide which scoring requests are served, shed or dropped
+
+    Queueing delay is measured where requests actually wait: between
+    submission to the inference pool and a worker picking the call up, and
+    as event loop scheduling lag, which grows when the loop itself (body
+    parsing, serialization) is the bottleneck. While either stays above
+    target, new scoring requests get a fast 503. Batch requests also hold
+    one of a few batch slots for their whole duration, so large batches
+    cannot take every inference worker from single predictions.
+    """
+
+    SOURCES = ("executor", "event_loop")
+
+    def __init__(
+        self,
+        shed: bool = False,
+        target_ms: float = 50.0,
+        interval_ms: float = 500.0,
+        default_timeout_ms: float = 30000.0,
+        batch_max_concurrency: int = 0,
+        batch_max_waiting: int = 32,
+        retry_after: int = 1
+    ):
+        """
+        Args:
+            shed: Reject new scoring requests while queueing delay is above target
+            target_ms: Acceptable queueing delay
+            interval_ms: How long the delay must stay above target before shedding
+            default_timeout_ms: Budget of requests without a deadline header, 0 for none
+            batch_max_concurrency: Batch requests served at once, 0 for no limit
+            batch_max_waiting: Batch requests waiting for a slot before new ones are rejected
+            retry_after: Retry-After seconds sent with 503s
+        """
+        self.shed = shed
+        self.default_timeout = default_timeout_ms / 1000 if default_timeout_ms > 0 else None
+        self.batch_max_concurrency = batch_max_concurrency
+        self.batch_max_waiting = batch_max_waiting
+        self.retry_after = retry_after
+
+        self.monitors = {
+            source: QueueDelayMonitor(target_ms / 1000, interval_ms / 1000) for source in self.SOURCES
+        }
+        self._delay_histograms = {source: metrics.QUEUE_DELAY_SECONDS.labels(source) for source in self.SOURCES}
+        self._probe: Optional[asyncio.Task] = None
+
+        # Only touched from the event loop thread, so no lock is needed
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._batch_in_flight = 0
+        self._batch_waiting = 0
+
+        # Statistics
+        self.admitted = 0
+        self.shed_requests = 0
+        self.batch_rejected = 0
+        self.deadline_exceeded: Dict[str, int] = {}
+
+    async def start(self):
+        """Start the event loop lag probe"""
+        if self.batch_max_concurrency > 0:
+            self._batch_slots = asyncio.Semaphore(self.batch_max_concurrency)
+        if self._probe is None:
+            self._probe = asyncio.create_task(self._probe_loop())
+        logger.info(
+            f"Admission control started (shedding={'on' if self.shed else 'off'}, "
+            f"target_ms={self.monitors['executor'].target * 1000:g}, "
+            f"batch_max_concurrency={self.batch_max_concurrency or 'unlimited'})"
+        )
+
+    async def stop(self):
+        """Stop the event loop lag probe"""
+        if self._probe is None:
+            return
+        self._probe.cancel()
+        try:
+            await self._probe
+        except asyncio.CancelledError:
+            pass
+        self._probe = None
+
+    async def _probe_loop(self):
+        """Measure how late the event loop wakes up a sleeping task"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_PROBE_INTERVAL
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            self.observe_queue_delay("event_loop", max(loop.time() - expected, 0.0))
+
+    def observe_queue_delay(self, source: str, seconds: float):
+        """Record how long work waited before it started"""
+        self.monitors[source].observe(seconds, time.monotonic())
+        self._delay_histograms[source].observe(seconds)
+
+    def overloaded_source(self) -> Optional[str]:
+        """Source whose queueing delay stayed above target, None when neither did"""
+        now = time.monotonic()
+        for source, monitor in self.monitors.items():
+            if monitor.overloaded(now):
+                return source
+        return None
+
+    def record_deadline_exceeded(self, stage: str):
+        """Count a request dropped because its deadline passed"""
+        self.deadline_exceeded[stage] = self.deadline_exceeded.get(stage, 0) + 1
+        metrics.DEADLINE_EXCEEDED.labels(stage).inc()
+
+    async def acquire_batch_slot(self, deadline: Optional[float]) -> Optional[str]:
+        """
+        Wait for a batch slot, at most until the request's deadline
+
+        Returns:
+            None once a slot is held, otherwise why the request was turned
+            away: "batch_limit" or "deadline"
+        """
+        if self._batch_slots is None:
+            self._batch_in_flight += 1
+            return None
+        if not self._batch_slots.locked():
+            # A free slot is taken without suspending, so no other request can race for it
+            await self._batch_slots.acquire()
+        elif self._batch_waiting >= self.batch_max_waiting:
+            return "batch_limit"
+        else:
+            self._batch_waiting += 1
+            try:
+                if deadline is None:
+                    await self._batch_slots.acquire()
+                else:
+                    await asyncio.wait_for(self._batch_slots.acquire(), deadline - time.time())
+            except asyncio.TimeoutError:
+                return "deadline"
+            finally:
+                self._batch_waiting -= 1
+        self._batch_in_flight += 1
+        return None
+
+    def release_batch_slot(self):
+        """Give back a slot taken by acquire_batch_slot()"""
+        self._batch_in_flight -= 1
+        if self._batch_slots is not None:
+            self._batch_slots.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get shedding state, queueing delays, batch slot usage and rejection counts"""
+        now = time.monotonic()
+        return {
+            "load_shedding": self.shed,
+            "overloaded": self.overloaded_source() is not None,
+            "target_ms": self.monitors["executor"].target * 1000,
+            "interval_ms": self.monitors["executor"].interval * 1000,
+            "queue_delay": {source: monitor.get_stats(now) for source, monitor in self.monitors.items()},
+            "default_timeout_ms": self.default_timeout * 1000 if self.default_timeout else None,
+            "batch_max_concurrency": self.batch_max_concurrency,
+            "batch_in_flight": self._batch_in_flight,
+            "batch_waiting": self._batch_waiting,
+            "admitted": self.admitted,
+            "shed": self.shed_requests,
+            "batch_rejected": self.batch_rejected,
+            "deadline_exceeded": dict(self.deadline_exceeded)
+        }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying an AdmissionController to the scoring routes
+
+    Sets the request deadline for everything downstream, answers requests
+    that are already past it with a 504, sheds with a 503 while overloaded
+    and holds a batch slot around batch requests. Nothing else is touched,
+    so probes and admin endpoints answer under any load. Rejections happen
+    before the body is read.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        is_batch = BATCH_PATH.match(path) is not None
+        if not is_batch and SINGLE_PATH.match(path) is None:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        received_at = time.time()
+        # Streams last as long as their upload, only an explicit header bounds them
+        default_timeout = None if STREAM_PATH.match(path) else controller.default_timeout
+        try:
+            deadline = parse_deadline(scope["headers"], received_at, default_timeout)
+        except ValueError:
+            await self._reject(scope, receive, send, 400, "Invalid request deadline header")
+            return
+        if deadline is not None and deadline <= received_at:
+            controller.record_deadline_exceeded("arrival")
+            await self._reject(scope, receive, send, 504, "Request deadline exceeded")
+            return
+
+        if controller.shed:
+            source = controller.overloaded_source()
+            if source is not None:
+                controller.shed_requests += 1
+                metrics.ADMISSION_REJECTED.labels("overload").inc()
+                logger.warning(f"Shedding {path}: {source} queueing delay above target")
+                await self._reject(scope, receive, send, 503, "Server overloaded, retry later")
+                return
+
+        if is_batch:
+            refused = await controller.acquire_batch_slot(deadline)
+            if refused == "deadline":
+                controller.record_deadline_exceeded("batch_slot")
+                await self._reject(scope, receive, send, 504, "Request deadline exceeded")
+                return
+            if refused is not None:
+                controller.batch_rejected += 1
+                metrics.ADMISSION_REJECTED.labels("batch_limit").inc()
+                await self._reject(scope, receive, send, 503, "Too many batch requests, retry later")
+                return
+
+        controller.admitted += 1
+        try:
+            with request_deadline(deadline):
+                await self.app(scope, receive, send)
+        finally:
+            if is_batch:
+                controller.release_batch_slot()
+
+    async def _reject(self, scope, receive, send, status_code: int, detail: str):
+        """Answer without calling the application"""
+        headers = {"Retry-After": str(self.controller.retry_after)} if status_code == 503 else None
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+        await response(scope, receive, send)
+
+
+def create_admission_controller(inference_workers: int) -> AdmissionController:
+    """Build the admission controller from LOAD_SHED_* / REQUEST_TIMEOUT_MS / BATCH_* settings
+
+    BATCH_MAX_CONCURRENCY defaults to half the inference workers, so single
+    predictions always have workers left.
+    """
+    batch_max_concurrency = os.getenv("BATCH_MAX_CONCURRENCY", "")
+    return AdmissionController(
+        shed=os.getenv("ENABLE_LOAD_SHEDDING", "false").lower() == "true",
+        target_ms=float(os.getenv("LOAD_SHED_TARGET_MS", "50")),
+        interval_ms=float(os.getenv("LOAD_SHED_INTERVAL_MS", "500")),
+        default_timeout_ms=float(os.getenv("REQUEST_TIMEOUT_MS", "30000")),
+        batch_max_concurrency=(
+            int(batch_max_concurrency) if batch_max_concurrency else max(1, inference_workers // 2)
+        ),
+        batch_max_waiting=int(os.getenv("BATCH_MAX_WAITING", "32")),
+        retry_after=int(os.getenv("LOAD_SHED_RETRY_AFTER_SECONDS", "1"))
+    )
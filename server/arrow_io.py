@@ -0,0 +1,157 @@
+"""
+Arrow I/O for Retail Price Sensitivity Prediction
+Columnar request decoding and response encoding for Arrow IPC and Parquet bodies
+"""
+
+import logging
+from typing import Any, Dict, Sequence
+import numpy as np
+
+from batch_validation import MAX_REPORTED_ROWS
+
+logger = logging.getLogger(__name__)
+
+# Media types of the supported request bodies
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_TYPE = "application/vnd.apache.arrow.file"
+PARQUET_TYPES = ("application/vnd.apache.parquet", "application/x-parquet")
+
+# Leading bytes of Parquet and Arrow IPC file bodies
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+
+# Numeric columns and the check every value must pass, as in PredictionRequest
+NUMERIC_COLUMNS = ("SPEND", "QUANTITY")
+
+
+class UnsupportedMediaTypeError(ValueError):
+    """Raised when a body is neither Arrow IPC nor Parquet"""
+
+
+def _import_pyarrow():
+    """Import pyarrow on first use so the server runs without it"""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("pyarrow not installed. Install with: pip install pyarrow")
+    return pyarrow
+
+
+def read_table(body: bytes, content_type: str, columns: Sequence[str]):
+    """
+    Decode an Arrow IPC stream/file or Parquet body into a table
+
+    Only the requested columns are read from Parquet files.
+
+    Args:
+        body: Raw request body
+        content_type: Request Content-Type; octet-stream bodies are sniffed
+        columns: Feature columns to read
+
+    Raises:
+        UnsupportedMediaTypeError: If the body format is not recognized
+    """
+    pa = _import_pyarrow()
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    buffer = pa.py_buffer(body)
+
+    if media_type in PARQUET_TYPES or body[:4] == PARQUET_MAGIC:
+        parquet_file = pa.parquet.ParquetFile(pa.BufferReader(buffer))
+        # Missing columns are reported by table_columns
+        available = set(parquet_file.schema_arrow.names)
+        return parquet_file.read(columns=[name for name in columns if name in available])
+    if media_type == ARROW_FILE_TYPE or body[:6] == ARROW_FILE_MAGIC:
+        return pa.ipc.open_file(buffer).read_all()
+    if media_type in (ARROW_STREAM_TYPE, "application/octet-stream", ""):
+        return pa.ipc.open_stream(buffer).read_all()
+    raise UnsupportedMediaTypeError(f"Unsupported content type: {content_type}")
+
+
+def table_columns(table, feature_names: Sequence[str]) -> Dict[str, Any]:
+    """
+    Pull validated feature columns out of a table without per-row objects
+
+    Categorical columns stay Arrow arrays for lookup_arrow_codes; numeric
+    columns become NumPy arrays, zero-copy when the Arrow type allows it.
+
+    Raises:
+        ValueError: On missing columns, nulls or non-positive numeric values
+    """
+    pa = _import_pyarrow()
+    missing = [name for name in feature_names if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+
+    columns = {}
+    for name in feature_names:
+        column = table.column(name).combine_chunks()
+        if column.null_count:
+            rows = np.flatnonzero(pa.compute.is_null(column).to_numpy(zero_copy_only=False))
+            raise ValueError(f"Null {name} values at rows {rows[:MAX_REPORTED_ROWS].tolist()}")
+
+        if name in NUMERIC_COLUMNS:
+            if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+                raise ValueError(f"{name} must be numeric, got {column.type}")
+            values = column.to_numpy()
+            rows = np.flatnonzero(~(values > 0))
+            if len(rows):
+                raise ValueError(f"{name} must be greater than 0 at rows {rows[:MAX_REPORTED_ROWS].tolist()}")
+            columns[name] = values
+        else:
+            columns[name] = column
+    return columns
+
+
+def lookup_arrow_codes(values, keys: np.ndarray, codes: np.ndarray, unknown: int) -> np.ndarray:
+    """
+    Arrow counterpart of feature_encoder.lookup_codes
+
+    Dictionary-encoded columns (as Parquet usually yields) are looked up once
+    per distinct value; plain string columns go through Arrow's index_in.
+    """
+    pa = _import_pyarrow()
+    if pa.types.is_dictionary(values.type):
+        dictionary_codes = lookup_arrow_codes(values.dictionary, keys, codes, unknown)
+        return dictionary_codes[values.indices.to_numpy()]
+
+    if len(keys) == 0:
+        return np.full(len(values), unknown, dtype=np.int64)
+
+    positions = pa.compute.index_in(
+        values.cast(pa.string()), value_set=pa.array(keys.tolist(), type=pa.string())
+    )
+    positions = positions.fill_null(-1).to_numpy()
+    return np.where(positions >= 0, codes[positions], unknown)
+
+
+def predictions_to_ipc(result: Dict[str, Any], class_labels: Sequence[str]) -> bytes:
+    """
+    Encode columnar predictions as an Arrow IPC stream
+
+    The table has a dictionary-encoded prediction column, one probability
+    column per class and confidence; the model version is schema metadata.
+    """
+    pa = _import_pyarrow()
+    probabilities = result["probabilities"]
+    arrays = [
+        pa.DictionaryArray.from_arrays(
+            pa.array(result["label_indices"], type=pa.int8()), pa.array(list(class_labels))
+        )
+    ]
+    names = ["prediction"]
+    for idx, label in enumerate(class_labels):
+        arrays.append(pa.array(probabilities[:, idx]))
+        names.append(f"probability_{label}")
+    arrays.append(pa.array(result["confidence"]))
+    names.append("confidence")
+
+    table = pa.Table.from_arrays(arrays, names=names)
+    table = table.replace_schema_metadata({"model_version": str(result["model_version"])})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
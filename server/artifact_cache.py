@@ -0,0 +1,137 @@
+"""
+Artifact Cache for Retail Price Sensitivity Prediction
+Content-addressed on-disk cache of model registry artifacts
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactCache:
+    """Store artifacts by SHA-256 digest, indexed by model package ARN or version
+
+    Layout under root:
+        blobs/<sha256>        artifact content
+        refs/<key-hash>.json  key -> digest, size and metadata
+        current.json          key of the last artifact activated for a package group
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.blobs_dir = self.root / "blobs"
+        self.refs_dir = self.root / "refs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.refs_dir.mkdir(parents=True, exist_ok=True)
+
+    def _ref_path(self, key: str) -> Path:
+        """Index file for a key; keys such as ARNs are not valid file names"""
+        return self.refs_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def _write_atomic(self, path: Path, data: bytes):
+        """Write via a temp file and rename so readers never see partial files"""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def put(self, key: str, data: bytes, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Store an artifact under key
+
+        Args:
+            key: Model package ARN or version identifier
+            data: Artifact content
+            metadata: Extra JSON-serializable fields kept in the index
+
+        Returns:
+            SHA-256 digest of the content
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self.blobs_dir / digest
+        if not blob_path.exists():
+            self._write_atomic(blob_path, data)
+
+        ref = {
+            "key": key,
+            "sha256": digest,
+            "size": len(data),
+            "stored_at": time.time(),
+            "metadata": metadata or {}
+        }
+        self._write_atomic(self._ref_path(key), json.dumps(ref).encode())
+        logger.info(f"Cached artifact {key} ({len(data)} bytes, sha256={digest[:12]})")
+        return digest
+
+    def get_ref(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the index entry for key, None if not cached"""
+        try:
+            with open(self._ref_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_path(self, key: str, verify: bool = True) -> Optional[Path]:
+        """
+        Get the blob path for key after checksum validation
+
+        Corrupt blobs are removed and reported as a miss.
+        """
+        ref = self.get_ref(key)
+        if ref is None:
+            return None
+
+        blob_path = self.blobs_dir / ref["sha256"]
+        if not blob_path.exists():
+            return None
+
+        if verify and self._digest_file(blob_path) != ref["sha256"]:
+            logger.warning(f"Checksum mismatch for cached artifact {key}, discarding")
+            blob_path.unlink()
+            return None
+        return blob_path
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get validated artifact content for key, None if missing or corrupt"""
+        blob_path = self.get_path(key)
+        if blob_path is None:
+            return None
+        return blob_path.read_bytes()
+
+    def set_current(self, group: str, key: str):
+        """Record key as the artifact to load first for a package group"""
+        pointers = self._read_current()
+        pointers[group] = key
+        self._write_atomic(self.root / "current.json", json.dumps(pointers).encode())
+
+    def get_current(self, group: str) -> Optional[str]:
+        """Key of the last artifact activated for a package group"""
+        return self._read_current().get(group)
+
+    def _read_current(self) -> Dict[str, str]:
+        try:
+            with open(self.root / "current.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _digest_file(path: Path) -> str:
+        """SHA-256 of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,281 @@
+"""
+Batch Scoring CLI for Retail Price Sensitivity Prediction
+Scores CSV, NDJSON or Parquet files on a process pool, with resumable checkpoints
+
+Usage:
+    python batch_score.py baskets.parquet predictions.csv --workers 8 --resume
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+import numpy as np
+import pandas as pd
+
+from feature_encoder import lookup_codes
+from inference_executor import _init_worker, _worker_predict_columns
+from prediction_service import PredictionService
+
+logger = logging.getLogger(__name__)
+
+INPUT_FORMATS = ("csv", "ndjson", "parquet")
+OUTPUT_FORMATS = ("csv", "ndjson")
+
+# File extensions understood when --input-format/--output-format are omitted
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".parquet": "parquet",
+    ".pq": "parquet"
+}
+
+# Categorical columns are read as strings so codes like 01 keep their form
+CATEGORICAL_COLUMNS = ['BASKET_SIZE', 'BASKET_TYPE', 'STORE_REGION', 'STORE_FORMAT', 'PROD_CODE_20', 'PROD_CODE_30']
+
+
+def detect_format(path: str, allowed) -> str:
+    """Infer a file format from its extension"""
+    file_format = FORMAT_EXTENSIONS.get(Path(path).suffix.lower())
+    if file_format not in allowed:
+        raise ValueError(f"Cannot infer format of {path}, pass one of {allowed} explicitly")
+    return file_format
+
+
+def read_chunks(path: str, file_format: str, chunk_size: int,
+                id_column: Optional[str] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Read an input file as column chunks of at most chunk_size rows
+
+    Yields:
+        Feature name -> NumPy column, plus id_column when given
+    """
+    names = PredictionService.FEATURE_NAMES + ([id_column] if id_column else [])
+
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow not installed. Install with: pip install pyarrow")
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=names):
+            yield {name: batch.column(name).to_numpy(zero_copy_only=False) for name in names}
+        return
+
+    dtypes = {name: str for name in CATEGORICAL_COLUMNS}
+    if file_format == "csv":
+        reader = pd.read_csv(path, usecols=names, dtype=dtypes, chunksize=chunk_size)
+    else:
+        reader = pd.read_json(path, lines=True, dtype=dtypes, chunksize=chunk_size)
+
+    with reader:
+        for frame in reader:
+            missing = [name for name in names if name not in frame.columns]
+            if missing:
+                raise ValueError(f"Missing required columns: {missing}")
+            yield {name: frame[name].to_numpy() for name in names}
+
+
+def result_frame(result: Dict[str, Any], ids: Optional[np.ndarray], id_column: Optional[str]) -> pd.DataFrame:
+    """Flatten a columnar prediction into output rows"""
+    labels = np.array(PredictionService.CLASS_LABELS)
+    frame = pd.DataFrame({"prediction": labels[result["label_indices"]]})
+    for idx, label in enumerate(PredictionService.CLASS_LABELS):
+        frame[f"probability_{label}"] = result["probabilities"][:, idx]
+    frame["confidence"] = result["confidence"]
+    frame["model_version"] = result["model_version"]
+    if id_column:
+        frame.insert(0, id_column, ids)
+    return frame
+
+
+class Checkpoint:
+    """Progress record written after every output chunk is flushed
+
+    The output size is recorded with the chunk count, so a resumed job can
+    cut off anything written after the last checkpoint.
+    """
+
+    def __init__(self, path: str, fingerprint: Dict[str, Any]):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.chunks_done = 0
+        self.rows_done = 0
+        self.output_bytes = 0
+
+    def load(self) -> bool:
+        """Restore progress; False if there is no checkpoint for this job"""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if state.get("fingerprint") != self.fingerprint:
+            raise ValueError(
+                f"Checkpoint {self.path} belongs to a different input or chunk size, "
+                f"remove it to start over"
+            )
+        self.chunks_done = state["chunks_done"]
+        self.rows_done = state["rows_done"]
+        self.output_bytes = state["output_bytes"]
+        return True
+
+    def save(self):
+        """Write the checkpoint atomically"""
+        state = {
+            "fingerprint": self.fingerprint,
+            "chunks_done": self.chunks_done,
+            "rows_done": self.rows_done,
+            "output_bytes": self.output_bytes,
+            "updated_at": time.time()
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+def input_fingerprint(path: str, chunk_size: int) -> Dict[str, Any]:
+    """Identify an input file and chunking, so a checkpoint is only reused for the same job"""
+    stat = os.stat(path)
+    return {
+        "input": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "chunk_size": chunk_size
+    }
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    input_format: str,
+    output_format: str,
+    chunk_size: int = 10000,
+    workers: int = 1,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    id_column: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Score a file chunk by chunk on a process pool
+
+    Chunks are scored in parallel but written in input order, with at most
+    two chunks per worker in flight so memory stays bounded.
+
+    Returns:
+        Summary with rows, chunks and elapsed seconds
+    """
+    checkpoint = Checkpoint(
+        checkpoint_path or f"{output_path}.checkpoint.json",
+        input_fingerprint(input_path, chunk_size)
+    )
+    resumed = resume and checkpoint.load()
+    if resumed:
+        logger.info(f"Resuming after chunk {checkpoint.chunks_done} ({checkpoint.rows_done} rows)")
+        # Drop anything written after the last checkpoint
+        with open(output_path, "r+b") as f:
+            f.truncate(checkpoint.output_bytes)
+
+    started = time.perf_counter()
+    rows_scored = 0
+    chunks = read_chunks(input_path, input_format, chunk_size, id_column)
+
+    # Skip chunks finished by the previous run
+    for _ in range(checkpoint.chunks_done):
+        next(chunks, None)
+
+    with open(output_path, "ab" if resumed else "wb") as output, ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    ) as pool:
+        pending = deque()
+
+        def write_next():
+            nonlocal rows_scored
+            ids, future = pending.popleft()
+            frame = result_frame(future.result(), ids, id_column)
+            if output_format == "csv":
+                data = frame.to_csv(index=False, header=checkpoint.output_bytes == 0)
+            else:
+                data = frame.to_json(orient="records", lines=True)
+                data = data if data.endswith("\n") else data + "\n"
+            output.write(data.encode())
+            output.flush()
+            os.fsync(output.fileno())
+
+            rows_scored += len(frame)
+            checkpoint.chunks_done += 1
+            checkpoint.rows_done += len(frame)
+            checkpoint.output_bytes = output.tell()
+            checkpoint.save()
+            logger.info(f"Chunk {checkpoint.chunks_done} written ({checkpoint.rows_done} rows)")
+
+        for columns in chunks:
+            ids = columns.pop(id_column) if id_column else None
+            pending.append((ids, pool.submit(_worker_predict_columns, columns, lookup_codes)))
+            if len(pending) >= workers * 2:
+                write_next()
+        while pending:
+            write_next()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": checkpoint.rows_done,
+        "rows_scored": rows_scored,
+        "chunks": checkpoint.chunks_done,
+        "resumed": resumed,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows_scored / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV, NDJSON or Parquet file offline")
+    parser.add_argument("input", help="Input file with the eight feature columns")
+    parser.add_argument("output", help="Output file (.csv or .ndjson)")
+    parser.add_argument("--input-format", choices=INPUT_FORMATS, help="Default: from the input extension")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, help="Default: from the output extension")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per scoring call")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes")
+    parser.add_argument("--checkpoint", help="Checkpoint file, default <output>.checkpoint.json")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint if there is one")
+    parser.add_argument("--id-column", help="Input column copied to the output to identify rows")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO")))
+
+    try:
+        summary = score_file(
+            args.input,
+            args.output,
+            args.input_format or detect_format(args.input, INPUT_FORMATS),
+            args.output_format or detect_format(args.output, OUTPUT_FORMATS),
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume,
+            id_column=args.id_column
+        )
+    except (OSError, ValueError, ImportError) as e:
+        logger.error(f"Batch scoring failed: {str(e)}")
+        sys.exit(1)
+
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
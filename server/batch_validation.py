@@ -0,0 +1,86 @@
+"""
+Batch Validation for Retail Price Sensitivity Prediction
+Vectorized checks of columnar batches that report offending row indices
+"""
+
+import logging
+from typing import Any, Dict, List, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Offending rows listed per error
+MAX_REPORTED_ROWS = 10
+
+# Columns whose values must be strictly positive, as in PredictionRequest
+POSITIVE_COLUMNS = ("SPEND", "QUANTITY")
+
+# Columns restricted to the values the fixed encoding maps know
+ALLOWED_VALUES = {
+    "BASKET_SIZE": ("S", "M", "L"),
+    "STORE_FORMAT": ("SS", "LS")
+}
+
+
+class ColumnValidationError(ValueError):
+    """Raised when columnar batch values fail validation"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        super().__init__("; ".join(error["msg"] for error in errors))
+
+
+def _error(column: str, rows: np.ndarray, msg: str, error_type: str) -> Dict[str, Any]:
+    """Build one error entry in FastAPI's validation error layout"""
+    reported = rows[:MAX_REPORTED_ROWS].tolist()
+    return {
+        "loc": ["body", column],
+        "msg": f"{msg} at rows {reported}" + (f" and {len(rows) - len(reported)} more" if len(rows) > len(reported) else ""),
+        "type": error_type,
+        "rows": reported,
+        "count": int(len(rows))
+    }
+
+
+def validate_columns(columns: Dict[str, Sequence[Any]], feature_names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Validate a columnar batch and convert it to NumPy columns
+
+    Args:
+        columns: Feature name -> list of values, one list per feature
+        feature_names: Required feature columns
+
+    Returns:
+        Feature name -> NumPy column, ready for PredictionService.predict_columns
+
+    Raises:
+        ColumnValidationError: With every failed check and its row indices
+    """
+    lengths = {name: len(columns[name]) for name in feature_names}
+    if len(set(lengths.values())) > 1:
+        raise ColumnValidationError([{
+            "loc": ["body"],
+            "msg": f"All feature columns must have the same length, got {lengths}",
+            "type": "value_error.length_mismatch"
+        }])
+
+    arrays = {}
+    errors = []
+    for name in feature_names:
+        if name in POSITIVE_COLUMNS:
+            values = np.asarray(columns[name], dtype=np.float64 if name == "SPEND" else np.int64)
+            # NaN fails the comparison too
+            rows = np.flatnonzero(~(values > 0))
+            if len(rows):
+                errors.append(_error(name, rows, f"{name} must be greater than 0", "greater_than"))
+        else:
+            values = np.asarray(columns[name], dtype=str)
+            if name in ALLOWED_VALUES:
+                rows = np.flatnonzero(~np.isin(values, ALLOWED_VALUES[name]))
+                if len(rows):
+                    errors.append(_error(name, rows, f"{name} must be one of {list(ALLOWED_VALUES[name])}", "enum"))
+        arrays[name] = values
+
+    if errors:
+        raise ColumnValidationError(errors)
+    return arrays
@@ -0,0 +1,422 @@
+"""
+Benchmark Harness for Retail Price Sensitivity Prediction
+Load tests the API in-process (ASGI) or over a socket, plus micro-benchmarks
+
+Usage:
+    python benchmark.py --mode both --duration 10 --output bench.json
+    python benchmark.py --micro-only --output micro.json
+    python benchmark.py --compare baseline.json bench.json
+
+Server settings come from the environment, as for main.py. Runs are seeded, so
+two commits benchmarked with the same arguments send identical requests.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZES = (1, 10, 100, 1000, 10000)
+
+# Mixed workload: (weight, rows per request); one row goes to /predict
+MIXED_WORKLOAD = ((0.80, 1), (0.15, 100), (0.05, 1000))
+
+# Environment knobs recorded with every run
+CONFIG_ENV = (
+    "INFERENCE_EXECUTOR", "INFERENCE_WORKERS", "INFERENCE_ENGINE", "ENABLE_MICRO_BATCHING",
+    "ENABLE_FEATURE_CACHE", "FAST_RESPONSES", "WEB_CONCURRENCY"
+)
+
+# Values drawn for the synthetic rows, including some outside the training vocabulary
+FEATURE_VALUES = {
+    "BASKET_SIZE": ["S", "M", "L"],
+    "BASKET_TYPE": ["BASIC", "MIXED", "PREMIUM", "Full Shop", "Top Up"],
+    "STORE_REGION": ["BIRMINGHAM", "LONDON", "MANCHESTER", "E02", "W01"],
+    "STORE_FORMAT": ["SS", "LS"],
+    "PROD_CODE_20": ["CLOTHING", "ELECTRONICS", "FOOD", "D00003"],
+    "PROD_CODE_30": ["BASIC", "DAIRY", "FRESH", "FROZEN", "PREMIUM", "G00016"]
+}
+
+
+def synthetic_rows(n_rows: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Reproducible feature dictionaries in the PredictionRequest layout"""
+    rng = np.random.default_rng(seed)
+    columns = {name: rng.choice(values, n_rows).tolist() for name, values in FEATURE_VALUES.items()}
+    columns["SPEND"] = np.round(rng.gamma(2.0, 60.0, n_rows) + 0.01, 2).tolist()
+    columns["QUANTITY"] = rng.integers(1, 40, n_rows).tolist()
+    return [{name: columns[name][idx] for name in columns} for idx in range(n_rows)]
+
+
+def request_for(rows: List[Dict[str, Any]]) -> Tuple[str, Any]:
+    """Endpoint and JSON body scoring the given rows"""
+    if len(rows) == 1:
+        return "/predict", rows[0]
+    return "/predict/batch", rows
+
+
+def build_workloads(batch_sizes, seed: int = 42) -> Dict[str, Callable[[np.random.Generator], Tuple[str, Any, int]]]:
+    """
+    Request factories per workload name
+
+    Bodies are built up front so the load generator spends its time sending.
+    Each factory returns (path, body, rows).
+    """
+    pool = synthetic_rows(max(max(batch_sizes), 1000) + 1000, seed)
+    bodies = {size: request_for(pool[:size]) for size in set(batch_sizes) | {size for _, size in MIXED_WORKLOAD}}
+    singles = [request_for([row]) for row in pool[:1000]]
+
+    def fixed(size):
+        def make(rng):
+            if size == 1:
+                return (*singles[rng.integers(len(singles))], 1)
+            return (*bodies[size], size)
+        return make
+
+    def mixed(rng):
+        weights = [weight for weight, _ in MIXED_WORKLOAD]
+        size = MIXED_WORKLOAD[rng.choice(len(MIXED_WORKLOAD), p=weights)][1]
+        return fixed(size)(rng)
+
+    workloads = {"single": fixed(1)}
+    for size in batch_sizes:
+        workloads[f"batch_{size}"] = fixed(size)
+    workloads["mixed"] = mixed
+    return workloads
+
+
+def summarize(latencies: List[float], rows: int, errors: int, elapsed: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles of one workload run"""
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(latencies_ms.max()), 3) if len(latencies_ms) else 0.0
+    }
+
+
+async def run_workload(client, make_request, concurrency: int, duration: float,
+                       warmup: float, seed: int) -> Dict[str, Any]:
+    """
+    Drive one workload with a fixed number of concurrent clients
+
+    Requests finished during the warm-up period are not counted.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    latencies: List[float] = []
+    counts = {"rows": 0, "errors": 0}
+
+    async def client_loop(worker_id: int):
+        rng = np.random.default_rng(seed + worker_id)
+        while loop.time() < deadline:
+            path, body, n_rows = make_request(rng)
+            sent = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200
+            except Exception as e:
+                logger.debug(f"Request failed: {str(e)}")
+                ok = False
+            latency = time.perf_counter() - sent
+
+            if loop.time() < measure_from:
+                continue
+            if ok:
+                latencies.append(latency)
+                counts["rows"] += n_rows
+            else:
+                counts["errors"] += 1
+
+    await asyncio.gather(*(client_loop(idx) for idx in range(concurrency)))
+    return summarize(latencies, counts["rows"], counts["errors"], loop.time() - measure_from)
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Resident set size of a process in MB (Linux /proc), None elsewhere"""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def process_tree_rss_mb(pid: int) -> Optional[float]:
+    """RSS of a process and its children, e.g. uvicorn workers or the process executor"""
+    total = rss_mb(pid)
+    if total is None:
+        return None
+    try:
+        children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    except OSError:
+        children = []
+    for child in children:
+        total += process_tree_rss_mb(int(child)) or 0.0
+    return round(total, 1)
+
+
+async def run_http(client, workloads, names, args, rss: Callable[[], Optional[float]]) -> Dict[str, Any]:
+    """Run the selected workloads one after the other against a client"""
+    results = {"rss_mb_start": rss()}
+    for name in names:
+        logger.info(f"Running {name} ({args.concurrency} clients, {args.duration:g}s)")
+        results[name] = await run_workload(
+            client, workloads[name], args.concurrency, args.duration, args.warmup, args.seed
+        )
+        results[name]["rss_mb"] = rss()
+    return results
+
+
+async def wait_ready(client, timeout: float = 30.0):
+    """Poll /ready until the model is loaded and warmed up"""
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {client.base_url} did not become ready")
+
+
+async def bench_inprocess(workloads, names, args) -> Dict[str, Any]:
+    """Benchmark the app through httpx's ASGI transport, without a socket"""
+    import httpx
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60.0) as client:
+            await wait_ready(client)
+            return await run_http(client, workloads, names, args, rss_mb)
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def bench_socket(workloads, names, args) -> Dict[str, Any]:
+    """Benchmark over TCP, against --url or a uvicorn started for the run"""
+    import httpx
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(args.server_workers), "--log-level", "warning"],
+            cwd=Path(__file__).parent
+        )
+        base_url = f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+            await wait_ready(client)
+
+            pid = server.pid if server is not None else args.pid
+            return await run_http(
+                client, workloads, names, args, lambda: process_tree_rss_mb(pid) if pid else None
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def time_call(fn: Callable[[], Any], min_seconds: float = 0.2, repeats: int = 5) -> float:
+    """Best per-call time in microseconds over several timed loops"""
+    fn()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - started >= min_seconds / repeats:
+            break
+        loops *= 2
+
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best * 1e6
+
+
+def _benchmark_models(loader) -> Dict[str, Any]:
+    """Models to time: the built-in ones, a random forest and its flat compilation"""
+    models = {
+        "MockModel": loader._load_mock_model(),
+        "RegistryModel": loader._create_registry_model({}, {})
+    }
+    try:
+        from sklearn.ensemble import RandomForestClassifier
+        from tree_engine import compile_model
+    except ImportError:
+        logger.warning("scikit-learn not installed, skipping tree model micro-benchmarks")
+        return models
+
+    rng = np.random.default_rng(42)
+    X = np.column_stack([rng.integers(0, 4, 5000) for _ in range(4)] + [
+        rng.gamma(2.0, 60.0, 5000), rng.integers(1, 40, 5000), rng.integers(0, 4, 5000), rng.integers(0, 6, 5000)
+    ]).astype(np.float64)
+    y = np.digitize(X[:, 4] * 0.34 + X[:, 5] * 0.18, [75, 200])
+    forest = RandomForestClassifier(n_estimators=100, max_depth=12, random_state=42).fit(X, y)
+    models["RandomForestClassifier"] = forest
+    models["FlatForest"] = compile_model(forest)
+    return models
+
+
+def bench_micro(batch_sizes, seed: int = 42) -> Dict[str, Any]:
+    """Time PredictionService preprocessing and predict_proba of each model class"""
+    from model_loader import ModelLoader
+    from prediction_service import PredictionService
+
+    loader = ModelLoader()
+    service = PredictionService(loader)
+    rows = synthetic_rows(max(batch_sizes), seed)
+
+    results = {"preprocess": {}, "models": {}}
+    results["preprocess"]["_preprocess_single_us"] = round(time_call(lambda: service._preprocess(rows[0])), 2)
+    for size in batch_sizes:
+        batch = rows[:size]
+        results["preprocess"][f"_preprocess_many_{size}_us"] = round(
+            time_call(lambda: service._preprocess_many(batch)), 2
+        )
+
+    X = service._preprocess_many(rows)
+    for name, model in _benchmark_models(loader).items():
+        results["models"][name] = {
+            f"predict_proba_{size}_us": round(time_call(lambda: model.predict_proba(X[:size])), 2)
+            for size in batch_sizes
+        }
+    return results
+
+
+def run_metadata(args) -> Dict[str, Any]:
+    """Commit, versions and settings the results were produced with"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).parent, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {name: os.environ[name] for name in CONFIG_ENV if name in os.environ},
+        "args": {key: value for key, value in vars(args).items() if key != "compare"}
+    }
+
+
+def compare(baseline_path: str, candidate_path: str) -> List[str]:
+    """Throughput and p99 of a candidate run relative to a baseline run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    lines = [f"{'mode':<10} {'workload':<12} {'rps':>12} {'p99 ms':>12} {'rps x':>7} {'p99 x':>7}"]
+    for mode, workloads in candidate.get("http", {}).items():
+        for name, result in workloads.items():
+            base = baseline.get("http", {}).get(mode, {}).get(name)
+            if not isinstance(result, dict) or not isinstance(base, dict):
+                continue
+            rps_ratio = result["requests_per_second"] / base["requests_per_second"] if base["requests_per_second"] else 0.0
+            p99_ratio = result["p99_ms"] / base["p99_ms"] if base["p99_ms"] else 0.0
+            lines.append(
+                f"{mode:<10} {name:<12} {result['requests_per_second']:>12.1f} {result['p99_ms']:>12.3f} "
+                f"{rps_ratio:>7.2f} {p99_ratio:>7.2f}"
+            )
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the prediction API and its hot paths")
+    parser.add_argument("--mode", choices=("inprocess", "socket", "both"), default="inprocess")
+    parser.add_argument("--workloads", default="single,batch,mixed",
+                        help="Comma-separated: single, batch (every --batch-sizes entry), mixed")
+    parser.add_argument("--batch-sizes", default=",".join(map(str, DEFAULT_BATCH_SIZES)),
+                        help="Rows per /predict/batch request")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per workload")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each workload")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="Benchmark a running server instead of starting uvicorn (socket mode)")
+    parser.add_argument("--pid", type=int, help="PID of the --url server, to report its RSS")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn workers started for socket mode")
+    parser.add_argument("--micro", action="store_true", help="Also run the micro-benchmarks")
+    parser.add_argument("--micro-only", action="store_true", help="Only run the micro-benchmarks")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Print the ratios between two result files and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO")))
+
+    if args.compare:
+        print("\n".join(compare(*args.compare)))
+        return
+
+    batch_sizes = sorted({int(size) for size in args.batch_sizes.split(",")})
+    selected = args.workloads.split(",")
+    names = (["single"] if "single" in selected else []) + \
+            ([f"batch_{size}" for size in batch_sizes] if "batch" in selected else []) + \
+            (["mixed"] if "mixed" in selected else [])
+
+    results = {"meta": run_metadata(args), "http": {}}
+    if not args.micro_only:
+        workloads = build_workloads(batch_sizes, args.seed)
+        if args.mode in ("inprocess", "both"):
+            results["http"]["inprocess"] = asyncio.run(bench_inprocess(workloads, names, args))
+        if args.mode in ("socket", "both"):
+            results["http"]["socket"] = asyncio.run(bench_socket(workloads, names, args))
+    if args.micro or args.micro_only:
+        results["micro"] = bench_micro(batch_sizes, args.seed)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        logger.info(f"Results written to {args.output}")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
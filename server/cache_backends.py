@@ -0,0 +1,274 @@
+"""
+Shared Cache Backends for Retail Price Sensitivity Prediction
+Second-level prediction cache shared across workers and replicas
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_MAX_VARIABLES = 500
+
+# Rows written between purges of expired SQLite entries
+SQLITE_PURGE_INTERVAL = 10000
+
+
+class CacheBackend(ABC):
+    """Key/value store for serialized predictions"""
+
+    @abstractmethod
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """Fetch values for keys in one round trip, None for misses"""
+
+    @abstractmethod
+    def set_many(self, items: Sequence[Tuple[str, bytes]], ttl_seconds: float):
+        """Store values in one round trip with a common TTL"""
+
+    def close(self):
+        """Release backend connections"""
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis-protocol backend using MGET and a non-transactional pipeline
+
+    Socket timeouts are short so that a hung server raises, and the shared
+    cache falls back to scoring, instead of holding inference workers.
+    """
+
+    def __init__(self, url: str, socket_timeout: float = 0.1, connect_timeout: float = 0.1):
+        """
+        Args:
+            url: redis:// URL
+            socket_timeout: Seconds a command may wait for the server
+            connect_timeout: Seconds a connection attempt may take
+        """
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("redis not installed. Install with: pip install redis")
+
+        self.client = redis.Redis.from_url(
+            url,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=connect_timeout
+        )
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return self.client.mget(keys)
+
+    def set_many(self, items: Sequence[Tuple[str, bytes]], ttl_seconds: float):
+        if not items:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        ttl_ms = max(1, int(ttl_seconds * 1000))
+        for key, value in items:
+            pipe.set(key, value, px=ttl_ms)
+        pipe.execute()
+
+    def close(self):
+        self.client.close()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """File-backed local stand-in for the shared cache"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes_since_purge = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prediction_cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        found: Dict[str, bytes] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                chunk = keys[start:start + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM prediction_cache "
+                    f"WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*chunk, now)
+                )
+                found.update(rows)
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items: Sequence[Tuple[str, bytes]], ttl_seconds: float):
+        if not items:
+            return
+        expires_at = time.time() + ttl_seconds
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO prediction_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items]
+            )
+            self._conn.execute("COMMIT")
+
+            # Purge expired rows now and then rather than on every write
+            self._writes_since_purge += len(items)
+            if self._writes_since_purge >= SQLITE_PURGE_INTERVAL:
+                self._conn.execute("DELETE FROM prediction_cache WHERE expires_at <= ?", (time.time(),))
+                self._writes_since_purge = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SharedPredictionCache:
+    """Second-level prediction cache with version-namespaced keys and compact values"""
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        class_labels: Sequence[str],
+        namespace: str = "retail-pred",
+        ttl_seconds: float = 3600.0
+    ):
+        """
+        Args:
+            backend: Storage backend
+            class_labels: Class order used to pack probabilities
+            namespace: Key prefix shared by every replica of this service
+            ttl_seconds: Lifetime of a cached prediction
+        """
+        self.backend = backend
+        self.class_labels = list(class_labels)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+
+        # Label index followed by one float64 probability per class
+        self._value_format = struct.Struct(f"<B{len(self.class_labels)}d")
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _backend_key(self, key: Tuple) -> str:
+        """Namespace a canonical PredictionCache key by service and model version
+
+        Features are hashed from their JSON encoding, which keeps values
+        apart whatever characters client strings contain.
+        """
+        model_version, *features = key
+        digest = hashlib.sha256(json.dumps(features, separators=(",", ":")).encode()).hexdigest()
+        return f"{self.namespace}:{model_version}:{digest}"
+
+    def _encode(self, result: Dict[str, Any]) -> bytes:
+        """Pack a prediction into label index and probabilities"""
+        probability = result["probability"]
+        return self._value_format.pack(
+            self.class_labels.index(result["prediction"]),
+            *(probability[label] for label in self.class_labels)
+        )
+
+    def _decode(self, value: bytes, model_version: str) -> Dict[str, Any]:
+        """Rebuild a prediction dictionary from its packed form"""
+        label_idx, *probs = self._value_format.unpack(value)
+        return {
+            "prediction": self.class_labels[label_idx],
+            "probability": dict(zip(self.class_labels, probs)),
+            "confidence": float(np.round(max(probs), 4)),
+            "model_version": model_version
+        }
+
+    def get_many(self, keys: Sequence[Tuple]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Look up predictions for canonical keys
+
+        Backend failures are logged and reported as misses so that scoring
+        never depends on the shared tier being available.
+        """
+        try:
+            values = self.backend.get_many([self._backend_key(key) for key in keys])
+        except Exception as e:
+            self.errors += 1
+            self.misses += len(keys)
+            logger.warning(f"Shared cache lookup failed: {str(e)}")
+            return [None] * len(keys)
+
+        results = []
+        for key, value in zip(keys, values):
+            if value is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(self._decode(value, key[0]))
+        return results
+
+    def set_many(self, keys: Sequence[Tuple], results: Sequence[Dict[str, Any]]):
+        """Store predictions, ignoring backend failures"""
+        try:
+            self.backend.set_many(
+                [(self._backend_key(key), self._encode(result)) for key, result in zip(keys, results)],
+                self.ttl_seconds
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache store failed: {str(e)}")
+
+    def close(self):
+        """Release backend connections"""
+        self.backend.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/error counters"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "namespace": self.namespace,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors
+        }
+
+
+def create_shared_cache(class_labels: Sequence[str]) -> Optional[SharedPredictionCache]:
+    """Build the shared cache from SHARED_CACHE_* settings"""
+    backend_name = os.getenv("SHARED_CACHE_BACKEND", "none").lower()
+    if backend_name == "none":
+        return None
+
+    url = os.getenv("SHARED_CACHE_URL", "")
+    if backend_name == "redis":
+        backend = RedisCacheBackend(
+            url or "redis://localhost:6379/0",
+            socket_timeout=float(os.getenv("SHARED_CACHE_SOCKET_TIMEOUT_MS", "100")) / 1000,
+            connect_timeout=float(os.getenv("SHARED_CACHE_CONNECT_TIMEOUT_MS", "100")) / 1000
+        )
+    elif backend_name == "sqlite":
+        backend = SQLiteCacheBackend(url or "/tmp/prediction_cache.sqlite")
+    else:
+        raise ValueError(f"Unknown shared cache backend: {backend_name}")
+
+    cache = SharedPredictionCache(
+        backend,
+        class_labels,
+        namespace=os.getenv("SHARED_CACHE_NAMESPACE", "retail-pred"),
+        ttl_seconds=float(os.getenv("SHARED_CACHE_TTL", "3600"))
+    )
+    logger.info(f"Shared prediction cache enabled ({backend_name}, namespace={cache.namespace})")
+    return cache
@@ -0,0 +1,145 @@
+"""
+Feature Encoder for Retail Price Sensitivity Prediction
+Deterministic categorical encoding backed by a versioned vocabulary artifact
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Artifact layout version understood by this loader
+ENCODER_FORMAT_VERSION = 1
+
+# Code reserved for values not seen during training
+UNKNOWN_CODE = 0
+
+
+def lookup_codes(values: Sequence[Any], keys: np.ndarray, codes: np.ndarray, unknown: int) -> np.ndarray:
+    """
+    Vectorized lookup of values in a sorted key table
+
+    Args:
+        values: Column of raw values
+        keys: Sorted array of known values
+        codes: Codes aligned with keys
+        unknown: Code returned for values missing from keys
+
+    Returns:
+        Integer code array with one entry per value
+    """
+    values = np.asarray(values, dtype=str)
+    if len(keys) == 0:
+        return np.full(len(values), unknown, dtype=np.int64)
+
+    positions = np.searchsorted(keys, values)
+    positions = np.minimum(positions, len(keys) - 1)
+    found = keys[positions] == values
+    return np.where(found, codes[positions], unknown)
+
+
+def build_lookup_table(mapping: Dict[str, int]):
+    """Build sorted (keys, codes) arrays for lookup_codes from a value->code mapping"""
+    keys = sorted(mapping)
+    return (
+        np.array(keys, dtype=str),
+        np.array([mapping[key] for key in keys], dtype=np.int64)
+    )
+
+
+class FeatureEncoder:
+    """Encode categorical features with a fixed, persisted vocabulary"""
+
+    # Categorical features encoded from a training vocabulary
+    CATEGORICAL_FEATURES = ['BASKET_TYPE', 'STORE_REGION', 'PROD_CODE_20', 'PROD_CODE_30']
+
+    def __init__(self, vocabularies: Dict[str, List[str]], version: str = "1.0.0"):
+        self.version = version
+        self.vocabularies = {
+            name: sorted(set(vocabularies.get(name, [])))
+            for name in self.CATEGORICAL_FEATURES
+        }
+
+        # Known values get codes 1..K, UNKNOWN_CODE is the single unknown bucket
+        self.tables = {
+            name: {value: code for code, value in enumerate(vocab, start=UNKNOWN_CODE + 1)}
+            for name, vocab in self.vocabularies.items()
+        }
+        self._lookup = {
+            name: build_lookup_table(table)
+            for name, table in self.tables.items()
+        }
+
+    def encode(self, name: str, values: Sequence[Any], lookup=lookup_codes) -> np.ndarray:
+        """
+        Encode a column of categorical values
+
+        Args:
+            name: Feature name
+            values: Raw values for the whole batch
+            lookup: Table lookup with the lookup_codes signature, e.g. one for Arrow arrays
+
+        Returns:
+            Integer code array
+        """
+        keys, codes = self._lookup[name]
+        return lookup(values, keys, codes, UNKNOWN_CODE)
+
+    def fingerprint(self) -> str:
+        """Digest of the vocabularies; encoders with equal fingerprints encode identically"""
+        payload = json.dumps(self.vocabularies, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def encode_value(self, name: str, value: Any) -> int:
+        """Encode a single categorical value"""
+        return self.tables[name].get(value, UNKNOWN_CODE)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize encoder to the artifact format"""
+        return {
+            "format_version": ENCODER_FORMAT_VERSION,
+            "version": self.version,
+            "unknown_code": UNKNOWN_CODE,
+            "vocabularies": self.vocabularies
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureEncoder":
+        """Build encoder from an artifact dictionary"""
+        format_version = data.get("format_version")
+        if format_version != ENCODER_FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature encoder format: {format_version}")
+        if data.get("unknown_code", UNKNOWN_CODE) != UNKNOWN_CODE:
+            raise ValueError(f"Unsupported unknown code: {data.get('unknown_code')}")
+        return cls(data.get("vocabularies", {}), version=str(data.get("version", "unknown")))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "FeatureEncoder":
+        """Load encoder artifact from a JSON file"""
+        with open(path) as f:
+            encoder = cls.from_dict(json.load(f))
+        logger.info(f"Feature encoder {encoder.version} loaded from {path}")
+        return encoder
+
+    def save(self, path: Union[str, Path]):
+        """Write encoder artifact to a JSON file"""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def load_feature_encoder(path: Optional[Union[str, Path]]) -> FeatureEncoder:
+    """
+    Load the encoder artifact, falling back to an empty vocabulary
+
+    With an empty vocabulary every categorical value lands in the unknown
+    bucket, which is still deterministic across processes.
+    """
+    if path and Path(path).exists():
+        return FeatureEncoder.load(path)
+
+    logger.warning(f"Feature encoder artifact not found at {path}, encoding all categories as unknown")
+    return FeatureEncoder({}, version="empty")
@@ -13,7 +13,8 @@ def check_health():
         
         if response.status_code == 200:
             data = response.json()
-            if data.get("status") == "healthy":
+            # "loading" while the model loads in the background after startup
+            if data.get("status") in ("healthy", "loading"):
                 sys.exit(0)  # Healthy
         
         sys.exit(1)  # Unhealthy
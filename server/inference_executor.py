@@ -0,0 +1,279 @@
+"""
+Inference Executor for Retail Price Sensitivity Prediction
+Runs CPU-bound model inference off the event loop with bounded queueing
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from model_loader import ModelLoader
+from prediction_cache import create_prediction_cache
+from cache_backends import create_shared_cache
+from prediction_service import PredictionService
+from profiler import start_background_profile
+from admission import DeadlineExceededError, call_before_deadline, current_deadline
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Prediction service owned by each process-pool worker
+_worker_service: Optional[PredictionService] = None
+
+
+def _init_worker():
+    """Load the model once per process-pool worker"""
+    global _worker_service
+    model_loader = ModelLoader()
+    _worker_service = PredictionService(
+        model_loader,
+        cache=create_prediction_cache(),
+        shared_cache=create_shared_cache(PredictionService.CLASS_LABELS)
+    )
+    
+    # Each worker follows the model package group on its own
+    poll_interval = float(os.getenv("MODEL_POLL_INTERVAL_SECONDS", "0"))
+    if poll_interval > 0:
+        model_loader.start_polling(poll_interval)
+    
+    # Workers exit through multiprocessing, which skips atexit but runs finalizers
+    multiprocessing.util.Finalize(None, metrics.mark_process_dead, exitpriority=0)
+    logger.info(f"Inference worker {os.getpid()} ready")
+
+
+def _worker_predict_many(features_list: List[Dict[str, Any]], version: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Score a batch inside a process-pool worker"""
+    return _worker_service.predict_many(features_list, version)
+
+
+def _worker_predict_columns(columns: Dict[str, Any], lookup: Callable,
+                            version: Optional[str] = None) -> Dict[str, Any]:
+    """Score a columnar batch inside a process-pool worker"""
+    return _worker_service.predict_columns(columns, lookup, version)
+
+
+def _worker_predict_uncached(features_list: List[Dict[str, Any]], version: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Score a batch inside a process-pool worker, bypassing the caches"""
+    return _worker_service.predict_uncached(features_list, version)
+
+
+def _worker_warm_up(features_list: List[Dict[str, Any]]) -> float:
+    """Warm up a process-pool worker"""
+    return _worker_service.warm_up(features_list)
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the inference queue is full and the request is rejected"""
+
+
+class InferenceExecutor:
+    """Dispatch inference to a bounded thread or process pool"""
+
+    KINDS = ("thread", "process")
+
+    def __init__(
+        self,
+        prediction_service: PredictionService,
+        kind: str = "thread",
+        max_workers: int = 4,
+        max_queue: int = 64
+    ):
+        """
+        Args:
+            prediction_service: Service used by the thread pool
+            kind: "thread" for GIL-releasing models, "process" for pure-Python ones
+            max_workers: Number of pool workers
+            max_queue: Calls allowed to wait for a free worker before rejecting
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown executor kind: {kind}. Expected one of {self.KINDS}")
+
+        self.prediction_service = prediction_service
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        self._rejected = 0
+        self._expired = 0
+        self._queue_delay_listeners: List[Callable[[float], None]] = []
+
+    def add_queue_delay_listener(self, callback: Callable[[float], None]):
+        """Register a callback receiving how long each call waited for a worker, in seconds"""
+        self._queue_delay_listeners.append(callback)
+
+    def start(self):
+        """Create the worker pool"""
+        if self._executor is not None:
+            return
+        self._executor = self._create_executor()
+        logger.info(
+            f"Inference executor started ({self.kind}, max_workers={self.max_workers}, "
+            f"max_queue={self.max_queue})"
+        )
+
+    def _create_executor(self) -> Executor:
+        """Build the pool for the configured executor kind"""
+        if self.kind == "process":
+            # Workers build their own ModelLoader, so they never inherit loop state
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inference"
+        )
+
+    def recycle(self):
+        """Replace process-pool workers so they load the newest model
+
+        Calls already submitted finish on the old workers. Thread pools share
+        the server's ModelLoader and need no recycling.
+        """
+        if self.kind != "process" or self._executor is None:
+            return
+        old_executor = self._executor
+        self._executor = self._create_executor()
+        old_executor.shutdown(wait=False)
+        logger.info("Inference workers recycled")
+
+    def shutdown(self):
+        """Shut down the worker pool"""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        logger.info("Inference executor stopped")
+
+    async def predict_many(self, features_list: List[Dict[str, Any]],
+                           version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Score a batch on the worker pool
+
+        Args:
+            features_list: List of customer transaction feature dictionaries
+            version: Registry version to score with, the active model by default
+
+        Returns:
+            List of prediction dictionaries, in input order
+
+        Raises:
+            ExecutorSaturatedError: If all workers are busy and the queue is full
+            DeadlineExceededError: If the request deadline passed before a worker was free
+        """
+        if self.kind == "process":
+            return await self._submit(_worker_predict_many, features_list, version)
+        return await self._submit(self.prediction_service.predict_many, features_list, version)
+
+    async def predict_columns(self, columns: Dict[str, Any], lookup: Callable,
+                              version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Score a columnar batch on the worker pool
+
+        Args:
+            columns: Feature name -> column of values
+            lookup: Module-level categorical lookup, so it can be sent to process workers
+            version: Registry version to score with, the active model by default
+
+        Returns:
+            Columnar prediction dictionary from PredictionService.predict_columns
+
+        Raises:
+            ExecutorSaturatedError: If all workers are busy and the queue is full
+            DeadlineExceededError: If the request deadline passed before a worker was free
+        """
+        if self.kind == "process":
+            return await self._submit(_worker_predict_columns, columns, lookup, version)
+        return await self._submit(self.prediction_service.predict_columns, columns, lookup, version)
+
+    async def warm_up(self, features_list: List[Dict[str, Any]]) -> List[float]:
+        """
+        Run PredictionService.warm_up once per worker, all at the same time
+
+        Concurrent calls make the process pool start every worker, each
+        loading its model, before the server reports ready.
+
+        Returns:
+            Seconds each call took
+        """
+        fn = _worker_warm_up if self.kind == "process" else self.prediction_service.warm_up
+        return list(await asyncio.gather(*(
+            self._submit(fn, features_list) for _ in range(self.max_workers)
+        )))
+
+    async def start_worker_profile(self, seconds: float, interval: float, output_path: str) -> int:
+        """
+        Start sampling one process-pool worker in the background
+
+        Returns:
+            PID of the sampled worker; its collapsed stacks land in output_path
+            once the capture is over
+        """
+        if self.kind != "process":
+            raise ValueError("Worker profiling needs the process executor")
+        return await self._submit(start_background_profile, seconds, interval, output_path)
+
+    async def _submit(self, fn: Callable, *args):
+        """Run fn on the pool unless the queue is full or the request deadline has passed
+
+        The deadline is checked again when a worker picks the call up, so
+        work that expired while queued is dropped without running.
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference executor not started")
+
+        deadline = current_deadline()
+        if deadline is not None and time.time() >= deadline:
+            self._expired += 1
+            metrics.DEADLINE_EXCEEDED.labels("executor").inc()
+            raise DeadlineExceededError("Request deadline passed before inference")
+
+        # Only touched from the event loop thread, so no lock is needed
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            metrics.EXECUTOR_REJECTED.inc()
+            raise ExecutorSaturatedError(
+                f"Inference queue full ({self._in_flight} calls in flight)"
+            )
+
+        self._in_flight += 1
+        metrics.update_executor(self._in_flight, self.max_workers)
+        try:
+            loop = asyncio.get_running_loop()
+            submitted_at = time.time()
+            started_at, expired, result = await loop.run_in_executor(
+                self._executor, call_before_deadline, deadline, fn, *args
+            )
+        finally:
+            self._in_flight -= 1
+            metrics.update_executor(self._in_flight, self.max_workers)
+
+        for callback in self._queue_delay_listeners:
+            callback(max(started_at - submitted_at, 0.0))
+        if expired:
+            self._expired += 1
+            metrics.DEADLINE_EXCEEDED.labels("executor").inc()
+            raise DeadlineExceededError(
+                f"Request deadline passed after {(started_at - submitted_at) * 1000:.0f}ms waiting for a worker"
+            )
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get executor occupancy, rejection and expiry counts"""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": max(0, self._in_flight - self.max_workers),
+            "rejected": self._rejected,
+            "expired": self._expired
+        }
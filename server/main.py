@@ -3,18 +3,47 @@ FastAPI Application for Retail Price Sensitivity Prediction
 Serves ML model predictions via REST API for MLOps pipeline
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import cProfile
+import hmac
+import json
 import logging
 import os
+import signal
+import tempfile
+import threading
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 
+from feature_encoder import lookup_codes
 from model_loader import ModelLoader
+from model_pool import ModelVersionNotFoundError
 from prediction_service import PredictionService
+from prediction_cache import create_prediction_cache
+from cache_backends import create_shared_cache
+import metrics
+from micro_batcher import MicroBatcher
+from admission import AdmissionMiddleware, DeadlineExceededError, create_admission_controller
+from inference_executor import ExecutorSaturatedError, InferenceExecutor, _init_worker, _worker_predict_uncached
+from stream_scoring import DuplexStreamingResponse, score_ndjson, spool_stream
+from batch_validation import ColumnValidationError, validate_columns
+from warmup import Warmup
+from shadow import ShadowScorer
+from traffic_capture import TrafficCapture, TrafficCaptureMiddleware
+from profiler import (
+    MAX_PROFILE_SECONDS, ProfileStore, RequestProfilingMiddleware, SamplingProfiler, pstats_dump
+)
+from arrow_io import (
+    ARROW_STREAM_TYPE, UnsupportedMediaTypeError,
+    lookup_arrow_codes, predictions_to_ipc, read_table, table_columns
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,11 +53,29 @@ log_level = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(level=getattr(logging, log_level))
 logger = logging.getLogger(__name__)
 
+# Optional orjson-backed responses; hot endpoints then skip response-model re-validation
+fast_responses = os.getenv("FAST_RESPONSES", "false").lower() == "true"
+if fast_responses:
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        raise ImportError("orjson not installed. Install with: pip install orjson")
+json_response_class = ORJSONResponse if fast_responses else JSONResponse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving at once; the model is loaded and warmed up in the background"""
+    await start_inference()
+    yield
+    await stop_inference()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Retail Price Sensitivity Prediction API",
     description="ML model serving for retail customer price sensitivity prediction",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=json_response_class,
+    lifespan=lifespan
 )
 
 # CORS middleware for web frontend
@@ -40,9 +87,259 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize model loader and prediction service
-model_loader = ModelLoader()
-prediction_service = PredictionService(model_loader)
+# Initialize model loader and prediction service; the model itself loads during startup
+model_loader = ModelLoader(load=False)
+prediction_service = PredictionService(
+    model_loader,
+    cache=create_prediction_cache(),
+    shared_cache=create_shared_cache(PredictionService.CLASS_LABELS)
+)
+
+# Inference runs on a bounded pool so the event loop (and /health) stays responsive
+inference_executor = InferenceExecutor(
+    prediction_service,
+    kind=os.getenv("INFERENCE_EXECUTOR", "thread"),
+    max_workers=int(os.getenv("INFERENCE_WORKERS", "4")),
+    max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+)
+
+# Status returned when the inference queue is full (429 or 503)
+saturated_status_code = int(os.getenv("INFERENCE_REJECT_STATUS", "503"))
+
+# Request deadlines, load shedding on queueing delay and the batch concurrency limit
+admission = create_admission_controller(inference_executor.max_workers)
+inference_executor.add_queue_delay_listener(lambda seconds: admission.observe_queue_delay("executor", seconds))
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Request rate and latency per route, plus the validation/serialization stage marks;
+# added after admission control so shed requests are counted too
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Optional micro-batching of concurrent /predict calls
+micro_batcher = None
+if os.getenv("ENABLE_MICRO_BATCHING", "false").lower() == "true":
+    micro_batcher = MicroBatcher(
+        inference_executor.predict_many,
+        max_batch_size=int(os.getenv("MICRO_BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2")),
+        max_concurrency=inference_executor.max_workers,
+        max_queue=int(os.getenv("MICRO_BATCH_MAX_QUEUE", "1024"))
+    )
+
+# Optional shadow scoring: a sample of /predict traffic is also scored by a candidate version
+shadow = None
+if os.getenv("SHADOW_MODEL_VERSION"):
+    # Fail at startup on a name that could never resolve
+    model_loader.pool.reference(os.getenv("SHADOW_MODEL_VERSION"))
+    shadow = ShadowScorer(
+        os.getenv("SHADOW_MODEL_VERSION"),
+        score=_worker_predict_uncached if inference_executor.kind == "process" else prediction_service.predict_uncached,
+        class_labels=PredictionService.CLASS_LABELS,
+        sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "0.05")),
+        queue_size=int(os.getenv("SHADOW_QUEUE_SIZE", "1000")),
+        kind=inference_executor.kind,
+        initializer=_init_worker
+    )
+
+# Startup warm-up; /ready reports not ready until it has finished
+warmup = Warmup(
+    enabled=os.getenv("WARMUP_ENABLED", "true").lower() == "true",
+    batch_size=int(os.getenv("WARMUP_BATCH_SIZE", "256")),
+    rounds=int(os.getenv("WARMUP_ROUNDS", "3")),
+    snapshot_path=os.getenv("WARMUP_SNAPSHOT_PATH") or None,
+    snapshot_max_rows=int(os.getenv("WARMUP_SNAPSHOT_MAX_ROWS", "10000"))
+)
+
+# Requests scored per inference call by /predict/stream
+stream_chunk_size = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+
+# Optional sampling of /predict and /predict/batch bodies for replay.py
+traffic_capture = None
+if os.getenv("TRAFFIC_CAPTURE_PATH"):
+    traffic_capture = TrafficCapture(
+        os.getenv("TRAFFIC_CAPTURE_PATH"),
+        sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "0.01")),
+        max_bytes=int(float(os.getenv("TRAFFIC_CAPTURE_MAX_MB", "100")) * 1024 * 1024)
+    )
+    app.add_middleware(TrafficCaptureMiddleware, capture=traffic_capture)
+
+# Background model updates: registry polling, SIGHUP and the admin endpoint
+model_poll_interval = float(os.getenv("MODEL_POLL_INTERVAL_SECONDS", "0"))
+
+# Token required by /admin endpoints; they are disabled when unset
+admin_token = os.getenv("ADMIN_TOKEN", "")
+
+def _valid_admin_token(token: Optional[str]) -> bool:
+    """Constant-time check of an X-Admin-Token value"""
+    return bool(admin_token) and bool(token) and hmac.compare_digest(token, admin_token)
+
+# Opt-in profiling: /admin/profile captures and per-request profiles (X-Profile: 1)
+enable_profiling = os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+
+# One capture at a time per process
+profile_lock = threading.Lock()
+profile_store = None
+if enable_profiling:
+    profile_store = ProfileStore(
+        os.getenv("PROFILE_DIR", str(Path(tempfile.gettempdir()) / "retail-profiles"))
+    )
+    app.add_middleware(
+        RequestProfilingMiddleware,
+        store=profile_store,
+        is_authorized=_valid_admin_token,
+        lock=profile_lock
+    )
+
+async def _reload_model():
+    """Build the newest model off the event loop and swap it in"""
+    await asyncio.to_thread(model_loader.reload_model)
+    inference_executor.recycle()
+
+async def _check_model_update():
+    """Ask the registry for a newer package once the server is already serving"""
+    try:
+        if await asyncio.to_thread(model_loader.check_for_update):
+            inference_executor.recycle()
+    except Exception as e:
+        logger.warning(f"Deferred model update check failed: {str(e)}")
+
+async def _reload_on_signal():
+    """SIGHUP handler: reload in the background, keep serving on failure"""
+    try:
+        await _reload_model()
+    except Exception as e:
+        logger.error(f"Model reload on SIGHUP failed: {str(e)}")
+
+def _can_handle_sighup() -> bool:
+    """Signal handlers need POSIX and a loop running in the main thread"""
+    return hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread()
+
+def _log_model_source():
+    """Log where the active model came from"""
+    model_info = model_loader.get_model_info()
+    model_source = model_info.get('model_source', 'unknown')
+    
+    if model_source == 'sagemaker_registry':
+        logger.info(f"Model source: SageMaker Model Registry ({model_info.get('model_package_group', 'N/A')})")
+    elif model_source == 's3':
+        logger.info(f"Model source: S3 Bucket ({os.getenv('MODEL_BUCKET', 'N/A')})")
+    else:
+        logger.info(f"Model source: {model_source}")
+        
+    logger.info(f"Model version: {model_info.get('version', 'N/A')}")
+    logger.info(f"Model type: {model_info.get('model_type', 'N/A')}")
+
+async def _load_and_warm_up():
+    """Load the model off the event loop, then start updates and the warm-up"""
+    try:
+        await asyncio.to_thread(model_loader.load_model)
+    except Exception as e:
+        app.state.model_load_error = str(e)
+        logger.error(f"Model load failed, staying not ready: {str(e)}")
+        return
+    _log_model_source()
+    
+    if model_poll_interval > 0:
+        model_loader.start_polling(model_poll_interval)
+    if model_loader.needs_registry_check:
+        # Model came from the local artifact cache; look for a newer one in the background
+        app.state.model_update_check = asyncio.create_task(_check_model_update())
+    
+    await warmup.run(inference_executor, prediction_service)
+
+async def start_inference():
+    """Start the inference pool and, when enabled, the micro-batching loop"""
+    inference_executor.start()
+    await admission.start()
+    if micro_batcher is not None:
+        await micro_batcher.start()
+    if shadow is not None:
+        await shadow.start()
+    if traffic_capture is not None:
+        traffic_capture.start()
+    
+    # Load and warm up in the background so /health answers while /ready waits
+    app.state.model_load_error = None
+    app.state.startup = asyncio.create_task(_load_and_warm_up())
+    
+    if _can_handle_sighup():
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.ensure_future(_reload_on_signal())
+        )
+
+async def stop_inference():
+    """Drain the micro-batching loop and the inference pool on shutdown"""
+    if _can_handle_sighup():
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    if not app.state.startup.done():
+        app.state.startup.cancel()
+    model_loader.stop_polling()
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+    if shadow is not None:
+        await shadow.stop()
+    await admission.stop()
+    inference_executor.shutdown()
+    if traffic_capture is not None:
+        traffic_capture.stop()
+    if prediction_service.shared_cache is not None:
+        prediction_service.shared_cache.close()
+    metrics.mark_process_dead()
+
+def _saturated(e: ExecutorSaturatedError) -> HTTPException:
+    """Fast rejection when the inference queue is full"""
+    logger.warning(f"Rejecting request: {str(e)}")
+    return HTTPException(
+        status_code=saturated_status_code,
+        detail="Server busy, retry later",
+        headers={"Retry-After": "1"}
+    )
+
+def _deadline_exceeded(e: DeadlineExceededError) -> HTTPException:
+    """504 for work dropped because nobody is waiting for it any more"""
+    logger.warning(f"Dropping request: {str(e)}")
+    return HTTPException(status_code=504, detail="Request deadline exceeded")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with a valid X-Admin-Token header"""
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not _valid_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def require_model():
+    """Reject scoring requests with a 503 while the model is still loading"""
+    if not model_loader.is_loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is loading, retry later",
+            headers={"Retry-After": "1"}
+        )
+
+def requested_model_version(request: Request, x_model_version: Optional[str] = Header(None)) -> Optional[str]:
+    """Model version picked by the /models/{model_version}/... path or the X-Model-Version header
+    
+    Names that are neither an alias, a package version number, "latest" nor
+    "approved" are rejected here, before any registry call.
+    """
+    version = request.path_params.get("model_version") or x_model_version
+    if version is None:
+        return None
+    try:
+        model_loader.pool.reference(version)
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return version
+
+def _version_not_found(e: ModelVersionNotFoundError) -> HTTPException:
+    """404 for a version missing from the registry"""
+    logger.warning(f"Rejecting request: {str(e)}")
+    return HTTPException(status_code=404, detail=str(e))
+
+def require_profiling():
+    """Allow profiling endpoints only when ENABLE_PROFILING is set"""
+    if not enable_profiling:
+        raise HTTPException(status_code=403, detail="Profiling is disabled")
 
 # Pydantic models for request/response validation
 class PredictionRequest(BaseModel):
@@ -55,6 +352,17 @@ class PredictionRequest(BaseModel):
     PROD_CODE_20: str = Field(..., description="Product category level 2")
     PROD_CODE_30: str = Field(..., description="Product category level 3")
 
+class ColumnarPredictionRequest(BaseModel):
+    """One list per feature; row i is made of the i-th entry of every list"""
+    BASKET_SIZE: List[str] = Field(..., description="Basket sizes: S, M, L")
+    BASKET_TYPE: List[str] = Field(..., description="Basket composition types")
+    STORE_REGION: List[str] = Field(..., description="Store region codes")
+    STORE_FORMAT: List[str] = Field(..., description="Store formats: SS, LS")
+    SPEND: List[float] = Field(..., description="Transaction spend amounts in GBP, each > 0")
+    QUANTITY: List[int] = Field(..., description="Numbers of items purchased, each > 0")
+    PROD_CODE_20: List[str] = Field(..., description="Product categories level 2")
+    PROD_CODE_30: List[str] = Field(..., description="Product categories level 3")
+
 class PredictionResponse(BaseModel):
     prediction: str = Field(..., description="Predicted price sensitivity class")
     probability: Dict[str, float] = Field(..., description="Class probabilities")
@@ -76,7 +384,15 @@ async def root():
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint for ALB and Kubernetes probes"""
+    """Health check endpoint for ALB and Kubernetes probes
+    
+    Never goes through the inference executor, so probes answer even when
+    every worker is busy. While the model is still loading the process is
+    alive but not serving: status is "loading" with a 200, so liveness
+    probes leave it alone and /ready keeps traffic away.
+    """
+    if not model_loader.is_loaded and app.state.model_load_error is None:
+        return HealthResponse(status="loading", model_loaded=False, model_version="unknown")
     try:
         model = model_loader.get_model()
         model_info = model_loader.get_model_info()
@@ -92,41 +408,319 @@ async def health_check():
 
 @app.get("/ready", response_model=HealthResponse)
 async def readiness_check():
-    """Readiness check endpoint for Kubernetes"""
+    """Readiness check endpoint for Kubernetes
+    
+    Not ready (503) until the model is loaded and the startup warm-up has
+    finished, so new pods get traffic only once first-call costs are paid.
+    Liveness stays on /health.
+    """
+    if not model_loader.is_loaded:
+        detail = app.state.model_load_error or "Loading model"
+        raise HTTPException(status_code=503, detail=detail)
+    if not warmup.ready:
+        detail = f"Warm-up failed: {warmup.error}" if warmup.error else "Warming up"
+        raise HTTPException(status_code=503, detail=detail)
     return await health_check()
 
-@app.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest):
-    """Single prediction endpoint"""
+@app.get("/warmup/stats")
+async def warmup_stats():
+    """Get warm-up status, first-inference and steady-state batch latency"""
+    return warmup.get_stats()
+
+@app.post("/predict", response_model=PredictionResponse, dependencies=[Depends(require_model)])
+@app.post("/models/{model_version}/predict", response_model=PredictionResponse, dependencies=[Depends(require_model)])
+async def predict(
+    request: PredictionRequest,
+    http_request: Request,
+    model_version: Optional[str] = Depends(requested_model_version)
+):
+    """Single prediction endpoint
+    
+    Scored by the active model unless a version is picked with the
+    X-Model-Version header or the /models/{model_version} prefix.
+    """
+    metrics.mark_validated(http_request)
     try:
         # Convert request to dictionary
         features = request.dict()
         
-        # Make prediction
-        result = prediction_service.predict(features)
+        # Make prediction, coalesced with concurrent requests when enabled;
+        # batches hold one model, so requests for other versions are scored alone
+        if micro_batcher is not None and model_version is None:
+            result = await micro_batcher.submit(features)
+        else:
+            result = (await inference_executor.predict_many([features], model_version))[0]
+        metrics.mark_scored(http_request)
+        if shadow is not None and model_version is None:
+            shadow.offer([features], [result])
         
+        # Service output is trusted, so fast mode serializes it as is
+        if fast_responses:
+            return ORJSONResponse(result)
         return PredictionResponse(**result)
     
+    except ExecutorSaturatedError as e:
+        raise _saturated(e)
+    except DeadlineExceededError as e:
+        raise _deadline_exceeded(e)
+    except ModelVersionNotFoundError as e:
+        raise _version_not_found(e)
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-@app.post("/predict/batch")
-async def predict_batch(requests: List[PredictionRequest]):
-    """Batch prediction endpoint"""
+def _compact_batch(result: Dict) -> Dict:
+    """Parallel-array batch response built from a columnar prediction"""
+    labels = PredictionService.CLASS_LABELS
+    return {
+        "classes": labels,
+        "labels": [labels[idx] for idx in result["label_indices"].tolist()],
+        "probabilities": result["probabilities"].tolist(),
+        "confidences": result["confidence"].tolist(),
+        "model_version": result["model_version"],
+        "count": len(result["label_indices"])
+    }
+
+@app.post("/predict/batch", dependencies=[Depends(require_model)])
+@app.post("/models/{model_version}/predict/batch", dependencies=[Depends(require_model)])
+async def predict_batch(
+    requests: List[PredictionRequest],
+    http_request: Request,
+    response_format: str = Query("default", alias="format", pattern="^(default|compact)$"),
+    model_version: Optional[str] = Depends(requested_model_version)
+):
+    """Batch prediction endpoint
+    
+    format=compact returns parallel labels/probabilities/confidences arrays
+    (probabilities in "classes" order) instead of one object per row;
+    compact batches are scored column-wise and skip the prediction caches.
+    """
+    metrics.mark_validated(http_request)
     try:
-        results = []
-        for req in requests:
-            features = req.dict()
-            result = prediction_service.predict(features)
-            results.append(result)
+        if response_format == "compact":
+            columns = {
+                name: [getattr(req, name) for req in requests]
+                for name in PredictionService.FEATURE_NAMES
+            }
+            result = await inference_executor.predict_columns(columns, lookup_codes, model_version)
+            metrics.mark_scored(http_request)
+            return json_response_class(_compact_batch(result))
         
+        features_list = [req.dict() for req in requests]
+        results = await inference_executor.predict_many(features_list, model_version)
+        metrics.mark_scored(http_request)
+        if shadow is not None and model_version is None:
+            shadow.offer(features_list, results)
+        
+        if fast_responses:
+            return ORJSONResponse({"predictions": results, "count": len(results)})
         return {"predictions": results, "count": len(results)}
     
+    except ExecutorSaturatedError as e:
+        raise _saturated(e)
+    except DeadlineExceededError as e:
+        raise _deadline_exceeded(e)
+    except ModelVersionNotFoundError as e:
+        raise _version_not_found(e)
     except Exception as e:
         logger.error(f"Batch prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
 
+async def _score_stream_chunk(features_list: List[Dict], model_version: Optional[str] = None) -> List[Dict]:
+    """Score one /predict/stream chunk, waiting for pool capacity instead of failing mid-stream"""
+    while True:
+        try:
+            return await inference_executor.predict_many(features_list, model_version)
+        except ExecutorSaturatedError:
+            await asyncio.sleep(0.05)
+
+def _parse_stream_line(line: bytes) -> Dict:
+    """Validate one NDJSON request line"""
+    return PredictionRequest(**json.loads(line)).dict()
+
+@app.post("/predict/batch/columnar", dependencies=[Depends(require_model)])
+@app.post("/models/{model_version}/predict/batch/columnar", dependencies=[Depends(require_model)])
+async def predict_batch_columnar(
+    request: ColumnarPredictionRequest,
+    http_request: Request,
+    model_version: Optional[str] = Depends(requested_model_version)
+):
+    """Columnar batch prediction endpoint
+    
+    Takes one list per feature and returns the compact batch response.
+    Values are checked column-wise; failures return 422 with the offending
+    row indices of each column.
+    """
+    try:
+        columns = validate_columns(
+            {name: getattr(request, name) for name in PredictionService.FEATURE_NAMES},
+            PredictionService.FEATURE_NAMES
+        )
+    except ColumnValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    metrics.mark_validated(http_request)
+    
+    try:
+        result = await inference_executor.predict_columns(columns, lookup_codes, model_version)
+        metrics.mark_scored(http_request)
+        return json_response_class(_compact_batch(result))
+    
+    except ExecutorSaturatedError as e:
+        raise _saturated(e)
+    except DeadlineExceededError as e:
+        raise _deadline_exceeded(e)
+    except ModelVersionNotFoundError as e:
+        raise _version_not_found(e)
+    except Exception as e:
+        logger.error(f"Columnar batch prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Columnar batch prediction failed: {str(e)}")
+
+@app.post("/predict/stream", dependencies=[Depends(require_model)])
+@app.post("/models/{model_version}/predict/stream", dependencies=[Depends(require_model)])
+async def predict_stream(
+    request: Request,
+    duplex: bool = Query(False, description="Send results while the upload is still running"),
+    model_version: Optional[str] = Depends(requested_model_version)
+):
+    """Streaming batch prediction endpoint
+    
+    Takes application/x-ndjson (one PredictionRequest per line) and returns
+    one NDJSON result per input line with chunked transfer encoding. Rows
+    are scored STREAM_CHUNK_SIZE at a time while the upload is read, so
+    memory stays flat however large the upload is. Lines that fail
+    validation come back as {"line": n, "error": ...}.
+    
+    The output is buffered by default: nothing is sent until the whole
+    upload has been scored, because most HTTP/1.1 clients only read the
+    response once they have finished sending and would deadlock otherwise.
+    Results are held in memory up to a few MB, then in a temporary file, so
+    the pod needs disk in proportion to the output. Clients that read the
+    response while uploading (HTTP/2, or an HTTP/1.1 client with separate
+    send and receive loops) can pass duplex=true to receive each chunk's
+    results as soon as they are scored, with no spooling.
+    """
+    results = score_ndjson(
+        request.stream(),
+        parse=_parse_stream_line,
+        score=lambda features_list: _score_stream_chunk(features_list, model_version),
+        chunk_size=stream_chunk_size
+    )
+    if duplex:
+        return DuplexStreamingResponse(results, media_type="application/x-ndjson")
+    return DuplexStreamingResponse(spool_stream(results), media_type="application/x-ndjson")
+
+@app.post("/predict/arrow", dependencies=[Depends(require_model)])
+@app.post("/models/{model_version}/predict/arrow", dependencies=[Depends(require_model)])
+async def predict_arrow(request: Request, model_version: Optional[str] = Depends(requested_model_version)):
+    """Columnar batch prediction endpoint
+    
+    Takes an Arrow IPC stream/file or Parquet body with the eight feature
+    columns and returns an Arrow IPC stream with prediction,
+    probability_<class> and confidence columns. Columns are encoded as
+    arrays, without per-row Python objects.
+    """
+    try:
+        body = await request.body()
+        
+        # Decoding and validation are CPU work too, keep them off the event loop
+        def decode():
+            table = read_table(body, request.headers.get("content-type", ""), PredictionService.FEATURE_NAMES)
+            return table_columns(table, PredictionService.FEATURE_NAMES)
+        columns = await asyncio.to_thread(decode)
+        metrics.mark_validated(request)
+        
+        result = await inference_executor.predict_columns(columns, lookup_arrow_codes, model_version)
+        metrics.mark_scored(request)
+        content = await asyncio.to_thread(predictions_to_ipc, result, PredictionService.CLASS_LABELS)
+        return Response(content=content, media_type=ARROW_STREAM_TYPE)
+    
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ModelVersionNotFoundError as e:
+        raise _version_not_found(e)
+    except UnsupportedMediaTypeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise _saturated(e)
+    except DeadlineExceededError as e:
+        raise _deadline_exceeded(e)
+    except Exception as e:
+        logger.error(f"Arrow prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Arrow prediction failed: {str(e)}")
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-stage latency, request rate, batch sizes, caches, executor and model"""
+    content, content_type = metrics.render_latest()
+    # Passed as a header: media_type would get a second charset appended
+    return Response(content=content, headers={"Content-Type": content_type})
+
+@app.get("/batching/stats")
+async def batching_stats():
+    """Get micro-batching queue depth and batch-size histogram"""
+    if micro_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **micro_batcher.get_stats()}
+
+@app.get("/executor/stats")
+async def executor_stats():
+    """Get inference pool occupancy and rejection counts"""
+    return inference_executor.get_stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Get queueing delays, shedding state, batch slot usage and deadline drops"""
+    return admission.get_stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Get prediction cache hit/miss/eviction counters"""
+    stats = {"enabled": prediction_service.cache is not None}
+    if prediction_service.cache is not None:
+        stats.update(prediction_service.cache.get_stats())
+    if prediction_service.shared_cache is not None:
+        stats["shared"] = prediction_service.shared_cache.get_stats()
+    return stats
+
+@app.get("/shadow/stats")
+async def shadow_stats():
+    """Get shadow scoring agreement, confusion against the primary model and latency deltas
+    
+    Latencies are model cost only: each sample is scored again by the
+    primary model, uncached and on the shadow worker, next to the shadow
+    model, so neither side includes cache hits, micro-batch waits or
+    queueing for a pool worker.
+    """
+    if shadow is None:
+        return {"enabled": False}
+    return {"enabled": True, **shadow.get_stats()}
+
+@app.post("/admin/shadow/reset", dependencies=[Depends(require_admin)])
+async def admin_shadow_reset():
+    """Start a fresh shadow comparison, e.g. after the candidate changed"""
+    if shadow is None:
+        raise HTTPException(status_code=409, detail="Shadow scoring is disabled")
+    shadow.reset()
+    return {"status": "reset"}
+
+@app.get("/capture/stats")
+async def capture_stats():
+    """Get traffic capture counters"""
+    if traffic_capture is None:
+        return {"enabled": False}
+    return {"enabled": True, **traffic_capture.get_stats()}
+
+@app.get("/admin/cache/snapshot", dependencies=[Depends(require_admin)])
+async def admin_cache_snapshot(limit: int = Query(10000, gt=0, le=1000000)):
+    """Hot keys of the prediction cache as NDJSON feature rows, for WARMUP_SNAPSHOT_PATH"""
+    if prediction_service.cache is None:
+        raise HTTPException(status_code=409, detail="Prediction cache is disabled")
+    rows = prediction_service.cache.hot_features(limit)
+    content = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+    return Response(content=content, media_type="application/x-ndjson")
+
 @app.get("/model/info")
 async def model_info():
     """Get model information"""
@@ -137,6 +731,16 @@ async def model_info():
         logger.error(f"Model info error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get model info: {str(e)}")
 
+@app.get("/models")
+async def model_pool_stats():
+    """Get the model versions loaded besides the active one, their sizes and the pool bounds
+    
+    With the process executor each worker keeps its own pool; this shows
+    the pool of the server process, which serves the thread executor.
+    """
+    active = model_loader.get_model_info() if model_loader.is_loaded else None
+    return {"active": active, "executor": inference_executor.kind, **model_loader.pool.get_stats()}
+
 @app.get("/model/metrics")
 async def model_metrics():
     """Get model performance metrics"""
@@ -147,6 +751,103 @@ async def model_metrics():
         logger.error(f"Model metrics error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get model metrics: {str(e)}")
 
+@app.post("/admin/model/reload", dependencies=[Depends(require_admin)])
+async def admin_reload_model():
+    """Load the newest registry model in the background and swap it in"""
+    try:
+        await _reload_model()
+        return model_loader.get_model_info()
+    except Exception as e:
+        logger.error(f"Model reload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+
+@app.post("/admin/model/rollback", dependencies=[Depends(require_admin)])
+async def admin_rollback_model():
+    """Swap the previously active model back in"""
+    if inference_executor.kind == "process":
+        raise HTTPException(status_code=409, detail="Rollback is not supported with the process executor")
+    try:
+        model_loader.rollback_model()
+        return model_loader.get_model_info()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin), Depends(require_profiling)])
+async def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    profile_format: str = Query("collapsed", alias="format", pattern="^(collapsed|pstats)$"),
+    target: str = Query("process", pattern="^(process|worker)$")
+):
+    """Profile the serving process, or one inference worker, for a bounded time
+    
+    format=collapsed samples every thread's stack and returns collapsed
+    stacks for flamegraph.pl or speedscope; format=pstats runs cProfile on
+    the event loop thread and returns a dump for pstats or snakeviz.
+    target=worker samples one process-pool worker (collapsed only).
+    """
+    if target == "worker" and inference_executor.kind != "process":
+        raise HTTPException(status_code=409, detail="Worker profiling needs INFERENCE_EXECUTOR=process")
+    if target == "worker" and profile_format != "collapsed":
+        raise HTTPException(status_code=400, detail="Worker profiles are collapsed stacks only")
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another profile is already running")
+    
+    try:
+        if target == "worker":
+            output_path = profile_store.directory / f"worker-{uuid.uuid4().hex}.folded"
+            pid = await inference_executor.start_worker_profile(seconds, interval_ms / 1000, str(output_path))
+            await asyncio.sleep(seconds)
+            # The worker writes the file once its capture ends
+            for _ in range(100):
+                if output_path.exists():
+                    break
+                await asyncio.sleep(0.05)
+            else:
+                raise HTTPException(status_code=504, detail=f"Worker {pid} did not return a profile")
+            content = output_path.read_bytes()
+            output_path.unlink()
+            filename = f"profile-worker-{pid}.folded"
+        elif profile_format == "collapsed":
+            sampler = SamplingProfiler(interval_ms / 1000)
+            await asyncio.to_thread(sampler.run, seconds)
+            content = sampler.collapsed().encode()
+            filename = f"profile-{os.getpid()}.folded"
+        else:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            content = pstats_dump(profile)
+            filename = f"profile-{os.getpid()}.pstats"
+    
+    except ExecutorSaturatedError as e:
+        raise _saturated(e)
+    finally:
+        profile_lock.release()
+    
+    media_type = "text/plain" if filename.endswith(".folded") else "application/octet-stream"
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/admin/profile/requests/{profile_id}", dependencies=[Depends(require_admin), Depends(require_profiling)])
+async def admin_request_profile(profile_id: str):
+    """Get the pstats dump of a request sent with X-Profile: 1"""
+    try:
+        content = profile_store.load(profile_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No profile {profile_id}")
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="request-{profile_id}.pstats"'}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -155,19 +856,4 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
     
     logger.info(f"Starting server on {host}:{port}")
-    
-    # Get actual model info
-    model_info = model_loader.get_model_info()
-    model_source = model_info.get('model_source', 'unknown')
-    
-    if model_source == 'sagemaker_registry':
-        logger.info(f"Model source: SageMaker Model Registry ({model_info.get('model_package_group', 'N/A')})")
-    elif model_source == 's3':
-        logger.info(f"Model source: S3 Bucket ({os.getenv('MODEL_BUCKET', 'N/A')})")
-    else:
-        logger.info(f"Model source: {model_source}")
-        
-    logger.info(f"Model version: {model_info.get('version', 'N/A')}")
-    logger.info(f"Model type: {model_info.get('model_type', 'N/A')}")
-    
     uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,238 @@
+"""
+Prometheus Metrics for Retail Price Sensitivity Prediction
+Per-stage latency, request rate, batch size, cache, executor, admission and model metrics
+
+With several processes (uvicorn workers or the process executor) set
+PROMETHEUS_MULTIPROC_DIR before the server starts: every process then writes
+its samples there and /metrics aggregates them. The variable is read when
+prometheus_client is imported, so it must be in the process environment, not
+only in .env.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Stages of a prediction, in request order
+STAGES = ("validation", "preprocess", "inference", "serialization")
+
+# Stage latencies range from microseconds (single row) to seconds (large batches)
+STAGE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+MODEL_LOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Route label for requests that matched no route, so scanners cannot blow up cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"],
+    buckets=REQUEST_BUCKETS
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", multiprocess_mode="livesum"
+)
+STAGE_SECONDS = Histogram(
+    "prediction_stage_duration_seconds", "Time spent in each prediction stage", ["stage"],
+    buckets=STAGE_BUCKETS
+)
+BATCH_SIZE = Histogram(
+    "prediction_batch_size", "Rows per scoring call", ["layout"], buckets=BATCH_SIZE_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "prediction_cache_lookups_total", "Prediction cache lookups", ["tier", "result"]
+)
+EXECUTOR_IN_FLIGHT = Gauge(
+    "inference_executor_in_flight", "Inference calls running or waiting for a worker",
+    multiprocess_mode="livesum"
+)
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "inference_executor_queue_depth", "Inference calls waiting for a worker",
+    multiprocess_mode="livesum"
+)
+EXECUTOR_REJECTED = Counter(
+    "inference_executor_rejected_total", "Inference calls rejected because the queue was full"
+)
+QUEUE_DELAY_SECONDS = Histogram(
+    "queueing_delay_seconds", "Time work waited before it started, by where it waited", ["source"],
+    buckets=STAGE_BUCKETS
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Scoring requests turned away by admission control", ["reason"]
+)
+DEADLINE_EXCEEDED = Counter(
+    "deadline_exceeded_total", "Requests dropped because their deadline passed, by where", ["stage"]
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "model_load_duration_seconds", "Model load, reload, rollback and pool load durations", ["operation"],
+    buckets=MODEL_LOAD_BUCKETS
+)
+MODEL_LOADS = Counter(
+    "model_loads_total", "Model loads, reloads, rollbacks and pool loads", ["operation", "result"]
+)
+MODEL_POOL_BYTES = Gauge(
+    "model_pool_bytes", "Array bytes of the model versions loaded besides the active model",
+    multiprocess_mode="livesum"
+)
+MODEL_POOL_EVICTIONS = Counter(
+    "model_pool_evictions_total", "Model versions unloaded from the pool to stay within its bounds"
+)
+SHADOW_REQUESTS = Counter(
+    "shadow_requests_total", "Requests mirrored to the shadow model by outcome", ["result"]
+)
+SHADOW_ROWS = Counter(
+    "shadow_rows_total", "Rows scored by the shadow model, by agreement with the primary", ["result"]
+)
+MODEL_INFO = Gauge(
+    "model_info", "Model in use (1) and models replaced in this process (0)",
+    ["version", "source", "model_type"], multiprocess_mode="livemax"
+)
+
+# Children bound once, the hot path only calls observe()
+_stage_histograms = {stage: STAGE_SECONDS.labels(stage) for stage in STAGES}
+
+# Labels of the model this process is serving
+_model_labels: Optional[Tuple[str, str, str]] = None
+
+# Request scope keys for the stage marks set by the endpoints
+_RECEIVED_AT = "metrics_received_at"
+_SCORED_AT = "metrics_scored_at"
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record the duration of one prediction stage"""
+    _stage_histograms[stage].observe(seconds)
+
+
+def stage_timer(stage: str):
+    """Context manager timing one prediction stage"""
+    return _stage_histograms[stage].time()
+
+
+def mark_validated(request):
+    """Record the validation stage: from request arrival until the input is validated
+
+    Covers reading and parsing the body and request-model validation, which
+    FastAPI runs before the endpoint is called.
+    """
+    received_at = request.scope.get("state", {}).get(_RECEIVED_AT)
+    if received_at is not None:
+        _stage_histograms["validation"].observe(time.perf_counter() - received_at)
+
+
+def mark_scored(request):
+    """Start the serialization stage, closed by the middleware when the response starts"""
+    request.scope.setdefault("state", {})[_SCORED_AT] = time.perf_counter()
+
+
+def set_active_model(info: Dict[str, Any]):
+    """Expose the model now in use as model_info labels"""
+    global _model_labels
+    labels = (
+        str(info.get("version", "unknown")),
+        str(info.get("model_source", "unknown")),
+        str(info.get("model_type", "unknown"))
+    )
+    if _model_labels is not None and _model_labels != labels:
+        MODEL_INFO.labels(*_model_labels).set(0)
+    MODEL_INFO.labels(*labels).set(1)
+    _model_labels = labels
+
+
+def update_executor(in_flight: int, max_workers: int):
+    """Publish the inference executor occupancy"""
+    EXECUTOR_IN_FLIGHT.set(in_flight)
+    EXECUTOR_QUEUE_DEPTH.set(max(0, in_flight - max_workers))
+
+
+def mark_process_dead(pid: Optional[int] = None):
+    """Drop the live gauges of an exiting process from the multiprocess directory"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid(), MULTIPROC_DIR)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    Render every metric in the Prometheus text format
+
+    Returns:
+        (payload, content type)
+    """
+    if MULTIPROC_DIR:
+        # Aggregate the samples written by every process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request rate and latency per route
+
+    Routes are labelled with their path template (/predict/batch), never the
+    raw path. It also stamps the request arrival and closes the
+    serialization stage opened by mark_scored().
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[Any, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state[_RECEIVED_AT] = started
+        status_code = 500
+
+        async def send_with_metrics(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                scored_at = state.get(_SCORED_AT)
+                if scored_at is not None:
+                    _stage_histograms["serialization"].observe(time.perf_counter() - scored_at)
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = self._route_path(scope)
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+
+    def _route_path(self, scope) -> str:
+        """Path template of the route that served the request"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if endpoint not in self._route_paths:
+            app = scope.get("app")
+            for route in getattr(app, "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    self._route_paths[endpoint] = route.path
+                    break
+            else:
+                self._route_paths[endpoint] = UNMATCHED_ROUTE
+        return self._route_paths[endpoint]
@@ -0,0 +1,242 @@
+"""
+Micro-batching Scheduler for Retail Price Sensitivity Prediction
+Coalesces concurrent single predictions into one vectorized inference call
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from admission import DeadlineExceededError, current_deadline, request_deadline
+from inference_executor import ExecutorSaturatedError
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+class MicroBatcher:
+    """Queue single prediction requests and score them in small batches
+
+    Up to max_concurrency batches are scored at once, one per inference
+    worker. While every slot is busy requests keep queueing, so the next
+    batch is collected as soon as a slot frees up and comes out larger.
+    """
+
+    def __init__(
+        self,
+        infer: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_concurrency: int = 1,
+        max_queue: int = 1024
+    ):
+        """
+        Args:
+            infer: Coroutine function scoring a list of feature dictionaries
+            max_batch_size: Maximum number of requests per inference call
+            max_wait_ms: Maximum time the first queued request waits for company
+            max_concurrency: Batches scored at the same time, usually the inference worker count
+            max_queue: Requests allowed to wait for a batch before rejecting
+        """
+        self.infer = infer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max_queue
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batches_in_flight: Set[asyncio.Task] = set()
+
+        # Statistics
+        self._batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._batches = 0
+        self._requests = 0
+        self._max_queue_depth = 0
+        self._expired = 0
+        self._rejected = 0
+
+    async def start(self):
+        """Start the background batching loop"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Micro-batcher started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:g}, max_concurrency={self.max_concurrency}, "
+            f"max_queue={self.max_queue})"
+        )
+
+    async def stop(self):
+        """Stop the batching loop, let batches being scored finish and fail any requests still queued"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        if self._batches_in_flight:
+            await asyncio.gather(*self._batches_in_flight, return_exceptions=True)
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+        logger.info("Micro-batcher stopped")
+
+    async def submit(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue one feature dictionary and wait for its prediction
+
+        Args:
+            features: Dictionary with customer transaction features
+
+        Returns:
+            Prediction dictionary for this request
+
+        Raises:
+            ExecutorSaturatedError: If max_queue requests are already waiting
+            DeadlineExceededError: If the request deadline passed before its batch was scored
+        """
+        if self._worker is None:
+            raise RuntimeError("Micro-batcher not started")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((features, future, current_deadline()))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            metrics.EXECUTOR_REJECTED.inc()
+            raise ExecutorSaturatedError(f"Micro-batch queue full ({self.max_queue} requests waiting)")
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self):
+        """Collect batches until max size or max wait, then score each one in its own task"""
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first, so requests pile up into the next batch meanwhile
+            await self._slots.acquire()
+            try:
+                batch = [await self._queue.get()]
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            deadline = loop.time() + self.max_wait
+
+            try:
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Requests already taken off the queue are not drained by stop()
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Micro-batcher stopped"))
+                self._slots.release()
+                raise
+
+            task = asyncio.create_task(self._process_in_slot(batch))
+            self._batches_in_flight.add(task)
+            task.add_done_callback(self._batches_in_flight.discard)
+
+    async def _process_in_slot(self, batch):
+        """Score one batch and give its slot back"""
+        try:
+            await self._process(batch)
+        finally:
+            self._slots.release()
+
+    async def _process(self, batch):
+        """Run one inference call for the batch and fan results out
+
+        Requests whose deadline passed while queued are failed, not scored;
+        the inference call carries the latest deadline of the others.
+        """
+        now = time.time()
+        live = []
+        deadlines = []
+        for features, future, deadline in batch:
+            if deadline is not None and now >= deadline:
+                self._expired += 1
+                metrics.DEADLINE_EXCEEDED.labels("micro_batch").inc()
+                if not future.done():
+                    future.set_exception(DeadlineExceededError("Request deadline passed before batching"))
+            else:
+                live.append((features, future))
+                deadlines.append(deadline)
+        if not live:
+            return
+        batch = live
+        batch_deadline = None if None in deadlines else max(deadlines)
+
+        self._record_batch(len(batch))
+        features_list = [features for features, _ in batch]
+
+        try:
+            with request_deadline(batch_deadline):
+                results = await self.infer(features_list)
+        except Exception as e:
+            logger.error(f"Micro-batch inference failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record_batch(self, size: int):
+        """Update batch-size histogram"""
+        self._batches += 1
+        self._requests += size
+        for idx, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                self._batch_size_counts[idx] += 1
+                break
+        else:
+            self._batch_size_counts[-1] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and batch-size histogram"""
+        # Cumulative buckets, Prometheus style
+        histogram = {}
+        cumulative = 0
+        for bound, count in zip(BATCH_SIZE_BUCKETS + ["inf"], self._batch_size_counts):
+            cumulative += count
+            histogram[f"le_{bound}"] = cumulative
+
+        return {
+            "running": self._worker is not None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_concurrency": self.max_concurrency,
+            "batches_in_flight": len(self._batches_in_flight),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "max_queue_depth": self._max_queue_depth,
+            "rejected": self._rejected,
+            "batches": self._batches,
+            "requests": self._requests,
+            "mean_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+            "expired": self._expired,
+            "batch_size_histogram": histogram
+        }
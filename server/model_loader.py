@@ -3,91 +3,501 @@ Model Loader for Retail Price Sensitivity Prediction
 Handles model download from S3 and local caching
 """
 
+import io
 import os
-import joblib
 import logging
 import json
+import threading
+import time
+import weakref
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
 import numpy as np
 
+from artifact_cache import ArtifactCache
+from feature_encoder import FeatureEncoder, load_feature_encoder
+from model_pool import ModelVersionNotFoundError, create_model_pool
+from tree_engine import compile_model
+import metrics
+
 logger = logging.getLogger(__name__)
 
+class LoadedModel:
+    """Immutable bundle of a model and everything derived from it
+    
+    ModelLoader swaps whole bundles with a single reference assignment, so a
+    request that grabbed one never sees a model paired with another model's
+    metadata or encoder.
+    """
+    
+    def __init__(self, model, model_info: Optional[Dict[str, Any]], model_metrics: Optional[Dict[str, Any]],
+                 encoder: FeatureEncoder, source: str = "mock"):
+        self.model = model
+        self.model_info = model_info
+        self.model_metrics = model_metrics
+        self.encoder = encoder
+        self.source = source
+        self.loaded_at = time.time()
+    
+    @property
+    def model_package_arn(self) -> Optional[str]:
+        """Registry package this bundle was built from, None for the mock model"""
+        if self.model_info:
+            return self.model_info.get("model_package_arn")
+        return None
+    
+    @property
+    def model_package_group(self) -> Optional[str]:
+        """Group of the registry package, parsed from ...:model-package/<group>/<version>"""
+        arn = self.model_package_arn
+        if arn and arn.count("/") >= 2:
+            return arn.rsplit("/", 2)[-2]
+        return None
+
 class ModelLoader:
     """Load ML model from S3 or use mock model for testing"""
     
-    def __init__(self):
-        self.model = None
-        self.model_path = "/tmp/model.joblib"
+    def __init__(self, sagemaker_client=None, artifact_cache: Optional[ArtifactCache] = None,
+                 load: bool = True):
+        """
+        Args:
+            sagemaker_client: SageMaker client (or stand-in), created from boto3 when omitted
+            artifact_cache: Local artifact cache, built from ARTIFACT_CACHE_DIR when omitted
+            load: Load the model now; pass False to call load_model() later, off the import path
+        """
         
         # SageMaker Model Registry configuration
         self.model_package_group_name = os.getenv("MODEL_PACKAGE_GROUP", "retail-price-sensitivity-models")
         self.region = os.getenv("AWS_REGION", "us-east-1")
         self.model_name = os.getenv("SAGEMAKER_MODEL_NAME", "retail-price-sensitivity-model")
         
-        # Model Registry data
-        self.model_info = None
-        self.model_metrics = None
-        self.sagemaker_client = None
+        # Model Registry client
+        self.sagemaker_client = sagemaker_client
+        
+        # Registry artifacts cached on disk so restarts skip the registry round trips
+        self.artifact_cache = artifact_cache if artifact_cache is not None else self._create_artifact_cache()
+        
+        # Set when the model came from the local cache and the registry still has to be asked
+        self.needs_registry_check = False
+        
+        # Model artifacts: registry ModelDataUrl download (opt-in) or a local joblib file
+        self.load_model_artifact = os.getenv("LOAD_MODEL_ARTIFACT", "false").lower() == "true"
+        self.model_file = os.getenv("MODEL_FILE", "")
+        self.s3_client = None
+        
+        # Memory-map model arrays so worker processes share one copy through the page cache
+        self.use_mmap = os.getenv("MODEL_MMAP", "true").lower() == "true"
+        
+        # "flat" compiles tree ensembles into flat arrays scored by tree_engine
+        self.inference_engine = os.getenv("INFERENCE_ENGINE", "native").lower()
+        
+        # Categorical vocabulary written next to model_info.json by training
+        self.encoder_path = os.getenv(
+            "FEATURE_ENCODER_PATH", str(Path(__file__).parent / "feature_encoder.json")
+        )
+        
+        # Active model bundle and the one it replaced, kept for instant rollback
+        self._active: Optional[LoadedModel] = None
+        self._previous: Optional[LoadedModel] = None
+        self._reload_lock = threading.Lock()
         
-        # Load model on initialization
-        self.load_model()
+        # Background polling of the model package group
+        self._poll_thread: Optional[threading.Thread] = None
+        self._poll_stop = threading.Event()
+        
+        # Callbacks run after the model is reloaded (e.g. cache invalidation)
+        self._reload_listeners: List[Callable[[], None]] = []
+        
+        # Encoders by vocabulary fingerprint, so bundles with identical vocabularies share tables.
+        # There is one vocabulary artifact (FEATURE_ENCODER_PATH) for every version: pooled
+        # versions trained on a different vocabulary are not supported
+        self._encoders: "weakref.WeakValueDictionary[str, FeatureEncoder]" = weakref.WeakValueDictionary()
+        
+        # Other registry versions served side by side, picked per request
+        self.pool = create_model_pool(self.resolve_package_arn, self.describe_package, self.load_package)
+        
+        if load:
+            self.load_model()
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Whether a model bundle is active"""
+        return self._active is not None
+    
+    @property
+    def model(self):
+        """Model of the active bundle"""
+        return self._active.model if self._active else None
+    
+    @property
+    def model_info(self) -> Optional[Dict[str, Any]]:
+        """Registry metadata of the active bundle"""
+        return self._active.model_info if self._active else None
+    
+    @property
+    def model_metrics(self) -> Optional[Dict[str, Any]]:
+        """Registry metrics of the active bundle"""
+        return self._active.model_metrics if self._active else None
+    
+    @property
+    def encoder(self) -> Optional[FeatureEncoder]:
+        """Feature encoder of the active bundle"""
+        return self._active.encoder if self._active else None
+    
+    def _create_artifact_cache(self) -> Optional[ArtifactCache]:
+        """Open the artifact cache directory, if configured and writable"""
+        cache_dir = os.getenv("ARTIFACT_CACHE_DIR", "/tmp/model-cache")
+        if not cache_dir:
+            return None
+        try:
+            return ArtifactCache(cache_dir)
+        except OSError as e:
+            logger.warning(f"Artifact cache disabled, cannot use {cache_dir}: {str(e)}")
+            return None
     
     def load_model(self):
-        """Load model from SageMaker Model Registry or use mock model"""
+        """Load model from the local artifact cache, SageMaker Model Registry or use mock model"""
+        started = time.perf_counter()
+        encoder = self._load_encoder()
+        
+        # Serve the last activated package right away, check the registry later
+        bundle = self._load_from_artifact_cache(encoder)
+        if bundle is not None:
+            self.needs_registry_check = True
+            self._active = bundle
+            self._record_load("load", started, bundle)
+            self.pool.preload(bundle)
+            return
+        
         try:
             # Try to load from SageMaker Model Registry
             logger.info(f"Attempting to load model from SageMaker Model Registry: {self.model_package_group_name}")
-            self._load_from_sagemaker_registry()
+            bundle = self._load_from_sagemaker_registry(encoder)
             logger.info("Model loaded successfully from SageMaker Model Registry")
             
         except Exception as e:
             logger.warning(f"Failed to load model from SageMaker Model Registry: {str(e)}")
-            logger.info("Using mock model for testing")
-            self.model = self._load_mock_model()
+            bundle = self._load_from_local_file(encoder)
+            if bundle is None:
+                logger.info("Using mock model for testing")
+                bundle = LoadedModel(self._load_mock_model(), None, None, encoder)
+        
+        self._active = bundle
+        self._remember_active(bundle)
+        self._record_load("load", started, bundle)
+        if bundle.model_package_arn:
+            self.pool.preload(bundle)
     
-    def _load_from_sagemaker_registry(self):
-        """Load model from SageMaker Model Registry"""
+    def _load_encoder(self) -> FeatureEncoder:
+        """Load the feature encoder, reusing a live one with the same vocabularies
+        
+        Re-read on every load, so a reload picks up a replaced artifact.
+        """
+        encoder = load_feature_encoder(self.encoder_path)
+        return self._encoders.setdefault(encoder.fingerprint(), encoder)
+    
+    def _record_load(self, operation: str, started: float, bundle: LoadedModel):
+        """Publish a successful load and the model now in use"""
+        metrics.MODEL_LOAD_SECONDS.labels(operation).observe(time.perf_counter() - started)
+        metrics.MODEL_LOADS.labels(operation, "success").inc()
+        metrics.set_active_model(self.get_model_info(bundle))
+    
+    def _load_from_local_file(self, encoder: FeatureEncoder) -> Optional[LoadedModel]:
+        """Load a joblib model from MODEL_FILE, None if not configured or unreadable"""
+        if not self.model_file:
+            return None
+        try:
+            model = self._compile_model(self._load_joblib(self.model_file))
+        except Exception as e:
+            logger.warning(f"Failed to load model file {self.model_file}: {str(e)}")
+            return None
+        logger.info(f"Model loaded from local file: {self.model_file}")
+        return LoadedModel(model, None, None, encoder, source="local_file")
+    
+    def _load_joblib(self, path: str):
+        """Load a joblib model, memory-mapping its numpy arrays when enabled
+        
+        Memory mapping needs an uncompressed joblib dump; compressed dumps are
+        loaded into process memory as usual. Estimators that copy arrays while
+        unpickling (sklearn trees do) only share their plain numpy attributes.
+        """
+        import joblib
+        
+        mmap_mode = "r" if self.use_mmap else None
+        return joblib.load(path, mmap_mode=mmap_mode)
+    
+    def _load_from_artifact_cache(self, encoder: FeatureEncoder) -> Optional[LoadedModel]:
+        """Build the last activated package from the local cache, None on a miss"""
+        if self.artifact_cache is None:
+            return None
+        
+        model_package_arn = self.artifact_cache.get_current(self.model_package_group_name)
+        if not model_package_arn:
+            return None
+        
+        package_details = self._get_cached_package(model_package_arn)
+        if package_details is None:
+            return None
+        
+        logger.info(f"Model package {model_package_arn} loaded from local artifact cache")
+        return self._build_registry_bundle(package_details, encoder)
+    
+    def _get_cached_package(self, model_package_arn: str) -> Optional[Dict[str, Any]]:
+        """Get checksum-validated package details from the local cache"""
+        if self.artifact_cache is None:
+            return None
+        data = self.artifact_cache.get(model_package_arn)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            logger.warning(f"Unreadable cached package details for {model_package_arn}")
+            return None
+    
+    def _remember_active(self, bundle: LoadedModel):
+        """Point the local cache at the active package so the next start loads it first"""
+        if self.artifact_cache is None or not bundle.model_package_arn:
+            return
         try:
-            import boto3
-        except ImportError:
-            raise ImportError("boto3 not installed. Install with: pip install boto3")
+            self.artifact_cache.set_current(self.model_package_group_name, bundle.model_package_arn)
+        except OSError as e:
+            logger.warning(f"Failed to update artifact cache pointer: {str(e)}")
+    
+    def _get_sagemaker_client(self):
+        """Create the SageMaker client on first use"""
+        if self.sagemaker_client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImportError("boto3 not installed. Install with: pip install boto3")
+            
+            self.sagemaker_client = boto3.client('sagemaker', region_name=self.region)
+        return self.sagemaker_client
+    
+    def _get_latest_package_arn(self, group: Optional[str] = None, approval_status: Optional[str] = None) -> str:
+        """Get the ARN of the newest package in a model package group
         
-        self.sagemaker_client = boto3.client('sagemaker', region_name=self.region)
+        Args:
+            group: Model package group, MODEL_PACKAGE_GROUP by default
+            approval_status: Only consider packages with this approval status
+        """
+        group = group or self.model_package_group_name
+        filters = {"ModelApprovalStatus": approval_status} if approval_status else {}
         
         # List model packages in the model package group
-        response = self.sagemaker_client.list_model_packages(
-            ModelPackageGroupName=self.model_package_group_name,
+        response = self._get_sagemaker_client().list_model_packages(
+            ModelPackageGroupName=group,
             SortBy='CreationTime',
             SortOrder='Descending',
-            MaxResults=1  # Get the latest version
+            MaxResults=1,  # Get the latest version
+            **filters
         )
         
         if not response.get('ModelPackageSummaryList'):
-            raise ValueError(f"No model packages found in group: {self.model_package_group_name}")
+            raise ValueError(f"No model packages found in group: {group}")
         
         # Get the latest model package
         latest_package = response['ModelPackageSummaryList'][0]
-        model_package_arn = latest_package['ModelPackageArn']
+        return latest_package['ModelPackageArn']
+    
+    def resolve_package_arn(self, reference: str) -> str:
+        """
+        Resolve a registry reference to a package ARN
+        
+        Args:
+            reference: "[group/]selector" where selector is latest, approved
+                or a package version number; the group defaults to MODEL_PACKAGE_GROUP
+        
+        Raises:
+            ModelVersionNotFoundError: If the group has no matching package
+        """
+        group, _, selector = reference.rpartition("/")
+        try:
+            if selector == "latest":
+                return self._get_latest_package_arn(group)
+            if selector == "approved":
+                return self._get_latest_package_arn(group, approval_status="Approved")
+        except ValueError as e:
+            raise ModelVersionNotFoundError(str(e))
+        if not selector.isdigit():
+            raise ModelVersionNotFoundError(f"Unknown model version selector: {selector}")
+        
+        # Versioned package ARNs end in <group>/<version>, the newest one gives the prefix
+        try:
+            latest_arn = self._get_latest_package_arn(group)
+        except ValueError as e:
+            raise ModelVersionNotFoundError(str(e))
+        return f"{latest_arn.rsplit('/', 1)[0]}/{int(selector)}"
+    
+    def describe_package(self, model_package_arn: str) -> Dict[str, Any]:
+        """
+        Registry details of a specific package, for the model pool
+        
+        Raises:
+            ModelVersionNotFoundError: If the registry has no such package
+        """
+        package_details = self._get_cached_package(model_package_arn)
+        if package_details is None:
+            try:
+                package_details = self._get_sagemaker_client().describe_model_package(
+                    ModelPackageName=model_package_arn
+                )
+            except Exception as e:
+                # botocore ClientError, without importing botocore
+                code = getattr(e, "response", {}).get("Error", {}).get("Code")
+                if code in ("ValidationException", "ResourceNotFound"):
+                    raise ModelVersionNotFoundError(f"Model package not found: {model_package_arn}")
+                raise
+            self._cache_package(model_package_arn, package_details)
+        return package_details
+    
+    def load_package(self, package_details: Dict[str, Any]) -> LoadedModel:
+        """
+        Build and warm the bundle of a described registry package, for the model pool
+        
+        Every version is encoded with the vocabulary at FEATURE_ENCODER_PATH;
+        packages do not carry their own encoder artifact.
+        """
+        bundle = self._build_registry_bundle(package_details, self._load_encoder())
+        self._warm_up(bundle)
+        return bundle
+    
+    def _load_from_sagemaker_registry(self, encoder: FeatureEncoder) -> LoadedModel:
+        """Load model from SageMaker Model Registry"""
+        model_package_arn = self._get_latest_package_arn()
         
         logger.info(f"Found model package: {model_package_arn}")
         
-        # Describe the model package to get detailed information
-        package_details = self.sagemaker_client.describe_model_package(
-            ModelPackageName=model_package_arn
-        )
+        # Packages are immutable, so a cached description is as good as a fresh one
+        package_details = self._get_cached_package(model_package_arn)
+        if package_details is None:
+            # Describe the model package to get detailed information
+            package_details = self._get_sagemaker_client().describe_model_package(
+                ModelPackageName=model_package_arn
+            )
+            self._cache_package(model_package_arn, package_details)
         
+        return self._build_registry_bundle(package_details, encoder)
+    
+    def _cache_package(self, model_package_arn: str, package_details: Dict[str, Any]):
+        """Store package details in the local artifact cache"""
+        if self.artifact_cache is None:
+            return
+        try:
+            self.artifact_cache.put(
+                model_package_arn,
+                json.dumps(package_details, default=str).encode(),
+                metadata={"version": package_details.get("ModelPackageVersion")}
+            )
+        except OSError as e:
+            logger.warning(f"Failed to cache model package {model_package_arn}: {str(e)}")
+    
+    def _build_registry_bundle(self, package_details: Dict[str, Any], encoder: FeatureEncoder) -> LoadedModel:
+        """Build a model bundle from registry package details"""
         # Extract model info and metrics from SageMaker Model Registry
-        self._extract_model_data_from_registry(package_details)
+        model_info, model_metrics = self._extract_model_data_from_registry(package_details)
+        
+        model_data_url = self._get_model_data_url(package_details)
+        if self.load_model_artifact and model_data_url:
+            # Load the trained model artifact attached to the package
+            model = self._load_model_artifact(model_info["model_package_arn"], model_data_url)
+            logger.info(f"Model artifact loaded from {model_data_url}")
+        else:
+            # Create a registry-based model that uses the loaded metadata
+            model = self._create_registry_model(model_info, model_metrics)
+            logger.info("SageMaker Model Registry model created")
+        return LoadedModel(model, model_info, model_metrics, encoder, source="sagemaker_registry")
+    
+    @staticmethod
+    def _get_model_data_url(package_details: Dict[str, Any]) -> Optional[str]:
+        """S3 URL of the package's model artifact, if any"""
+        containers = package_details.get("InferenceSpecification", {}).get("Containers", [])
+        if containers:
+            return containers[0].get("ModelDataUrl")
+        return None
+    
+    def _get_s3_client(self):
+        """Create the S3 client on first use"""
+        if self.s3_client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImportError("boto3 not installed. Install with: pip install boto3")
+            
+            self.s3_client = boto3.client('s3', region_name=self.region)
+        return self.s3_client
+    
+    def _load_model_artifact(self, model_package_arn: str, model_data_url: str):
+        """Load the package's joblib model from the artifact cache, downloading it once
+        
+        The extracted joblib file is stored uncompressed in the content-addressed
+        cache and memory-mapped from there, so every worker process on the node
+        maps the same file.
+        """
+        flat_key = f"{model_package_arn}#flat"
+        if self.inference_engine == "flat" and self.artifact_cache is not None:
+            cached_path = self.artifact_cache.get_path(flat_key)
+            if cached_path is not None:
+                return self._load_joblib(str(cached_path))
+        
+        cache_key = f"{model_package_arn}#model"
+        if self.artifact_cache is not None:
+            cached_path = self.artifact_cache.get_path(cache_key)
+            if cached_path is not None:
+                return self._compile_model(self._load_joblib(str(cached_path)), flat_key)
+        
+        # Download s3://bucket/key
+        bucket, _, key = model_data_url.replace("s3://", "", 1).partition("/")
+        data = self._get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
+        
+        # SageMaker packs artifacts as model.tar.gz
+        if key.endswith((".tar.gz", ".tgz")):
+            data = self._extract_model_file(data)
+        
+        if self.artifact_cache is not None:
+            self.artifact_cache.put(cache_key, data, metadata={"model_data_url": model_data_url})
+            model = self._load_joblib(str(self.artifact_cache.get_path(cache_key, verify=False)))
+        else:
+            import joblib
+            model = joblib.load(io.BytesIO(data))
+        return self._compile_model(model, flat_key)
+    
+    def _compile_model(self, model, cache_key: Optional[str] = None):
+        """Swap a tree ensemble for its flat-array engine when INFERENCE_ENGINE=flat
+        
+        The compiled forest is stored in the artifact cache under cache_key and
+        memory-mapped from there, like the model it was built from.
+        """
+        if self.inference_engine != "flat":
+            return model
+        try:
+            flat = compile_model(model)
+        except TypeError as e:
+            logger.warning(f"Flat inference engine not used: {str(e)}")
+            return model
+        logger.info(f"Model compiled to flat engine ({flat.n_trees} trees, {flat.n_nodes} nodes)")
         
-        # Create a registry-based model that uses the loaded metadata
-        self.model = self._create_registry_model()
-        logger.info("SageMaker Model Registry model created")
+        if cache_key is None or self.artifact_cache is None:
+            return flat
+        self.artifact_cache.put(cache_key, flat.to_bytes(), metadata={"engine": "flat"})
+        return self._load_joblib(str(self.artifact_cache.get_path(cache_key, verify=False)))
+    
+    @staticmethod
+    def _extract_model_file(archive: bytes) -> bytes:
+        """Get the first joblib/pickle file from a model.tar.gz archive"""
+        import tarfile
+        
+        with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+            for member in tar.getmembers():
+                if member.isfile() and member.name.endswith((".joblib", ".pkl")):
+                    return tar.extractfile(member).read()
+        raise ValueError("No .joblib or .pkl model file found in model archive")
 
     def _extract_model_data_from_registry(self, package_details):
         """Extract model info and metrics from SageMaker Model Registry response"""
         # Extract basic model information
-        self.model_info = {
+        model_info = {
             "model_type": package_details.get("ModelPackageDescription", "Unknown Model"),
             "model_package_arn": package_details.get("ModelPackageArn"),
             "model_package_status": package_details.get("ModelPackageStatus"),
@@ -105,7 +515,7 @@ class ModelLoader:
         model_metrics = package_details.get("ModelMetrics", {})
         if model_metrics:
             # Try to extract metrics from SageMaker format
-            self.model_metrics = {
+            model_metrics = {
                 "model_performance": {
                     "accuracy": 0.847,  # From SageMaker metrics if available
                     "f1_score": 0.832,
@@ -129,9 +539,10 @@ class ModelLoader:
             }
         else:
             # Fallback metrics
-            self.model_metrics = self._get_fallback_metrics()
+            model_metrics = self._get_fallback_metrics()
         
-        logger.info(f"Extracted model data from SageMaker Registry: {self.model_info.get('model_package_arn')}")
+        logger.info(f"Extracted model data from SageMaker Registry: {model_info.get('model_package_arn')}")
+        return model_info, model_metrics
 
     def _get_fallback_metrics(self):
         """Get fallback metrics when SageMaker metrics are not available"""
@@ -158,12 +569,22 @@ class ModelLoader:
             }
         }
 
-    def _create_registry_model(self):
+    def _create_registry_model(self, model_info, model_metrics):
         """Create model instance based on registry metadata"""
         
         class RegistryModel:
             """Model that uses registry metadata for predictions"""
             
+            # Score thresholds between High | Medium | Low sensitivity
+            SCORE_BINS = np.array([75.0, 200.0])
+            
+            # Class probabilities per prediction, using actual precision from registry
+            PROBA_TABLE = np.array([
+                [0.902, 0.15, 0.1],   # Low
+                [0.15, 0.825, 0.15],  # Medium
+                [0.1, 0.15, 0.822]    # High
+            ])
+            
             def __init__(self, model_info, model_metrics):
                 self.model_info = model_info
                 self.model_metrics = model_metrics
@@ -172,44 +593,27 @@ class ModelLoader:
                 
             def predict(self, X):
                 """Predict using registry-based logic"""
-                predictions = []
+                X = np.asarray(X, dtype=float)
+                n_features = X.shape[1]
                 
-                for row in X:
-                    # Use feature importance to make smarter predictions
-                    spend_idx = 4 if len(row) > 4 else 0  # SPEND feature
-                    quantity_idx = 5 if len(row) > 5 else 1  # QUANTITY feature
-                    
-                    spend = row[spend_idx] if len(row) > spend_idx else 100
-                    quantity = row[quantity_idx] if len(row) > quantity_idx else 1
-                    
-                    # Registry-based prediction logic using actual feature importance
-                    score = spend * 0.34 + quantity * 0.18  # Using actual feature importance
-                    
-                    if score < 75:
-                        predictions.append(2)  # High sensitivity
-                    elif score < 200:
-                        predictions.append(1)  # Medium sensitivity
-                    else:
-                        predictions.append(0)  # Low sensitivity
+                # Use feature importance to make smarter predictions
+                spend_idx = 4 if n_features > 4 else 0  # SPEND feature
+                quantity_idx = 5 if n_features > 5 else 1  # QUANTITY feature
                 
-                return np.array(predictions)
+                spend = X[:, spend_idx] if n_features > spend_idx else np.full(len(X), 100.0)
+                quantity = X[:, quantity_idx] if n_features > quantity_idx else np.ones(len(X))
+                
+                # Registry-based prediction logic using actual feature importance
+                score = spend * 0.34 + quantity * 0.18
+                
+                # Bin 0 (< 75) is High sensitivity (2), bin 2 (>= 200) is Low (0)
+                return 2 - np.digitize(score, self.SCORE_BINS)
             
             def predict_proba(self, X):
                 """Return probabilities based on registry metrics"""
-                predictions = self.predict(X)
-                probas = []
-                
-                for pred in predictions:
-                    if pred == 0:  # Low
-                        probas.append([0.902, 0.15, 0.1])  # Using actual precision from registry
-                    elif pred == 1:  # Medium  
-                        probas.append([0.15, 0.825, 0.15])  # Using actual precision from registry
-                    else:  # High
-                        probas.append([0.1, 0.15, 0.822])  # Using actual precision from registry
-                
-                return np.array(probas)
+                return self.PROBA_TABLE[self.predict(X)]
         
-        return RegistryModel(self.model_info, self.model_metrics)
+        return RegistryModel(model_info, model_metrics)
     
     def _load_mock_model(self):
         """Create mock model for testing when S3 is unavailable"""
@@ -217,72 +621,97 @@ class ModelLoader:
         class MockModel:
             """Simple mock model for testing"""
             
+            # SPEND thresholds between High | Medium | Low sensitivity
+            SPEND_BINS = np.array([50.0, 150.0])
+            
+            # Mock class probabilities per prediction
+            PROBA_TABLE = np.array([
+                [0.7, 0.2, 0.1],  # Low
+                [0.2, 0.6, 0.2],  # Medium
+                [0.1, 0.2, 0.7]   # High
+            ])
+            
             def predict(self, X):
                 """Predict price sensitivity based on simple rules"""
-                predictions = []
+                X = np.asarray(X, dtype=float)
                 
-                for row in X:
-                    # Simple rule-based prediction
-                    # Assuming SPEND is in position 4 (index 4)
-                    spend = row[4] if len(row) > 4 else 100
-                    
-                    if spend < 50:
-                        predictions.append(2)  # High sensitivity
-                    elif spend < 150:
-                        predictions.append(1)  # Medium sensitivity
-                    else:
-                        predictions.append(0)  # Low sensitivity
+                # Assuming SPEND is in position 4 (index 4)
+                spend = X[:, 4] if X.shape[1] > 4 else np.full(len(X), 100.0)
                 
-                return np.array(predictions)
+                # Bin 0 (< 50) is High sensitivity (2), bin 2 (>= 150) is Low (0)
+                return 2 - np.digitize(spend, self.SPEND_BINS)
             
             def predict_proba(self, X):
                 """Return mock probabilities"""
-                predictions = self.predict(X)
-                probas = []
-                
-                for pred in predictions:
-                    if pred == 0:  # Low
-                        probas.append([0.7, 0.2, 0.1])
-                    elif pred == 1:  # Medium
-                        probas.append([0.2, 0.6, 0.2])
-                    else:  # High
-                        probas.append([0.1, 0.2, 0.7])
-                
-                return np.array(probas)
+                return self.PROBA_TABLE[self.predict(X)]
         
         logger.info("Mock model created")
         return MockModel()
     
     def get_model(self):
         """Get loaded model instance"""
-        if self.model is None:
+        return self.get_snapshot().model
+    
+    def get_snapshot(self, version: Optional[str] = None) -> LoadedModel:
+        """Get the active model bundle, or the bundle of another registry version
+        
+        Callers that need the model together with its metadata or encoder
+        should grab the bundle once and read everything from it.
+        
+        Args:
+            version: Alias, package version number, "latest" or "approved";
+                None for the active model
+        
+        Raises:
+            ModelVersionNotFoundError: If the requested version does not exist
+        """
+        bundle = self._active
+        if bundle is None or bundle.model is None:
             raise ValueError("Model not loaded")
-        return self.model
+        if version is None:
+            return bundle
+        return self.pool.get(version, active=bundle)
     
-    def get_model_info(self) -> Dict[str, Any]:
-        """Get model metadata"""
-        if self.model_info:
+    def get_encoder(self) -> FeatureEncoder:
+        """Get categorical feature encoder"""
+        return self.get_snapshot().encoder
+    
+    def get_model_info(self, bundle: Optional[LoadedModel] = None) -> Dict[str, Any]:
+        """Get model metadata, for the active bundle unless one is given"""
+        if bundle is None:
+            bundle = self._active
+        model = bundle.model if bundle else None
+        model_info = bundle.model_info if bundle else None
+        
+        if model_info:
+            # Versions of other groups (pooled region variants) are group-qualified,
+            # which keeps them apart in responses and prediction cache keys
+            version = str(model_info.get("version", "1.0.0"))
+            group = bundle.model_package_group or self.model_package_group_name
+            if group != self.model_package_group_name:
+                version = f"{group}/{version}"
+            
             # Return actual SageMaker Model Registry data
             info = {
-                "model_loaded": self.model is not None,
-                "model_type": self.model_info.get("model_type", "Unknown"),
+                "model_loaded": model is not None,
+                "model_type": model_info.get("model_type", "Unknown"),
                 "model_source": "sagemaker_registry",
-                "version": str(self.model_info.get("version", "1.0.0")),
-                "training_date": str(self.model_info.get("creation_time", "2024-01-15")).split('T')[0],
+                "version": version,
+                "training_date": str(model_info.get("creation_time", "2024-01-15")).split('T')[0],
                 "model_name": self.model_name,
-                "model_package_arn": self.model_info.get("model_package_arn", ""),
-                "approval_status": self.model_info.get("approval_status", "Unknown"),
-                "model_package_status": self.model_info.get("model_package_status", "Unknown"),
-                "feature_names": self.model_info.get("feature_names", []),
-                "classes": self.model_info.get("classes", []),
-                "model_package_group": self.model_package_group_name
+                "model_package_arn": model_info.get("model_package_arn", ""),
+                "approval_status": model_info.get("approval_status", "Unknown"),
+                "model_package_status": model_info.get("model_package_status", "Unknown"),
+                "feature_names": model_info.get("feature_names", []),
+                "classes": model_info.get("classes", []),
+                "model_package_group": group
             }
         else:
             # Fallback to mock data
             info = {
-                "model_loaded": self.model is not None,
-                "model_type": type(self.model).__name__,
-                "model_source": "mock",
+                "model_loaded": model is not None,
+                "model_type": type(model).__name__,
+                "model_source": bundle.source if bundle else "mock",
                 "version": "1.0.0",
                 "training_date": "2024-01-15",
                 "model_name": self.model_name
@@ -292,10 +721,11 @@ class ModelLoader:
     
     def get_model_metrics(self) -> Dict[str, Any]:
         """Get model performance metrics"""
-        if self.model_metrics:
+        model_metrics = self.model_metrics
+        if model_metrics:
             # Return actual SageMaker Model Registry metrics
             logger.info("Using metrics from SageMaker Model Registry")
-            return self.model_metrics
+            return model_metrics
         else:
             # Fallback to mock metrics for demo
             mock_metrics = {
@@ -342,15 +772,113 @@ class ModelLoader:
             logger.info("Using mock metrics for demo")
             return mock_metrics
     
-    def reload_model(self):
-        """Reload model from S3"""
-        logger.info("Reloading model...")
-        self.model = None
+    def add_reload_listener(self, callback: Callable[[], None]):
+        """Register a callback to run after every model reload"""
+        self._reload_listeners.append(callback)
+    
+    def reload_model(self) -> LoadedModel:
+        """Reload model from the registry without interrupting serving
+        
+        The new model is built and warmed while requests keep using the
+        current one, then swapped in with a single reference assignment. If
+        the registry cannot be reached the current model stays in place.
+        
+        Returns:
+            The newly active model bundle
+        """
+        with self._reload_lock:
+            logger.info("Reloading model...")
+            started = time.perf_counter()
+            
+            # Build and warm the new model off the request path
+            try:
+                encoder = self._load_encoder()
+                bundle = self._load_from_sagemaker_registry(encoder)
+                self._warm_up(bundle)
+            except Exception:
+                metrics.MODEL_LOADS.labels("reload", "failure").inc()
+                raise
+            
+            self._swap(bundle)
+            self._record_load("reload", started, bundle)
+            logger.info(f"Model reloaded successfully in {time.perf_counter() - started:.2f}s")
+            return bundle
+    
+    def rollback_model(self) -> LoadedModel:
+        """Swap the previously active model back in
+        
+        Returns:
+            The newly active model bundle
+        """
+        with self._reload_lock:
+            if self._previous is None:
+                raise ValueError("No previous model to roll back to")
+            started = time.perf_counter()
+            bundle = self._previous
+            self._swap(bundle)
+            self._record_load("rollback", started, bundle)
+            logger.info(f"Rolled back to model {self.get_model_info(bundle).get('version')}")
+            return bundle
+    
+    def check_for_update(self) -> bool:
+        """Reload if the model package group has a newer package than the active one
+        
+        Returns:
+            True if a new model was swapped in
+        """
+        latest_arn = self._get_latest_package_arn()
+        self.needs_registry_check = False
+        try:
+            self.pool.refresh()
+        except Exception as e:
+            logger.warning(f"Model pool refresh failed: {str(e)}")
+        active = self._active
+        if active is not None and active.model_package_arn == latest_arn:
+            return False
+        
+        logger.info(f"New model package available: {latest_arn}")
+        self.reload_model()
+        return True
+    
+    def start_polling(self, interval_seconds: float):
+        """Poll the model package group in a background thread"""
+        if self._poll_thread is not None:
+            return
+        
+        def poll():
+            while not self._poll_stop.wait(interval_seconds):
+                try:
+                    self.check_for_update()
+                except Exception as e:
+                    logger.warning(f"Model update check failed: {str(e)}")
+        
+        self._poll_stop.clear()
+        self._poll_thread = threading.Thread(target=poll, name="model-poller", daemon=True)
+        self._poll_thread.start()
+        logger.info(f"Polling {self.model_package_group_name} every {interval_seconds:g}s")
+    
+    def stop_polling(self):
+        """Stop the background polling thread"""
+        if self._poll_thread is None:
+            return
+        self._poll_stop.set()
+        self._poll_thread.join()
+        self._poll_thread = None
+    
+    def _warm_up(self, bundle: LoadedModel):
+        """Run one prediction so first-call costs are paid before the swap"""
+        # One row in the 8-feature layout built by PredictionService
+        bundle.model.predict_proba(np.zeros((1, 8)))
+    
+    def _swap(self, bundle: LoadedModel):
+        """Make bundle active, keeping the replaced one for rollback"""
+        previous = self._active
         
-        # Remove cached model file
-        if Path(self.model_path).exists():
-            Path(self.model_path).unlink()
+        # Single reference assignment: requests see either the old or the new bundle
+        self._active = bundle
+        self._previous = previous
+        self._remember_active(bundle)
         
-        # Reload model
-        self.load_model()
-        logger.info("Model reloaded successfully")
+        # Let dependents drop state derived from the previous model
+        for callback in self._reload_listeners:
+            callback()
@@ -0,0 +1,373 @@
+"""
+Model Pool for Retail Price Sensitivity Prediction
+Serves several registry versions side by side, bounded by count and memory
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Version keys clients may send: an alias name, a package version number, "latest" or "approved"
+VERSION_KEY = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+# Selectors that follow the registry and are re-resolved by refresh()
+MOVING_SELECTORS = ("latest", "approved")
+
+# Objects walked at most when sizing a model, so odd object graphs cannot stall a load
+MAX_SIZED_OBJECTS = 1_000_000
+
+# Unknown version keys remembered at most, so a scan of version numbers cannot grow the map
+MAX_MISSING_KEYS = 1024
+
+
+class ModelVersionNotFoundError(Exception):
+    """Raised when a requested model version is unknown or not in the registry"""
+
+
+def parse_aliases(spec: str) -> Dict[str, str]:
+    """
+    Parse MODEL_ALIASES
+
+    Args:
+        spec: Comma-separated name=reference pairs, e.g.
+            "candidate=latest,stable=approved,north=retail-models-north/approved".
+            A reference is "[group/]selector" with selector latest, approved or
+            a package version number.
+    """
+    aliases = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, reference = item.partition("=")
+        if not sep or not VERSION_KEY.match(name.strip()) or not reference.strip():
+            raise ValueError(f"Invalid model alias: {item!r}")
+        aliases[name.strip()] = reference.strip()
+    return aliases
+
+
+def estimate_nbytes(model: Any) -> int:
+    """
+    Bytes of the numpy arrays reachable from a model
+
+    Walks instance attributes, containers and, for extension types, the
+    state they hand to pickle. Memory-mapped arrays are counted
+    too, so this is the model's array footprint rather than its share of RSS.
+    """
+    # Objects by id, kept alive so ids of temporary pickle state are not reused
+    seen: Dict[int, Any] = {}
+    stack = [model]
+    total = 0
+    while stack and len(seen) < MAX_SIZED_OBJECTS:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen[id(item)] = item
+
+        if isinstance(item, np.ndarray):
+            total += item.nbytes
+            if item.dtype == object:
+                stack.extend(item.ravel().tolist())
+        elif isinstance(item, (bytes, bytearray)):
+            total += len(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif isinstance(item, (str, int, float, bool, type(None), type)) or callable(item):
+            continue
+        elif hasattr(item, "__dict__"):
+            stack.extend(vars(item).values())
+        else:
+            # Extension types (sklearn's Cython Tree) hand their arrays to pickle
+            try:
+                reduced = item.__reduce_ex__(4)
+            except Exception:
+                continue
+            if isinstance(reduced, tuple) and len(reduced) > 2:
+                stack.append(reduced[2])
+    return total
+
+
+class PooledModel:
+    """A loaded version and its usage counters"""
+
+    def __init__(self, bundle, nbytes: int):
+        self.bundle = bundle
+        self.nbytes = nbytes
+        self.requests = 0
+        self.last_used = time.time()
+
+
+class ModelPool:
+    """LRU pool of registry model versions, next to the loader's active model
+
+    Entries are keyed by package ARN, so an alias and a version number that
+    point at the same package share one loaded copy. Registry lookups
+    (resolve and describe) run before the load lock, so a request for an
+    unknown version fails without queueing behind another version's load,
+    and keys found missing are answered from memory for negative_ttl seconds.
+    Loads run one at a time outside the lookup lock: hits are never blocked
+    by a slow download, and two cold versions are never held in memory while
+    both are being built. After each load the least recently used versions
+    are unloaded until both max_versions and max_bytes hold; the newest
+    entry is always kept.
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[str], str],
+        describe: Callable[[str], Dict[str, Any]],
+        load: Callable[[Dict[str, Any]], Any],
+        aliases: Optional[Dict[str, str]] = None,
+        max_versions: int = 4,
+        max_bytes: int = 2 * 1024 ** 3,
+        preload: Optional[List[str]] = None,
+        negative_ttl: float = 30.0
+    ):
+        """
+        Args:
+            resolve: Maps a registry reference to a package ARN
+            describe: Fetches the registry details of a package ARN
+            load: Builds a LoadedModel from package details
+            aliases: Version names clients may use, mapped to registry references
+            max_versions: Versions kept loaded besides the active model
+            max_bytes: Array bytes kept loaded besides the active model
+            preload: Version keys loaded by preload(), e.g. at startup
+            negative_ttl: Seconds a version key found missing is rejected without a registry call
+        """
+        self._resolve = resolve
+        self._describe = describe
+        self._load = load
+        self.aliases = aliases or {}
+        self.max_versions = max(max_versions, 1)
+        self.max_bytes = max_bytes
+        self.preload_keys = preload or []
+        self.negative_ttl = negative_ttl
+
+        self._entries: "OrderedDict[str, PooledModel]" = OrderedDict()
+        self._resolved: Dict[str, str] = {}
+        # Version key -> (expiry, error message) of keys the registry does not have
+        self._missing: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+        # Counters
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+        self.missing_hits = 0
+
+    def reference(self, key: str) -> str:
+        """
+        Registry reference of a client version key
+
+        Group-qualified references are only reachable through aliases, so
+        clients cannot make the pod load packages from arbitrary groups.
+
+        Raises:
+            ModelVersionNotFoundError: If the key is neither an alias nor a selector
+        """
+        if key in self.aliases:
+            return self.aliases[key]
+        if key in MOVING_SELECTORS or key.isdigit():
+            return key
+        raise ModelVersionNotFoundError(f"Unknown model version: {key}")
+
+    def get(self, key: str, active=None):
+        """
+        Model bundle for a version key, loading it on first use
+
+        Args:
+            key: Alias, package version number, "latest" or "approved"
+            active: The loader's active bundle, returned when the key points at it
+
+        Raises:
+            ModelVersionNotFoundError: If the version does not exist
+        """
+        with self._lock:
+            arn = self._resolved.get(key)
+            if arn is None:
+                self._raise_if_missing(key)
+        resolved = arn is not None
+        try:
+            if not resolved:
+                if not VERSION_KEY.match(key):
+                    raise ModelVersionNotFoundError(f"Invalid model version: {key[:64]}")
+                arn = self._resolve(self.reference(key))
+
+            if active is not None and active.model_package_arn == arn:
+                bundle = active
+            else:
+                entry = self._lookup(arn)
+                if entry is None:
+                    entry = self._load_entry(arn, self._describe(arn))
+                bundle = entry.bundle
+        except ModelVersionNotFoundError as e:
+            if not resolved and VERSION_KEY.match(key):
+                self._remember_missing(key, str(e))
+            raise
+
+        # Remembered only once the package loaded, so unknown versions cannot grow the map
+        if not resolved:
+            with self._lock:
+                self._resolved[key] = arn
+        return bundle
+
+    def _raise_if_missing(self, key: str):
+        """Reject a key the registry recently did not have; caller holds _lock"""
+        missing = self._missing.get(key)
+        if missing is None:
+            return
+        expiry, message = missing
+        if time.monotonic() >= expiry:
+            del self._missing[key]
+            return
+        self.missing_hits += 1
+        raise ModelVersionNotFoundError(message)
+
+    def _remember_missing(self, key: str, message: str):
+        """Answer a missing key from memory for negative_ttl seconds"""
+        if self.negative_ttl <= 0:
+            return
+        with self._lock:
+            self._missing.pop(key, None)
+            self._missing[key] = (time.monotonic() + self.negative_ttl, message)
+            while len(self._missing) > MAX_MISSING_KEYS:
+                self._missing.popitem(last=False)
+
+    def _lookup(self, arn: str) -> Optional[PooledModel]:
+        """Loaded entry of a package, marked as most recently used"""
+        with self._lock:
+            entry = self._entries.get(arn)
+            if entry is not None:
+                self._entries.move_to_end(arn)
+                entry.requests += 1
+                entry.last_used = time.time()
+            return entry
+
+    def _load_entry(self, arn: str, package_details: Dict[str, Any]) -> PooledModel:
+        """Load a described package unless a concurrent call already did"""
+        with self._load_lock:
+            entry = self._lookup(arn)
+            if entry is not None:
+                return entry
+
+            started = time.perf_counter()
+            try:
+                bundle = self._load(package_details)
+            except Exception:
+                self.load_failures += 1
+                metrics.MODEL_LOADS.labels("pool", "failure").inc()
+                raise
+            entry = PooledModel(bundle, estimate_nbytes(bundle.model))
+            entry.requests = 1
+            metrics.MODEL_LOAD_SECONDS.labels("pool").observe(time.perf_counter() - started)
+            metrics.MODEL_LOADS.labels("pool", "success").inc()
+            self.loads += 1
+
+            with self._lock:
+                self._entries[arn] = entry
+                self._evict()
+                metrics.MODEL_POOL_BYTES.set(sum(e.nbytes for e in self._entries.values()))
+            logger.info(
+                f"Model package {arn} loaded into pool "
+                f"({entry.nbytes / 1024 ** 2:.1f} MB, {len(self._entries)} versions loaded)"
+            )
+            return entry
+
+    def _evict(self):
+        """Unload least recently used versions until the bounds hold; caller holds _lock"""
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while len(self._entries) > 1 and (len(self._entries) > self.max_versions or total > self.max_bytes):
+            arn, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            self.evictions += 1
+            metrics.MODEL_POOL_EVICTIONS.inc()
+            logger.info(f"Model package {arn} unloaded from pool ({entry.nbytes / 1024 ** 2:.1f} MB)")
+        if total > self.max_bytes:
+            logger.warning(f"Model pool holds {total / 1024 ** 2:.1f} MB, over its budget with a single version")
+
+    def preload(self, active=None):
+        """Load the configured versions; failures are logged, not raised"""
+        for key in self.preload_keys:
+            try:
+                self.get(key, active)
+            except Exception as e:
+                logger.warning(f"Preloading model version {key} failed: {str(e)}")
+
+    def refresh(self):
+        """Re-resolve keys that follow the registry (latest, approved and aliases of them)
+
+        Called from the model poller, so requests pick up a newly approved
+        package without a registry call on the request path. Packages that
+        are no longer referenced age out of the LRU. Keys found missing are
+        forgotten, so a newly registered version is reachable right away.
+        """
+        with self._lock:
+            self._missing.clear()
+            keys = [key for key in self._resolved if not key.isdigit()]
+        for key in keys:
+            reference = self.reference(key)
+            if reference.rpartition("/")[2].isdigit():
+                continue
+            arn = self._resolve(reference)
+            with self._lock:
+                previous = self._resolved.get(key)
+                self._resolved[key] = arn
+            if previous != arn:
+                logger.info(f"Model version {key} now points at {arn}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get loaded versions, bounds and load/eviction counters"""
+        with self._lock:
+            entries = list(self._entries.items())
+            resolved = dict(self._resolved)
+            missing = len(self._missing)
+        return {
+            "max_versions": self.max_versions,
+            "max_mb": round(self.max_bytes / 1024 ** 2, 1),
+            "loaded_mb": round(sum(entry.nbytes for _, entry in entries) / 1024 ** 2, 3),
+            "aliases": self.aliases,
+            "resolved": resolved,
+            "versions": [
+                {
+                    "model_package_arn": arn,
+                    "version": str((entry.bundle.model_info or {}).get("version", "unknown")),
+                    "mb": round(entry.nbytes / 1024 ** 2, 3),
+                    "requests": entry.requests,
+                    "last_used": entry.last_used
+                }
+                for arn, entry in reversed(entries)
+            ],
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "evictions": self.evictions,
+            "missing_keys": missing,
+            "missing_hits": self.missing_hits
+        }
+
+
+def create_model_pool(
+    resolve: Callable[[str], str],
+    describe: Callable[[str], Dict[str, Any]],
+    load: Callable[[Dict[str, Any]], Any]
+) -> ModelPool:
+    """Build the model pool from MODEL_ALIASES / MODEL_POOL_* settings"""
+    preload = os.getenv("MODEL_POOL_PRELOAD", "")
+    return ModelPool(
+        resolve,
+        describe,
+        load,
+        aliases=parse_aliases(os.getenv("MODEL_ALIASES", "")),
+        max_versions=int(os.getenv("MODEL_POOL_MAX_VERSIONS", "4")),
+        max_bytes=int(float(os.getenv("MODEL_POOL_MAX_MB", "2048")) * 1024 * 1024),
+        preload=[key.strip() for key in preload.split(",") if key.strip()],
+        negative_ttl=float(os.getenv("MODEL_POOL_NEGATIVE_TTL_SECONDS", "30"))
+    )
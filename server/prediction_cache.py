@@ -0,0 +1,153 @@
+"""
+Prediction Cache for Retail Price Sensitivity Prediction
+Bounded in-process LRU/TTL cache keyed on the canonical feature tuple
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry TTL for prediction results"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0):
+        """
+        Args:
+            max_entries: Maximum number of cached predictions before LRU eviction
+            ttl_seconds: Lifetime of a cached prediction
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # Feature names of the key fields after the model version, in key order
+    KEY_FEATURES = (
+        'BASKET_SIZE', 'BASKET_TYPE', 'STORE_REGION', 'STORE_FORMAT',
+        'SPEND', 'QUANTITY', 'PROD_CODE_20', 'PROD_CODE_30'
+    )
+
+    @staticmethod
+    def make_key(features: Dict[str, Any], model_version: str) -> Tuple:
+        """
+        Build the canonical cache key for one request
+
+        Numeric features are normalized so that 12 and 12.0 share an entry.
+
+        Raises:
+            KeyError: If a required feature is missing
+        """
+        return (
+            model_version,
+            features['BASKET_SIZE'],
+            features['BASKET_TYPE'],
+            features['STORE_REGION'],
+            features['STORE_FORMAT'],
+            float(features['SPEND']),
+            int(features['QUANTITY']),
+            features['PROD_CODE_20'],
+            features['PROD_CODE_30']
+        )
+
+    def get_many(self, keys: Sequence[Tuple]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Look up cached predictions
+
+        Returned dictionaries are shared with the cache and must not be mutated.
+
+        Returns:
+            One entry per key, None for misses
+        """
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                elif entry[0] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[1])
+        return results
+
+    def set_many(self, keys: Sequence[Tuple], values: Sequence[Dict[str, Any]]):
+        """Store predictions, evicting least recently used entries when full"""
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def hot_features(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Feature dictionaries of the most recently used live entries
+
+        Used to snapshot hot keys for cache prefill on other replicas.
+        """
+        now = time.monotonic()
+        with self._lock:
+            keys = [key for key, (expires_at, _) in reversed(self._entries.items()) if expires_at > now][:limit]
+        return [dict(zip(self.KEY_FEATURES, key[1:])) for key in keys]
+
+    def clear(self):
+        """Drop every cached prediction, e.g. after a model swap"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        logger.info("Prediction cache invalidated")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit/miss/eviction counters"""
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+def create_prediction_cache() -> Optional[PredictionCache]:
+    """Build the prediction cache from ENABLE_FEATURE_CACHE / FEATURE_CACHE_* settings"""
+    if os.getenv("ENABLE_FEATURE_CACHE", "false").lower() != "true":
+        return None
+
+    cache = PredictionCache(
+        max_entries=int(os.getenv("FEATURE_CACHE_MAX_ENTRIES", "10000")),
+        ttl_seconds=float(os.getenv("FEATURE_CACHE_TTL", "300"))
+    )
+    logger.info(
+        f"Prediction cache enabled (max_entries={cache.max_entries}, ttl={cache.ttl_seconds}s)"
+    )
+    return cache
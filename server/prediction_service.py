@@ -4,9 +4,14 @@ Handles feature preprocessing and model inference
 """
 
 import logging
+import time
 import numpy as np
-from typing import Dict, Any
-from model_loader import ModelLoader
+from typing import Dict, Any, List, Optional, Sequence
+from model_loader import LoadedModel, ModelLoader
+from feature_encoder import build_lookup_table, lookup_codes
+from prediction_cache import PredictionCache
+from cache_backends import SharedPredictionCache
+import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -16,12 +21,35 @@ class PredictionService:
     # Class labels mapping
     CLASS_LABELS = ['Low', 'Medium', 'High']
     
+    # Model input feature order
+    FEATURE_NAMES = [
+        'BASKET_SIZE', 'BASKET_TYPE', 'STORE_REGION', 'STORE_FORMAT',
+        'SPEND', 'QUANTITY', 'PROD_CODE_20', 'PROD_CODE_30'
+    ]
+    
     # Feature encoding maps
     BASKET_SIZE_MAP = {'S': 0, 'M': 1, 'L': 2}
     STORE_FORMAT_MAP = {'SS': 0, 'LS': 1}
     
-    def __init__(self, model_loader: ModelLoader):
+    def __init__(
+        self,
+        model_loader: ModelLoader,
+        cache: Optional[PredictionCache] = None,
+        shared_cache: Optional[SharedPredictionCache] = None
+    ):
         self.model_loader = model_loader
+        
+        # Optional prediction cache, dropped whenever the model is reloaded
+        self.cache = cache
+        if self.cache is not None:
+            self.model_loader.add_reload_listener(self.cache.clear)
+        
+        # Optional cross-replica cache, namespaced by model version
+        self.shared_cache = shared_cache
+        
+        # Sorted lookup tables for vectorized encoding of the fixed maps
+        self._basket_size_table = build_lookup_table(self.BASKET_SIZE_MAP)
+        self._store_format_table = build_lookup_table(self.STORE_FORMAT_MAP)
     
     def predict(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -33,43 +61,192 @@ class PredictionService:
         Returns:
             Dictionary with prediction, probabilities, and confidence
         """
+        return self.predict_many([features])[0]
+    
+    def predict_many(self, features_list: Sequence[Dict[str, Any]],
+                     version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Make predictions for a batch of feature dictionaries
+        
+        The whole batch is encoded into one feature matrix and scored with a
+        single predict_proba call; labels are derived from the argmax.
+        
+        Args:
+            features_list: Sequence of customer transaction feature dictionaries
+            version: Registry version to score with, the active model by default
+            
+        Returns:
+            List of prediction dictionaries, in input order
+        """
+        if not features_list:
+            return []
+        metrics.BATCH_SIZE.labels("rows").observe(len(features_list))
+        
         try:
-            # Preprocess features
-            X = self._preprocess(features)
+            # Use one model bundle for the whole batch, even if a reload swaps it meanwhile
+            bundle = self.model_loader.get_snapshot(version)
             
-            # Get model
-            model = self.model_loader.get_model()
+            # Get model info once per batch
+            model_version = self.model_loader.get_model_info(bundle).get("version", "unknown")
             
-            # Make prediction
-            prediction = model.predict(X)[0]
-            probabilities = model.predict_proba(X)[0]
+            if self.cache is None and self.shared_cache is None:
+                return self._score(features_list, model_version, bundle)
             
-            # Get class label
-            class_label = self.CLASS_LABELS[prediction]
+            # Serve repeated feature tuples from the caches, score only the misses
+            try:
+                keys = [PredictionCache.make_key(features, model_version) for features in features_list]
+            except KeyError as e:
+                raise ValueError(f"Missing required feature: {str(e)}")
             
-            # Get confidence (max probability)
-            confidence = float(max(probabilities))
+            if self.cache is not None:
+                results = self.cache.get_many(keys)
+            else:
+                results = [None] * len(keys)
+            miss_indices = [idx for idx, result in enumerate(results) if result is None]
+            if self.cache is not None:
+                metrics.CACHE_LOOKUPS.labels("local", "hit").inc(len(keys) - len(miss_indices))
+                metrics.CACHE_LOOKUPS.labels("local", "miss").inc(len(miss_indices))
             
-            # Build probability dictionary
-            prob_dict = {
-                label: float(prob) 
-                for label, prob in zip(self.CLASS_LABELS, probabilities)
-            }
+            # One bulk lookup in the shared tier for everything the local cache missed
+            if miss_indices and self.shared_cache is not None:
+                shared = self.shared_cache.get_many([keys[idx] for idx in miss_indices])
+                found = [(idx, result) for idx, result in zip(miss_indices, shared) if result is not None]
+                for idx, result in found:
+                    results[idx] = result
+                if found and self.cache is not None:
+                    self.cache.set_many([keys[idx] for idx, _ in found], [result for _, result in found])
+                metrics.CACHE_LOOKUPS.labels("shared", "hit").inc(len(found))
+                metrics.CACHE_LOOKUPS.labels("shared", "miss").inc(len(shared) - len(found))
+                miss_indices = [idx for idx in miss_indices if results[idx] is None]
             
-            # Get model info
-            model_info = self.model_loader.get_model_info()
+            if miss_indices:
+                miss_keys = [keys[idx] for idx in miss_indices]
+                scored = self._score([features_list[idx] for idx in miss_indices], model_version, bundle)
+                for idx, result in zip(miss_indices, scored):
+                    results[idx] = result
+                if self.cache is not None:
+                    self.cache.set_many(miss_keys, scored)
+                if self.shared_cache is not None:
+                    self.shared_cache.set_many(miss_keys, scored)
             
-            return {
-                "prediction": class_label,
-                "probability": prob_dict,
-                "confidence": round(confidence, 4),
-                "model_version": model_info.get("version", "unknown")
-            }
+            return results
             
         except Exception as e:
             logger.error(f"Prediction failed: {str(e)}")
             raise
     
+    def _score(self, features_list: Sequence[Dict[str, Any]], model_version: str,
+               bundle: LoadedModel) -> List[Dict[str, Any]]:
+        """
+        Run the model on a batch with one predict_proba call
+        
+        Args:
+            features_list: Sequence of customer transaction feature dictionaries
+            model_version: Version reported in each prediction
+            bundle: Model bundle to score with
+            
+        Returns:
+            List of prediction dictionaries, in input order
+        """
+        # Preprocess the whole batch at once
+        with metrics.stage_timer("preprocess"):
+            X = self._preprocess_many(features_list, bundle)
+        
+        # One inference call for the batch
+        with metrics.stage_timer("inference"):
+            probabilities, label_indices, confidences = self._infer(X, bundle)
+        
+        labels = self.CLASS_LABELS
+        return [
+            {
+                "prediction": labels[label_idx],
+                "probability": dict(zip(labels, probs)),
+                "confidence": confidence,
+                "model_version": model_version
+            }
+            for label_idx, probs, confidence in zip(
+                label_indices.tolist(), probabilities.tolist(), confidences.tolist()
+            )
+        ]
+    
+    def predict_columns(self, columns: Dict[str, Any], lookup=lookup_codes,
+                        version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Make predictions for a columnar batch without per-row dictionaries
+        
+        Columnar batches skip the prediction caches, whose keys are built
+        per row.
+        
+        Args:
+            columns: Feature name -> column of values, one entry per FEATURE_NAMES
+            lookup: Categorical table lookup matching the column type
+            version: Registry version to score with, the active model by default
+            
+        Returns:
+            Dictionary with label_indices, probabilities (rows x classes),
+            confidence arrays and the model_version
+        """
+        bundle = self.model_loader.get_snapshot(version)
+        model_version = self.model_loader.get_model_info(bundle).get("version", "unknown")
+        
+        n_rows = len(columns['SPEND'])
+        metrics.BATCH_SIZE.labels("columns").observe(n_rows)
+        if n_rows == 0:
+            probabilities = np.empty((0, len(self.CLASS_LABELS)))
+            label_indices = np.empty(0, dtype=np.int64)
+            confidences = np.empty(0)
+        else:
+            with metrics.stage_timer("preprocess"):
+                X = self._preprocess_columns(columns, n_rows, bundle, lookup)
+            with metrics.stage_timer("inference"):
+                probabilities, label_indices, confidences = self._infer(X, bundle)
+        return {
+            "label_indices": label_indices,
+            "probabilities": probabilities,
+            "confidence": confidences,
+            "model_version": model_version
+        }
+    
+    def predict_uncached(self, features_list: Sequence[Dict[str, Any]],
+                         version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Score a batch without reading or filling the prediction caches
+        
+        Used by shadow scoring, whose results and latencies must come from
+        the model itself.
+        """
+        bundle = self.model_loader.get_snapshot(version)
+        model_version = self.model_loader.get_model_info(bundle).get("version", "unknown")
+        return self._score(features_list, model_version, bundle)
+    
+    def warm_up(self, features_list: Sequence[Dict[str, Any]]) -> float:
+        """
+        Score a batch through the row and columnar paths, bypassing the caches
+        
+        Used at startup so first-call costs are paid before serving.
+        
+        Returns:
+            Seconds taken
+        """
+        started = time.perf_counter()
+        bundle = self.model_loader.get_snapshot()
+        model_version = self.model_loader.get_model_info(bundle).get("version", "unknown")
+        
+        self._score(features_list[:1], model_version, bundle)
+        self._score(features_list, model_version, bundle)
+        self.predict_columns({
+            name: [features[name] for features in features_list]
+            for name in self.FEATURE_NAMES
+        })
+        return time.perf_counter() - started
+    
+    def _infer(self, X: np.ndarray, bundle: LoadedModel):
+        """Run predict_proba once and derive labels and confidences"""
+        probabilities = np.asarray(bundle.model.predict_proba(X), dtype=np.float64)
+        label_indices = probabilities.argmax(axis=1)
+        confidences = np.round(probabilities.max(axis=1), 4)
+        return probabilities, label_indices, confidences
+    
     def _preprocess(self, features: Dict[str, Any]) -> np.ndarray:
         """
         Preprocess features for model input
@@ -80,33 +257,69 @@ class PredictionService:
         Returns:
             Preprocessed feature array
         """
-        try:
-            # Extract and encode features
-            basket_size_encoded = self.BASKET_SIZE_MAP.get(features['BASKET_SIZE'], 1)
-            store_format_encoded = self.STORE_FORMAT_MAP.get(features['STORE_FORMAT'], 0)
+        return self._preprocess_many([features])
+    
+    def _preprocess_many(self, features_list: Sequence[Dict[str, Any]],
+                         bundle: Optional[LoadedModel] = None) -> np.ndarray:
+        """
+        Preprocess a batch of features into one column-major matrix
+        
+        Args:
+            features_list: Sequence of raw feature dictionaries
+            bundle: Model bundle whose encoder to use, the active one by default
             
-            # Hash categorical features (simple hash for demo)
-            basket_type_hash = hash(features['BASKET_TYPE']) % 100
-            store_region_hash = hash(features['STORE_REGION']) % 100
-            prod_code_20_hash = hash(features['PROD_CODE_20']) % 1000
-            prod_code_30_hash = hash(features['PROD_CODE_30']) % 1000
+        Returns:
+            Preprocessed feature matrix of shape (n_rows, n_features)
+        """
+        try:
+            # Gather each feature as a column
+            columns = {
+                name: [features[name] for features in features_list]
+                for name in self.FEATURE_NAMES
+            }
+        except KeyError as e:
+            logger.error(f"Missing required feature: {str(e)}")
+            raise ValueError(f"Missing required feature: {str(e)}")
+        
+        return self._preprocess_columns(columns, len(features_list), bundle)
+    
+    def _preprocess_columns(self, columns: Dict[str, Any], n_rows: int,
+                            bundle: Optional[LoadedModel] = None, lookup=lookup_codes) -> np.ndarray:
+        """
+        Encode feature columns into one column-major matrix
+        
+        Args:
+            columns: Feature name -> column of raw values
+            n_rows: Number of rows in every column
+            bundle: Model bundle whose encoder to use, the active one by default
+            lookup: Categorical table lookup matching the column type
             
-            # Build feature array
+        Returns:
+            Preprocessed feature matrix of shape (n_rows, n_features)
+        """
+        try:
+            # Build feature matrix column by column
             # Order: BASKET_SIZE, BASKET_TYPE, STORE_REGION, STORE_FORMAT, 
             #        SPEND, QUANTITY, PROD_CODE_20, PROD_CODE_30
-            feature_array = np.array([[
-                basket_size_encoded,
-                basket_type_hash,
-                store_region_hash,
-                store_format_encoded,
-                features['SPEND'],
-                features['QUANTITY'],
-                prod_code_20_hash,
-                prod_code_30_hash
-            ]])
-            
-            logger.debug(f"Preprocessed features: {feature_array}")
-            return feature_array
+            feature_matrix = np.empty((n_rows, len(self.FEATURE_NAMES)), dtype=np.float64, order="F")
+            
+            # Extract and encode features
+            feature_matrix[:, 0] = lookup(columns['BASKET_SIZE'], *self._basket_size_table, unknown=1)
+            feature_matrix[:, 3] = lookup(columns['STORE_FORMAT'], *self._store_format_table, unknown=0)
+            
+            # Categorical features from the training vocabulary
+            encoder = (bundle or self.model_loader.get_snapshot()).encoder
+            feature_matrix[:, 1] = encoder.encode('BASKET_TYPE', columns['BASKET_TYPE'], lookup)
+            feature_matrix[:, 2] = encoder.encode('STORE_REGION', columns['STORE_REGION'], lookup)
+            feature_matrix[:, 6] = encoder.encode('PROD_CODE_20', columns['PROD_CODE_20'], lookup)
+            feature_matrix[:, 7] = encoder.encode('PROD_CODE_30', columns['PROD_CODE_30'], lookup)
+            
+            # Numeric features
+            feature_matrix[:, 4] = columns['SPEND']
+            feature_matrix[:, 5] = columns['QUANTITY']
+            
+            logger.debug(f"Preprocessed features: {feature_matrix.shape}")
+            return feature_matrix
             
         except KeyError as e:
             logger.error(f"Missing required feature: {str(e)}")
@@ -0,0 +1,205 @@
+"""
+Profiling for Retail Price Sensitivity Prediction
+Time-bounded sampling and cProfile captures of a live serving process
+"""
+
+import cProfile
+import logging
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Longest capture the admin endpoint accepts
+MAX_PROFILE_SECONDS = 60.0
+
+# Shortest sampling interval; shorter ones cost more than they resolve
+MIN_INTERVAL_SECONDS = 0.001
+
+# Per-request profiles kept on disk, oldest removed first
+MAX_STORED_PROFILES = 50
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class SamplingProfiler:
+    """Sample the stacks of every thread at a fixed interval
+
+    Stacks are aggregated in the collapsed format read by flamegraph.pl and
+    speedscope: one "thread;outer;...;inner count" line per distinct stack.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = max(interval, MIN_INTERVAL_SECONDS)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def sample(self):
+        """Record the current stack of every thread but the sampling one"""
+        own_ident = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, seconds: float):
+        """Sample for the given duration, blocking the calling thread"""
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            self.sample()
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """Aggregated stacks in collapsed format, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def pstats_dump(profile: cProfile.Profile) -> bytes:
+    """Serialize a finished cProfile run in the format of Profile.dump_stats"""
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def start_background_profile(seconds: float, interval: float, output_path: str) -> int:
+    """
+    Sample this process in a daemon thread and write the collapsed stacks to a file
+
+    Used inside process-pool workers: the call returns at once, so the worker
+    keeps scoring while it is being sampled.
+
+    Returns:
+        PID of the sampled process
+    """
+    def run():
+        profiler = SamplingProfiler(interval)
+        profiler.run(seconds)
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(profiler.collapsed())
+        os.replace(tmp_path, output_path)
+
+    threading.Thread(target=run, name="profiler", daemon=True).start()
+    return os.getpid()
+
+
+class ProfileStore:
+    """Directory of per-request pstats dumps, bounded to the newest few"""
+
+    def __init__(self, directory: str, max_profiles: int = MAX_STORED_PROFILES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_profiles = max_profiles
+
+    def path(self, profile_id: str) -> Path:
+        """File of a profile id; ids are validated so they cannot escape the directory"""
+        if not _PROFILE_ID.match(profile_id):
+            raise KeyError(profile_id)
+        return self.directory / f"{profile_id}.pstats"
+
+    def save(self, profile_id: str, data: bytes):
+        """Store one profile and drop the oldest beyond max_profiles"""
+        self.path(profile_id).write_bytes(data)
+        profiles = sorted(self.directory.glob("*.pstats"), key=lambda p: p.stat().st_mtime)
+        for old in profiles[:-self.max_profiles]:
+            old.unlink(missing_ok=True)
+
+    def load(self, profile_id: str) -> bytes:
+        """Read a stored profile
+
+        Raises:
+            KeyError: If there is no such profile
+        """
+        try:
+            return self.path(profile_id).read_bytes()
+        except OSError:
+            raise KeyError(profile_id)
+
+
+class RequestProfilingMiddleware:
+    """Pure ASGI middleware running cProfile around requests that ask for it
+
+    A request is profiled when it carries X-Profile: 1 and a valid admin
+    token. The response gets an X-Profile-Id header; the pstats dump is
+    saved before the last body chunk is sent, so it can be fetched as soon
+    as the response is complete. cProfile sees the event loop thread:
+    parsing, validation, serialization and any other request interleaved
+    with this one; executor work shows up as the awaiting coroutine.
+    """
+
+    def __init__(self, app, store: ProfileStore, is_authorized, lock: threading.Lock):
+        """
+        Args:
+            app: ASGI application
+            store: Where request profiles are saved
+            is_authorized: Callable taking the X-Admin-Token value
+            lock: Capture lock shared with the admin endpoint, one cProfile run at a time
+        """
+        self.app = app
+        self.store = store
+        self.is_authorized = is_authorized
+        self.lock = lock
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile", b"").lower() not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+        if not self.is_authorized(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+        if not self.lock.acquire(blocking=False):
+            logger.info("Request profiling skipped, another capture is running")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        profile = cProfile.Profile()
+        saved = False
+
+        def finish():
+            nonlocal saved
+            if saved:
+                return
+            saved = True
+            profile.disable()
+            try:
+                self.store.save(profile_id, pstats_dump(profile))
+            except OSError as e:
+                logger.warning(f"Could not save request profile {profile_id}: {str(e)}")
+            finally:
+                self.lock.release()
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+            await send(message)
+
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            finish()
@@ -0,0 +1,301 @@
+"""
+Traffic Replay for Retail Price Sensitivity Prediction
+Re-issues a captured NDJSON log (see traffic_capture.py) against one or two servers
+
+Usage:
+    python replay.py capture.ndjson --target http://localhost:8000
+    python replay.py capture.ndjson --target http://staging:8000 --speed 4
+    python replay.py capture.ndjson --target http://old:8000 --compare-target http://new:8000 --speed 0
+
+--speed 1 keeps the original timing, 4 replays four times faster and 0 sends
+as fast as --concurrency allows. With --compare-target every request goes
+to both servers and their predictions are diffed row by row.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from benchmark import summarize
+
+logger = logging.getLogger(__name__)
+
+# Label and probability diffs listed in the report
+MAX_REPORTED_DIFFS = 20
+
+
+def read_log(paths: List[str]) -> List[Dict[str, Any]]:
+    """Load captured records from one or more logs, oldest first"""
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping unreadable line {line_no} of {path}")
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def prediction_rows(payload: Dict[str, Any]) -> Tuple[List[str], List[List[float]], Optional[str]]:
+    """
+    Labels, probability vectors and model version of any prediction response
+
+    Handles /predict, /predict/batch and its compact format.
+    """
+    if "prediction" in payload:
+        rows = [payload]
+    elif "predictions" in payload:
+        rows = payload["predictions"]
+    else:
+        return payload["labels"], payload["probabilities"], payload.get("model_version")
+
+    labels = [row["prediction"] for row in rows]
+    probabilities = [list(row["probability"].values()) for row in rows]
+    version = rows[0].get("model_version") if rows else None
+    return labels, probabilities, version
+
+
+class PredictionDiff:
+    """Accumulate label and probability differences between two servers"""
+
+    def __init__(self):
+        self.requests = 0
+        self.rows = 0
+        self.mismatches = 0
+        self.shape_mismatches = 0
+        self.transitions: Counter = Counter()
+        self.max_probability_diff = 0.0
+        self.probability_diff_sum = 0.0
+        self.versions: Counter = Counter()
+        self.examples: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any], baseline: Dict[str, Any], candidate: Dict[str, Any]):
+        """Compare the two responses to one captured request"""
+        base_labels, base_probs, base_version = prediction_rows(baseline)
+        cand_labels, cand_probs, cand_version = prediction_rows(candidate)
+        self.requests += 1
+        self.versions[f"{base_version} -> {cand_version}"] += 1
+        if len(base_labels) != len(cand_labels):
+            self.shape_mismatches += 1
+            return
+
+        self.rows += len(base_labels)
+        prob_diff = np.abs(np.asarray(base_probs, dtype=float) - np.asarray(cand_probs, dtype=float))
+        row_diff = prob_diff.max(axis=1) if prob_diff.size else np.zeros(0)
+        self.max_probability_diff = max(self.max_probability_diff, float(row_diff.max(initial=0.0)))
+        self.probability_diff_sum += float(row_diff.sum())
+
+        for row, (base_label, cand_label) in enumerate(zip(base_labels, cand_labels)):
+            if base_label == cand_label:
+                continue
+            self.mismatches += 1
+            self.transitions[f"{base_label} -> {cand_label}"] += 1
+            if len(self.examples) < MAX_REPORTED_DIFFS:
+                self.examples.append({
+                    "ts": record["ts"],
+                    "path": record["path"],
+                    "row": row,
+                    "baseline": base_label,
+                    "candidate": cand_label,
+                    "probability_diff": round(float(row_diff[row]), 6)
+                })
+
+    def report(self) -> Dict[str, Any]:
+        """Diff summary"""
+        return {
+            "requests_compared": self.requests,
+            "rows_compared": self.rows,
+            "row_count_mismatches": self.shape_mismatches,
+            "label_mismatches": self.mismatches,
+            "agreement_rate": round(1 - self.mismatches / self.rows, 6) if self.rows else None,
+            "transitions": dict(self.transitions.most_common()),
+            "max_probability_diff": round(self.max_probability_diff, 6),
+            "mean_probability_diff": round(self.probability_diff_sum / self.rows, 6) if self.rows else None,
+            "model_versions": dict(self.versions),
+            "examples": self.examples
+        }
+
+
+class TargetStats:
+    """Latencies and statuses of the replayed requests on one server"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.rows: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.statuses: Counter = Counter()
+
+    def add(self, path: str, latency: float, status: Optional[int], rows: int):
+        self.statuses[str(status) if status is not None else "connection_error"] += 1
+        if status == 200:
+            self.latencies.setdefault(path, []).append(latency)
+            self.rows[path] += rows
+        else:
+            self.errors[path] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        paths = sorted(set(self.latencies) | set(self.errors))
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            "overall": summarize(everything, sum(self.rows.values()), sum(self.errors.values()), elapsed),
+            "by_path": {
+                path: summarize(self.latencies.get(path, []), self.rows[path], self.errors[path], elapsed)
+                for path in paths
+            },
+            "status_counts": dict(self.statuses)
+        }
+
+
+def _request_rows(record: Dict[str, Any]) -> int:
+    """Rows scored by a captured request"""
+    body = record["body"]
+    return len(body) if isinstance(body, list) else 1
+
+
+async def replay(records: List[Dict[str, Any]], targets: List[str], speed: float,
+                 concurrency: int, timeout: float) -> Dict[str, Any]:
+    """
+    Send every captured request to every target
+
+    With speed > 0 each request starts at its captured offset divided by
+    speed, with at most concurrency in flight; lag is how late they started.
+    With speed 0 requests go out back to back on concurrency connections.
+    """
+    import httpx
+
+    stats = {target: TargetStats() for target in targets}
+    diff = PredictionDiff() if len(targets) == 2 else None
+    lags: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def send(target: str, record: Dict[str, Any]):
+            url = f"{target.rstrip('/')}{record['path']}"
+            if record.get("query"):
+                url = f"{url}?{record['query']}"
+            sent = time.perf_counter()
+            try:
+                response = await client.post(url, json=record["body"])
+                status = response.status_code
+                payload = response.json() if status == 200 else None
+            except (httpx.HTTPError, ValueError) as e:
+                logger.debug(f"Replay to {target} failed: {str(e)}")
+                status, payload = None, None
+            stats[target].add(record["path"], time.perf_counter() - sent, status, _request_rows(record))
+            return payload
+
+        async def replay_one(record: Dict[str, Any]):
+            async with semaphore:
+                payloads = await asyncio.gather(*(send(target, record) for target in targets))
+            if diff is not None and all(payload is not None for payload in payloads):
+                diff.add(record, *payloads)
+
+        started = time.perf_counter()
+        if speed > 0:
+            first_ts = records[0]["ts"] if records else 0.0
+            tasks = []
+            for record in records:
+                scheduled = (record["ts"] - first_ts) / speed
+                delay = scheduled - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lags.append(max(0.0, (time.perf_counter() - started) - scheduled))
+                tasks.append(asyncio.create_task(replay_one(record)))
+            await asyncio.gather(*tasks)
+        else:
+            pending = iter(records)
+
+            async def drain():
+                for record in pending:
+                    await replay_one(record)
+            await asyncio.gather(*(drain() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report = {
+        "elapsed_seconds": round(elapsed, 3),
+        "targets": {target: stats[target].report(elapsed) for target in targets}
+    }
+    if lags:
+        lags_ms = np.asarray(lags) * 1000
+        report["schedule_lag_ms"] = {
+            "p50": round(float(np.percentile(lags_ms, 50)), 3),
+            "p99": round(float(np.percentile(lags_ms, 99)), 3),
+            "max": round(float(lags_ms.max()), 3)
+        }
+    if diff is not None:
+        report["diff"] = diff.report()
+    return report
+
+
+def captured_latency(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Latency the production server reported for the captured requests"""
+    ok = [record for record in records if record.get("status") == 200]
+    span = records[-1]["ts"] - records[0]["ts"] if len(records) > 1 else 0.0
+    return summarize(
+        [record["duration_ms"] / 1000 for record in ok],
+        sum(_request_rows(record) for record in ok),
+        len(records) - len(ok),
+        span
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured prediction traffic")
+    parser.add_argument("logs", nargs="+", help="NDJSON capture logs")
+    parser.add_argument("--target", required=True, help="Base URL of the server to replay against")
+    parser.add_argument("--compare-target", help="Second server; predictions are diffed against --target")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Timing multiple: 1 = original, 2 = twice as fast, 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at most")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--limit", type=int, help="Replay only the first N records")
+    parser.add_argument("--include-errors", action="store_true",
+                        help="Also replay requests that failed when captured")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO")))
+
+    try:
+        records = read_log(args.logs)
+    except OSError as e:
+        logger.error(f"Cannot read capture log: {str(e)}")
+        sys.exit(1)
+    if not args.include_errors:
+        records = [record for record in records if record.get("status") == 200]
+    records = records[:args.limit] if args.limit else records
+    if not records:
+        logger.error("No records to replay")
+        sys.exit(1)
+
+    targets = [args.target] + ([args.compare_target] if args.compare_target else [])
+    logger.info(f"Replaying {len(records)} requests against {', '.join(targets)} (speed {args.speed:g})")
+    report = {
+        "logs": args.logs,
+        "records": len(records),
+        "speed": args.speed,
+        "captured": captured_latency(records),
+        **asyncio.run(replay(records, targets, args.speed, args.concurrency, args.timeout))
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
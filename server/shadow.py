@@ -0,0 +1,255 @@
+"""
+Shadow Scoring for Retail Price Sensitivity Prediction
+Scores a sample of live traffic with a candidate model and compares it to the primary
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import random
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Recent latency samples kept for the percentiles
+LATENCY_WINDOW = 10000
+
+
+def _percentiles(values) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 and mean of a latency window in milliseconds"""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    array = np.asarray(values)
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(array.mean()), 3)
+    }
+
+
+class ShadowComparison:
+    """Agreement, confusion and probability differences between primary and shadow predictions"""
+
+    def __init__(self, class_labels: List[str]):
+        self.class_labels = list(class_labels)
+        self._index = {label: idx for idx, label in enumerate(self.class_labels)}
+
+        # Rows: primary label, columns: shadow label
+        self.confusion = np.zeros((len(self.class_labels), len(self.class_labels)), dtype=np.int64)
+        self.probability_diff_sum = 0.0
+        self.max_probability_diff = 0.0
+        self.versions: Dict[str, int] = {}
+
+    def add(self, primary: List[Dict[str, Any]], shadow: List[Dict[str, Any]]):
+        """Compare the primary and shadow predictions of one request, row by row"""
+        for primary_row, shadow_row in zip(primary, shadow):
+            self.confusion[self._index[primary_row["prediction"]], self._index[shadow_row["prediction"]]] += 1
+            diff = max(
+                abs(primary_row["probability"][label] - shadow_row["probability"][label])
+                for label in self.class_labels
+            )
+            self.probability_diff_sum += diff
+            self.max_probability_diff = max(self.max_probability_diff, diff)
+        if primary and shadow:
+            pair = f"{primary[0].get('model_version')} -> {shadow[0].get('model_version')}"
+            self.versions[pair] = self.versions.get(pair, 0) + 1
+
+    def report(self) -> Dict[str, Any]:
+        """Agreement rate, confusion matrix and per-class agreement"""
+        rows = int(self.confusion.sum())
+        agreed = int(np.trace(self.confusion))
+        per_class = {}
+        for idx, label in enumerate(self.class_labels):
+            primary_count = int(self.confusion[idx].sum())
+            shadow_count = int(self.confusion[:, idx].sum())
+            per_class[label] = {
+                "primary": primary_count,
+                "shadow": shadow_count,
+                # Share of the primary's label kept by the shadow, and the reverse
+                "recall": round(int(self.confusion[idx, idx]) / primary_count, 6) if primary_count else None,
+                "precision": round(int(self.confusion[idx, idx]) / shadow_count, 6) if shadow_count else None
+            }
+        return {
+            "rows_compared": rows,
+            "agreement_rate": round(agreed / rows, 6) if rows else None,
+            "confusion": {
+                "labels": self.class_labels,
+                "matrix": self.confusion.tolist()
+            },
+            "per_class": per_class,
+            "mean_probability_diff": round(self.probability_diff_sum / rows, 6) if rows else None,
+            "max_probability_diff": round(self.max_probability_diff, 6),
+            "model_versions": dict(self.versions)
+        }
+
+
+class ShadowScorer:
+    """Score sampled requests with a candidate model, off the response path
+
+    offer() only takes a sampling decision and a non-blocking put on a
+    bounded queue; a full queue drops the sample. A background task scores
+    the queued requests one at a time on a dedicated single worker of the
+    same kind as the inference executor, so shadow work never takes a slot
+    in the primary pool. Each request is scored whole, without batching
+    across requests, which keeps its shadow latency comparable to the
+    primary one.
+
+    Latencies are compared like for like: the shadow worker scores each
+    sample with the primary model too, back to back with the shadow model
+    and bypassing the prediction caches on both. The agreement figures use
+    the predictions the primary actually served.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        score: Callable,
+        class_labels: List[str],
+        sample_rate: float = 0.05,
+        queue_size: int = 1000,
+        kind: str = "thread",
+        initializer: Optional[Callable] = None
+    ):
+        """
+        Args:
+            version: Model version the shadow scores with, as for X-Model-Version
+            score: Picklable callable (features_list, version) -> uncached predictions, run on the
+                shadow worker; version None scores with the primary model
+            class_labels: Class order of the confusion matrix
+            sample_rate: Fraction of eligible requests mirrored to the shadow
+            queue_size: Requests waiting for the shadow before new samples are dropped
+            kind: "thread" or "process", matching the inference executor
+            initializer: Process worker initializer, loading the model
+        """
+        self.version = version
+        self.score = score
+        self.sample_rate = sample_rate
+        self.queue_size = queue_size
+        self.kind = kind
+        self.initializer = initializer
+        self.class_labels = list(class_labels)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[Executor] = None
+        self.reset()
+
+    def reset(self):
+        """Clear the comparison and counters"""
+        self.comparison = ShadowComparison(self.class_labels)
+        self._primary_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._shadow_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._delta_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.sampled = 0
+        self.dropped = 0
+        self.scored = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.started_at = time.time()
+
+    async def start(self):
+        """Start the shadow worker and the scoring loop"""
+        if self._worker is not None:
+            return
+        if self.kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(f"Shadow scoring {self.sample_rate:.2%} of requests with model version {self.version}")
+
+    async def stop(self):
+        """Stop the scoring loop; queued samples are discarded"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        logger.info("Shadow scoring stopped")
+
+    def offer(self, features_list: List[Dict[str, Any]], primary: List[Dict[str, Any]]):
+        """
+        Mirror a scored request to the shadow, if sampled; never blocks
+
+        Args:
+            features_list: Request rows, not mutated afterwards
+            primary: Primary predictions served for the rows
+        """
+        if self._queue is None or random.random() >= self.sample_rate:
+            return
+        self.sampled += 1
+        try:
+            self._queue.put_nowait((features_list, primary))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            metrics.SHADOW_REQUESTS.labels("dropped").inc()
+
+    async def _run(self):
+        """Score queued samples one request at a time, with the primary and the shadow model"""
+        loop = asyncio.get_running_loop()
+        while True:
+            features_list, primary = await self._queue.get()
+            try:
+                started = time.perf_counter()
+                await loop.run_in_executor(self._executor, self.score, features_list, None)
+                primary_seconds = time.perf_counter() - started
+
+                started = time.perf_counter()
+                shadow = await loop.run_in_executor(self._executor, self.score, features_list, self.version)
+                shadow_seconds = time.perf_counter() - started
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e)
+                metrics.SHADOW_REQUESTS.labels("failed").inc()
+                logger.warning(f"Shadow scoring failed: {str(e)}")
+                continue
+
+            self.scored += 1
+            self.comparison.add(primary, shadow)
+            self._primary_ms.append(primary_seconds * 1000)
+            self._shadow_ms.append(shadow_seconds * 1000)
+            self._delta_ms.append((shadow_seconds - primary_seconds) * 1000)
+            metrics.SHADOW_REQUESTS.labels("scored").inc()
+            agreed = sum(p["prediction"] == s["prediction"] for p, s in zip(primary, shadow))
+            metrics.SHADOW_ROWS.labels("agree").inc(agreed)
+            metrics.SHADOW_ROWS.labels("disagree").inc(len(primary) - agreed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sampling counters, the comparison and latency deltas"""
+        return {
+            "version": self.version,
+            "sample_rate": self.sample_rate,
+            "running": self._worker is not None,
+            "since": self.started_at,
+            "sampled": self.sampled,
+            "dropped": self.dropped,
+            "scored": self.scored,
+            "failed": self.failed,
+            "last_error": self.last_error,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            **self.comparison.report(),
+            "latency_ms": {
+                "primary": _percentiles(self._primary_ms),
+                "shadow": _percentiles(self._shadow_ms),
+                "delta": _percentiles(self._delta_ms)
+            }
+        }
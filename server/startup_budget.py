@@ -0,0 +1,205 @@
+"""
+Startup Budget Check for Retail Price Sensitivity Prediction
+Measures how long the API server takes to import, go live and become ready
+
+Usage:
+    python startup_budget.py
+    python startup_budget.py --import-budget-ms 1000 --ready-budget-ms 15000 --output startup.json
+    python startup_budget.py --skip-server --top 30
+
+The import report comes from `python -X importtime -c "import main"` in a
+fresh interpreter: total time, the slowest modules by cumulative and self
+time, and any heavy optional module that main imported eagerly. The server
+check starts uvicorn and times the first 200 from /health (live) and
+/ready (model loaded and warmed up). Exits 1 when a budget is exceeded, so
+it can gate a build.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmark import free_port
+
+logger = logging.getLogger(__name__)
+
+SERVER_DIR = Path(__file__).parent
+
+# Modules main must not import at startup; they load on first use
+LAZY_MODULES = (
+    "boto3", "botocore", "joblib", "tarfile", "pyarrow", "pandas",
+    "sklearn", "xgboost", "lightgbm", "redis", "httpx"
+)
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Parse `-X importtime` output
+
+    Returns:
+        One entry per imported module with self_ms, cumulative_ms and depth
+        (0 for modules imported directly by the measured statement)
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "| imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": depth
+        })
+    return entries
+
+
+def import_report(module: str = "main", repeats: int = 3, top: int = 15) -> Dict[str, Any]:
+    """
+    Import a module in fresh interpreters and break down where the time goes
+
+    The fastest of several runs is reported, which keeps disk cache and
+    scheduling noise out of the budget check.
+    """
+    code = f"import sys, json; import {module}; print(json.dumps(sorted(sys.modules)))"
+    best = None
+    for _ in range(max(repeats, 1)):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=SERVER_DIR, capture_output=True, text=True
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+        entries = parse_importtime(result.stderr)
+        # Top-level entries cover interpreter startup (site) and the measured import
+        import_ms = sum(entry["cumulative_ms"] for entry in entries if entry["depth"] == 0)
+        if best is None or import_ms < best["import_ms"]:
+            loaded = json.loads(result.stdout.strip().splitlines()[-1])
+            best = {"import_ms": import_ms, "wall_ms": wall_ms, "entries": entries, "loaded": loaded}
+
+    entries = best["entries"]
+    by_cumulative = sorted(entries, key=lambda entry: entry["cumulative_ms"], reverse=True)
+    by_self = sorted(entries, key=lambda entry: entry["self_ms"], reverse=True)
+    return {
+        "module": module,
+        "import_ms": round(best["import_ms"], 1),
+        "process_wall_ms": round(best["wall_ms"], 1),
+        "modules_imported": len(entries),
+        "slowest_cumulative": [
+            {"module": e["module"], "cumulative_ms": round(e["cumulative_ms"], 1)} for e in by_cumulative[:top]
+        ],
+        "slowest_self": [
+            {"module": e["module"], "self_ms": round(e["self_ms"], 1)} for e in by_self[:top]
+        ],
+        "eager_lazy_modules": sorted(name for name in LAZY_MODULES if name in best["loaded"])
+    }
+
+
+def server_startup(timeout: float = 120.0) -> Dict[str, Any]:
+    """
+    Start uvicorn and time the first successful /health and /ready
+
+    Times are measured from process spawn, so they include interpreter
+    start, imports, lifespan startup and, for /ready, model load and warm-up.
+    """
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=SERVER_DIR
+    )
+    times: Dict[str, Optional[float]] = {"live_ms": None, "ready_ms": None}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {server.returncode}")
+                for key, path in (("live_ms", "/health"), ("ready_ms", "/ready")):
+                    if times[key] is not None:
+                        continue
+                    try:
+                        if client.get(path).status_code == 200:
+                            times[key] = round((time.perf_counter() - started) * 1000, 1)
+                    except httpx.TransportError:
+                        pass
+                if times["ready_ms"] is not None:
+                    times["live_ms"] = times["live_ms"] or times["ready_ms"]
+                    break
+                time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return times
+
+
+def check_budgets(report: Dict[str, Any], budgets: Dict[str, Optional[float]]) -> List[str]:
+    """Budget violations, empty when everything is within budget"""
+    failures = []
+    eager = report["imports"]["eager_lazy_modules"]
+    if eager:
+        failures.append(f"import main loads modules meant to be lazy: {', '.join(eager)}")
+    measured = {"import_ms": report["imports"]["import_ms"], **report.get("server", {})}
+    for key, budget in budgets.items():
+        if budget is None or key not in measured:
+            continue
+        value = measured[key]
+        if value is None:
+            failures.append(f"{key}: never reached")
+        elif value > budget:
+            failures.append(f"{key}: {value:.0f}ms over the {budget:.0f}ms budget")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the API server startup time against a budget")
+    parser.add_argument("--import-budget-ms", type=float, default=1500.0,
+                        help="Most time `import main` may take, interpreter start included")
+    parser.add_argument("--live-budget-ms", type=float, default=3000.0,
+                        help="Most time from spawn to the first 200 from /health")
+    parser.add_argument("--ready-budget-ms", type=float, default=30000.0,
+                        help="Most time from spawn to the first 200 from /ready")
+    parser.add_argument("--repeats", type=int, default=3, help="Import runs; the fastest is reported")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules listed in the report")
+    parser.add_argument("--skip-server", action="store_true", help="Only run the import report")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO")))
+
+    report: Dict[str, Any] = {"imports": import_report("main", args.repeats, args.top)}
+    if not args.skip_server:
+        report["server"] = server_startup()
+    budgets = {
+        "import_ms": args.import_budget_ms,
+        "live_ms": args.live_budget_ms,
+        "ready_ms": args.ready_budget_ms
+    }
+    report["budgets_ms"] = budgets
+    report["failures"] = check_budgets(report, budgets)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    for failure in report["failures"]:
+        logger.error(f"Startup budget exceeded: {failure}")
+    sys.exit(1 if report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Streaming Scoring for Retail Price Sensitivity Prediction
+Scores NDJSON request bodies in fixed-size chunks with constant memory
+"""
+
+import json
+import logging
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+# Spooled results stay in memory up to this size, then move to a temporary file
+SPOOL_MAX_MEMORY_BYTES = 8 * 1024 * 1024
+
+# Size of the blocks streamed back from the spool
+SPOOL_READ_BYTES = 64 * 1024
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body generator still reads the request
+
+    StreamingResponse listens for client disconnects by calling receive(),
+    which would swallow the request body chunks the generator is waiting
+    for. Here the request stream itself reports a disconnect instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except ClientDisconnect:
+            logger.info("Client disconnected during streaming prediction")
+            return
+
+        if self.background is not None:
+            await self.background()
+
+
+class StreamLineTooLongError(ValueError):
+    """Raised when an NDJSON line exceeds the configured maximum length"""
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = 65536) -> AsyncIterator[bytes]:
+    """
+    Split a byte stream into lines without buffering more than one line
+
+    Args:
+        chunks: Body chunks as received from the client
+        max_line_bytes: Longest accepted line
+
+    Raises:
+        StreamLineTooLongError: If a line grows past max_line_bytes
+    """
+    pending = bytearray()
+    async for chunk in chunks:
+        pending.extend(chunk)
+        if b"\n" in chunk:
+            *lines, rest = pending.split(b"\n")
+            pending = bytearray(rest)
+            for line in lines:
+                yield bytes(line)
+
+        if len(pending) > max_line_bytes:
+            raise StreamLineTooLongError(f"Line longer than {max_line_bytes} bytes")
+
+    if pending:
+        yield bytes(pending)
+
+
+async def score_ndjson(
+    chunks: AsyncIterator[bytes],
+    parse: Callable[[bytes], Dict[str, Any]],
+    score: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]],
+    chunk_size: int = 1000,
+    max_line_bytes: int = 65536
+) -> AsyncIterator[bytes]:
+    """
+    Score an NDJSON body and yield NDJSON results, one chunk at a time
+
+    Every non-blank input line produces exactly one output line, in input
+    order: the prediction, or {"line": n, "error": ...} when the line cannot
+    be parsed or scored. At most chunk_size requests are held at once.
+
+    Args:
+        chunks: Request body chunks
+        parse: Turns one line into a validated feature dictionary
+        score: Coroutine scoring a list of feature dictionaries
+        chunk_size: Requests per scoring call
+        max_line_bytes: Longest accepted line; longer input ends the stream with an error line
+    """
+    # (line number, features or error message, whether the line is valid)
+    batch: List[Tuple[int, Any, bool]] = []
+    line_no = 0
+
+    try:
+        async for line in iter_ndjson_lines(chunks, max_line_bytes):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append((line_no, parse(line), True))
+            except Exception as e:
+                batch.append((line_no, f"Invalid request: {str(e)}", False))
+
+            if len(batch) >= chunk_size:
+                yield await _score_chunk(batch, score)
+                batch = []
+    except StreamLineTooLongError as e:
+        if batch:
+            yield await _score_chunk(batch, score)
+            batch = []
+        yield _dump({"line": line_no + 1, "error": str(e)})
+        return
+
+    if batch:
+        yield await _score_chunk(batch, score)
+
+
+async def spool_stream(
+    stream: AsyncIterator[bytes],
+    max_memory_bytes: int = SPOOL_MAX_MEMORY_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    Drain a generator into a spool file, then stream the spool back
+
+    Most HTTP/1.1 clients send the whole request body before reading the
+    response. Answering while the upload is still running would fill their
+    receive buffer and deadlock both sides, so results are held in a spool
+    that moves to disk past max_memory_bytes. Nothing is sent before the
+    generator is exhausted, and the spool grows with the whole output.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=max_memory_bytes) as spool:
+        async for block in stream:
+            spool.write(block)
+
+        spool.seek(0)
+        while True:
+            block = spool.read(SPOOL_READ_BYTES)
+            if not block:
+                break
+            yield block
+
+
+async def _score_chunk(
+    batch: List[Tuple[int, Any, bool]],
+    score: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+) -> bytes:
+    """Score the valid entries of a chunk and render every entry as NDJSON"""
+    features_list = [item for _, item, valid in batch if valid]
+    try:
+        results = iter(await score(features_list)) if features_list else iter(())
+        failure = None
+    except Exception as e:
+        logger.error(f"Stream chunk prediction error: {str(e)}")
+        results = None
+        failure = f"Prediction failed: {str(e)}"
+
+    lines = []
+    for line_no, item, valid in batch:
+        if not valid:
+            lines.append(_dump({"line": line_no, "error": item}))
+        elif failure is not None:
+            lines.append(_dump({"line": line_no, "error": failure}))
+        else:
+            lines.append(_dump(next(results)))
+    return b"".join(lines)
+
+
+def _dump(record: Dict[str, Any]) -> bytes:
+    """Serialize one NDJSON line"""
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
@@ -0,0 +1,8 @@
+"""
+Test configuration: server modules are imported flat, as main.py does
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
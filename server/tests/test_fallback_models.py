@@ -0,0 +1,120 @@
+"""
+Vectorized MockModel and RegistryModel against their original row-wise implementations
+"""
+
+import numpy as np
+import pytest
+
+from model_loader import ModelLoader
+
+
+def rowwise_mock_predict(X):
+    """MockModel.predict as it was before vectorization"""
+    predictions = []
+    for row in X:
+        spend = row[4] if len(row) > 4 else 100
+        if spend < 50:
+            predictions.append(2)
+        elif spend < 150:
+            predictions.append(1)
+        else:
+            predictions.append(0)
+    return np.array(predictions)
+
+
+def rowwise_mock_predict_proba(X):
+    """MockModel.predict_proba as it was before vectorization"""
+    probas = []
+    for pred in rowwise_mock_predict(X):
+        if pred == 0:
+            probas.append([0.7, 0.2, 0.1])
+        elif pred == 1:
+            probas.append([0.2, 0.6, 0.2])
+        else:
+            probas.append([0.1, 0.2, 0.7])
+    return np.array(probas)
+
+
+def rowwise_registry_predict(X):
+    """RegistryModel.predict as it was before vectorization"""
+    predictions = []
+    for row in X:
+        spend_idx = 4 if len(row) > 4 else 0
+        quantity_idx = 5 if len(row) > 5 else 1
+        spend = row[spend_idx] if len(row) > spend_idx else 100
+        quantity = row[quantity_idx] if len(row) > quantity_idx else 1
+        score = spend * 0.34 + quantity * 0.18
+        if score < 75:
+            predictions.append(2)
+        elif score < 200:
+            predictions.append(1)
+        else:
+            predictions.append(0)
+    return np.array(predictions)
+
+
+def rowwise_registry_predict_proba(X):
+    """RegistryModel.predict_proba as it was before vectorization"""
+    probas = []
+    for pred in rowwise_registry_predict(X):
+        if pred == 0:
+            probas.append([0.902, 0.15, 0.1])
+        elif pred == 1:
+            probas.append([0.15, 0.825, 0.15])
+        else:
+            probas.append([0.1, 0.15, 0.822])
+    return np.array(probas)
+
+
+@pytest.fixture(scope="module")
+def loader(tmp_path_factory):
+    mp = pytest.MonkeyPatch()
+    mp.setenv("ARTIFACT_CACHE_DIR", str(tmp_path_factory.mktemp("artifacts")))
+    yield ModelLoader(sagemaker_client=object(), load=False)
+    mp.undo()
+
+
+@pytest.fixture(scope="module")
+def models(loader):
+    return {
+        "mock": (loader._load_mock_model(), rowwise_mock_predict, rowwise_mock_predict_proba),
+        "registry": (
+            loader._create_registry_model({}, loader._get_fallback_metrics()),
+            rowwise_registry_predict,
+            rowwise_registry_predict_proba
+        )
+    }
+
+
+def _random_inputs(n_rows, n_features, seed):
+    """Spend-like values around and across every threshold, with exact threshold hits"""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(-50, 700, (n_rows, n_features))
+    X[rng.random(X.shape) < 0.05] = rng.choice([0.0, 50.0, 150.0, 75 / 0.34, 200 / 0.34, -0.0])
+    return X
+
+
+@pytest.mark.parametrize("name", ["mock", "registry"])
+@pytest.mark.parametrize("n_features", range(1, 9))
+def test_matches_rowwise_on_large_random_inputs(models, name, n_features):
+    model, reference_predict, reference_proba = models[name]
+    X = _random_inputs(50_000, n_features, seed=n_features)
+
+    predictions = model.predict(X)
+    expected = reference_predict(X)
+    np.testing.assert_array_equal(predictions, expected)
+    assert predictions.dtype == expected.dtype
+    np.testing.assert_array_equal(model.predict_proba(X), reference_proba(X))
+
+
+@pytest.mark.parametrize("name", ["mock", "registry"])
+def test_matches_rowwise_on_non_finite_inputs(models, name):
+    model, reference_predict, reference_proba = models[name]
+    X = _random_inputs(2_000, 8, seed=99)
+    X[::7, 4] = np.nan
+    X[1::7, 4] = np.inf
+    X[2::7, 4] = -np.inf
+    X[3::7, 5] = np.nan
+
+    np.testing.assert_array_equal(model.predict(X), reference_predict(X))
+    np.testing.assert_array_equal(model.predict_proba(X), reference_proba(X))
@@ -0,0 +1,33 @@
+"""
+MicroBatcher shutdown with a partial batch still collecting
+"""
+
+import asyncio
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_stop_fails_requests_of_partial_batch():
+    scored = []
+
+    async def infer(features_list):
+        scored.append(len(features_list))
+        return [{"prediction": "Low"} for _ in features_list]
+
+    async def run():
+        # A long max_wait keeps the loop in its collection wait when stop() cancels it
+        batcher = MicroBatcher(infer, max_batch_size=8, max_wait_ms=10000)
+        await batcher.start()
+        pending = asyncio.ensure_future(batcher.submit({"SPEND": 10.0}))
+        await asyncio.sleep(0.05)
+        assert batcher.get_stats()["queue_depth"] == 0
+
+        await asyncio.wait_for(batcher.stop(), 1)
+        with pytest.raises(RuntimeError, match="Micro-batcher stopped"):
+            await asyncio.wait_for(pending, 1)
+        assert batcher._slots._value == batcher.max_concurrency
+
+    asyncio.run(run())
+    assert scored == []
@@ -0,0 +1,94 @@
+"""
+ModelPool registry lookups: negative caching and describe outside the load lock
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from model_pool import ModelPool, ModelVersionNotFoundError
+
+GROUP_ARN = "arn:aws:sagemaker:us-east-1:123456789012:model-package/retail"
+
+
+class Bundle:
+    def __init__(self, arn):
+        self.model = np.zeros(8)
+        self.model_info = {"version": arn.rsplit("/", 1)[1]}
+        self.model_package_arn = arn
+
+
+class FakeRegistry:
+    """Registry with packages 1..3, counting calls"""
+
+    def __init__(self):
+        self.describes = 0
+        self.load_started = threading.Event()
+        self.release_load = threading.Event()
+        self.release_load.set()
+
+    def resolve(self, reference):
+        return f"{GROUP_ARN}/{reference}"
+
+    def describe(self, arn):
+        self.describes += 1
+        if int(arn.rsplit("/", 1)[1]) > 3:
+            raise ModelVersionNotFoundError(f"Model package not found: {arn}")
+        return {"ModelPackageArn": arn}
+
+    def load(self, package_details):
+        self.load_started.set()
+        self.release_load.wait(5)
+        return Bundle(package_details["ModelPackageArn"])
+
+
+@pytest.fixture
+def registry():
+    return FakeRegistry()
+
+
+def make_pool(registry, negative_ttl=30.0):
+    return ModelPool(registry.resolve, registry.describe, registry.load, negative_ttl=negative_ttl)
+
+
+def test_missing_version_answered_from_memory(registry):
+    pool = make_pool(registry)
+    for _ in range(5):
+        with pytest.raises(ModelVersionNotFoundError):
+            pool.get("99")
+    assert registry.describes == 1
+    assert pool.get_stats()["missing_hits"] == 4
+
+
+def test_missing_version_retried_after_ttl_or_refresh(registry):
+    pool = make_pool(registry, negative_ttl=0)
+    for _ in range(3):
+        with pytest.raises(ModelVersionNotFoundError):
+            pool.get("99")
+    assert registry.describes == 3
+
+    pool = make_pool(registry)
+    with pytest.raises(ModelVersionNotFoundError):
+        pool.get("98")
+    pool.refresh()
+    with pytest.raises(ModelVersionNotFoundError):
+        pool.get("98")
+    assert registry.describes == 5
+
+
+def test_missing_version_not_blocked_by_load(registry):
+    pool = make_pool(registry)
+    registry.release_load.clear()
+    loader = threading.Thread(target=pool.get, args=("1",))
+    loader.start()
+    try:
+        assert registry.load_started.wait(5)
+        # _load_lock is held by the slow load; an unknown version must still fail at once
+        with pytest.raises(ModelVersionNotFoundError):
+            pool.get("99")
+    finally:
+        registry.release_load.set()
+        loader.join(5)
+    assert pool.get("1").model_package_arn == f"{GROUP_ARN}/1"
+    assert pool.get_stats()["loads"] == 1
@@ -0,0 +1,51 @@
+"""
+ShadowScorer latencies: primary and shadow both timed as uncached model calls
+"""
+
+import asyncio
+import time
+
+from shadow import ShadowScorer
+
+LABELS = ["Low", "Medium", "High"]
+
+
+def prediction(label, version):
+    return {
+        "prediction": label,
+        "probability": {name: float(name == label) for name in LABELS},
+        "confidence": 1.0,
+        "model_version": version
+    }
+
+
+def test_primary_rescored_uncached_next_to_shadow():
+    calls = []
+
+    def score(features_list, version):
+        calls.append(version)
+        # The candidate is slower than the primary model
+        time.sleep(0.02 if version == "candidate" else 0.005)
+        return [prediction("High", version or "1") for _ in features_list]
+
+    async def run():
+        scorer = ShadowScorer("candidate", score, LABELS, sample_rate=1.0)
+        await scorer.start()
+        try:
+            # A cache hit served instantly: the served result is compared, but not its latency
+            scorer.offer([{"SPEND": 10.0}], [prediction("Low", "1")])
+            for _ in range(100):
+                if scorer.scored:
+                    break
+                await asyncio.sleep(0.01)
+            return scorer.get_stats()
+        finally:
+            await scorer.stop()
+
+    stats = asyncio.run(run())
+    assert calls == [None, "candidate"]
+    assert stats["scored"] == 1
+    assert stats["agreement_rate"] == 0.0
+    latency = stats["latency_ms"]
+    assert latency["primary"]["p50"] >= 5
+    assert 5 < latency["delta"]["p50"] < latency["shadow"]["p50"]
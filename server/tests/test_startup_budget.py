@@ -0,0 +1,31 @@
+"""
+Import-time budget for the API server, as checked by startup_budget.py
+"""
+
+import os
+
+import pytest
+
+import startup_budget
+
+# Same default as `startup_budget.py --import-budget-ms`; raise it on slow CI runners
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+
+
+@pytest.fixture(scope="module")
+def report():
+    return startup_budget.import_report("main", repeats=3, top=10)
+
+
+def test_import_main_within_budget(report):
+    assert report["import_ms"] <= IMPORT_BUDGET_MS, report["slowest_cumulative"]
+
+
+@pytest.mark.parametrize("module", ["boto3", "pyarrow", "pandas", "redis"])
+def test_import_main_leaves_heavy_module_unloaded(report, module):
+    assert module in startup_budget.LAZY_MODULES
+    assert module not in report["eager_lazy_modules"]
+
+
+def test_import_main_loads_no_lazy_module(report):
+    assert report["eager_lazy_modules"] == []
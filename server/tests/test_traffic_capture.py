@@ -0,0 +1,36 @@
+"""
+TrafficCapture after a write error: records are dropped and stop() returns
+"""
+
+import json
+import threading
+
+from traffic_capture import TrafficCapture
+
+
+def test_stop_after_writer_failed(tmp_path):
+    path = tmp_path / "capture.ndjson"
+    # Rotation onto a non-empty directory fails with an OSError in the writer
+    (tmp_path / "capture.ndjson.1").mkdir()
+    (tmp_path / "capture.ndjson.1" / "keep").write_text("")
+
+    capture = TrafficCapture(str(path), sample_rate=1.0, max_bytes=1, queue_size=4)
+    capture.start()
+    body = json.dumps({"SPEND": 10.0}).encode()
+    capture.record("/predict", "", 200, 0.001, body)
+    capture._writer.join(5)
+    assert not capture._writer.is_alive()
+
+    # The queue no longer fills up behind a dead writer
+    for _ in range(10):
+        capture.record("/predict", "", 200, 0.001, body)
+    stats = capture.get_stats()
+    assert stats["writing"] is False
+    assert stats["captured"] == 1
+    assert stats["dropped"] == 10
+    assert stats["queued"] == 0
+
+    stopper = threading.Thread(target=capture.stop)
+    stopper.start()
+    stopper.join(5)
+    assert not stopper.is_alive()
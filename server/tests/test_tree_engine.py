@@ -0,0 +1,122 @@
+"""
+Parity of the flat tree engine with the models it is compiled from
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from tree_engine import FlatForest, compile_model
+
+ATOL = 1e-6
+
+
+def _training_data(n_rows=3000, seed=42):
+    """Rows shaped like the encoded production features, with three classes"""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 3, n_rows),
+        rng.integers(0, 4, n_rows),
+        rng.integers(0, 4, n_rows),
+        rng.integers(0, 3, n_rows),
+        rng.gamma(2.0, 60.0, n_rows),
+        rng.integers(1, 20, n_rows),
+        rng.integers(0, 30, n_rows),
+        rng.integers(0, 50, n_rows)
+    ]).astype(np.float64)
+    y = np.digitize(X[:, 4] * 0.34 + X[:, 5] * 0.18 + rng.normal(0, 10, n_rows), [75, 200])
+    return X, y
+
+
+def _scoring_data(X, seed=7):
+    """Held-out style rows plus values far outside the training range"""
+    rng = np.random.default_rng(seed)
+    rows = X[rng.choice(len(X), 500)].copy()
+    out_of_range = rows[:100].copy()
+    out_of_range[:, 4] = rng.choice([-1e6, -1.0, 1e9, np.finfo(np.float32).max], 100)
+    out_of_range[:, 6] = rng.choice([-5, 10_000], 100)
+    return np.vstack([rows, out_of_range])
+
+
+def _with_missing(X, rate=0.1, seed=3):
+    """Copy of X with a share of the values replaced by NaN"""
+    rng = np.random.default_rng(seed)
+    X = X.copy()
+    X[rng.random(X.shape) < rate] = np.nan
+    return X
+
+
+def _assert_parity(model, X):
+    flat = compile_model(model)
+    expected = model.predict_proba(X)
+    actual = flat.predict_proba(X)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=ATOL)
+    np.testing.assert_array_equal(flat.predict(X), model.predict(X))
+
+
+@pytest.mark.parametrize("model", [
+    DecisionTreeClassifier(max_depth=12, random_state=0),
+    RandomForestClassifier(n_estimators=30, max_depth=10, random_state=0),
+    RandomForestClassifier(n_estimators=10, random_state=0)
+], ids=["decision_tree", "forest", "forest_unbounded_depth"])
+def test_sklearn_parity(model):
+    X, y = _training_data()
+    model.fit(X, y)
+    _assert_parity(model, _scoring_data(X))
+
+
+@pytest.mark.parametrize("model", [
+    DecisionTreeClassifier(max_depth=12, random_state=0),
+    RandomForestClassifier(n_estimators=30, max_depth=10, random_state=0)
+], ids=["decision_tree", "forest"])
+def test_sklearn_parity_with_missing_values(model):
+    X, y = _training_data()
+    try:
+        model.fit(_with_missing(X), y)
+    except ValueError:
+        pytest.skip("this scikit-learn version does not support missing values for the model")
+    _assert_parity(model, _with_missing(_scoring_data(X), seed=11))
+
+
+def test_sklearn_parity_on_missing_values_unseen_in_training():
+    X, y = _training_data()
+    model = DecisionTreeClassifier(max_depth=12, random_state=0).fit(X, y)
+    try:
+        model.predict_proba(_with_missing(X[:10]))
+    except ValueError:
+        pytest.skip("this scikit-learn version rejects missing values at predict time")
+    _assert_parity(model, _with_missing(_scoring_data(X), seed=11))
+
+
+@pytest.mark.parametrize("n_classes,objective", [(3, "multi:softprob"), (2, "binary:logistic")])
+def test_xgboost_parity(n_classes, objective):
+    xgboost = pytest.importorskip("xgboost")
+    X, y = _training_data()
+    if n_classes == 2:
+        y = (y > 0).astype(int)
+    train = _with_missing(X, rate=0.05)
+    model = xgboost.XGBClassifier(n_estimators=40, max_depth=6, objective=objective, random_state=0)
+    model.fit(train, y)
+
+    flat = compile_model(model)
+    X_score = np.vstack([_scoring_data(X), _with_missing(_scoring_data(X), seed=11)])
+    # XGBoost accumulates margins in float32
+    np.testing.assert_allclose(flat.predict_proba(X_score), model.predict_proba(X_score), rtol=0, atol=1e-5)
+
+
+def test_serialized_forest_scores_the_same():
+    pytest.importorskip("joblib")
+    import io
+    import joblib
+
+    X, y = _training_data()
+    flat = compile_model(RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y))
+    restored = joblib.load(io.BytesIO(flat.to_bytes()))
+    assert isinstance(restored, FlatForest)
+    np.testing.assert_array_equal(restored.predict_proba(X[:200]), flat.predict_proba(X[:200]))
+
+
+def test_unsupported_model_is_rejected():
+    with pytest.raises(TypeError):
+        compile_model(object())
@@ -0,0 +1,208 @@
+"""
+Traffic Capture for Retail Price Sensitivity Prediction
+Samples prediction request bodies to an NDJSON log for replay.py
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Endpoints whose requests are captured
+CAPTURED_PATHS = ("/predict", "/predict/batch")
+
+# Largest body captured; bigger requests are counted as skipped
+MAX_CAPTURED_BODY_BYTES = 4 * 1024 * 1024
+
+# Longest stop() waits for the writer to flush the queue
+STOP_TIMEOUT_SECONDS = 10.0
+
+
+class TrafficCapture:
+    """Write sampled requests to an NDJSON log from a background thread
+
+    Each line is {"ts", "path", "query", "status", "duration_ms", "body"},
+    with ts in epoch seconds. Records wait in a bounded queue and are dropped
+    when it is full, so a slow disk never holds up a request. The log is
+    rotated to <path>.1 when it grows past max_bytes. A write error stops
+    the writer for good; later records are counted as dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 0.01,
+        max_bytes: int = 100 * 1024 * 1024,
+        queue_size: int = 10000,
+        paths: Sequence[str] = CAPTURED_PATHS
+    ):
+        """
+        Args:
+            path: Log file; "{pid}" is replaced so each worker process writes its own
+            sample_rate: Fraction of requests captured
+            max_bytes: Size at which the log is rotated
+            queue_size: Records waiting for the writer before new ones are dropped
+            paths: Request paths eligible for capture
+        """
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+
+        # Statistics
+        self.captured = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def start(self):
+        """Start the writer thread"""
+        if self._writer is not None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True)
+        self._writer.start()
+        logger.info(f"Capturing {self.sample_rate:.2%} of requests to {self.path}")
+
+    def stop(self):
+        """Flush queued records and stop the writer thread, waiting at most STOP_TIMEOUT_SECONDS"""
+        if self._writer is None:
+            return
+        if self._writer.is_alive():
+            try:
+                self._queue.put(None, timeout=STOP_TIMEOUT_SECONDS)
+            except queue.Full:
+                logger.warning("Traffic capture queue still full at shutdown, records may be lost")
+        self._writer.join(STOP_TIMEOUT_SECONDS)
+        if self._writer.is_alive():
+            logger.warning(f"Traffic capture writer did not finish within {STOP_TIMEOUT_SECONDS:g}s")
+        self._writer = None
+
+    def should_capture(self, path: str) -> bool:
+        """Sampling decision, taken before any of the body is read"""
+        return path in self.paths and random.random() < self.sample_rate
+
+    def record(self, path: str, query: str, status: int, duration: float, body: bytes):
+        """Queue one captured request; never blocks"""
+        if self._writer is not None and not self._writer.is_alive():
+            # Nothing reads the queue once the writer has died
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait({
+                "ts": time.time(),
+                "path": path,
+                "query": query,
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "body": body
+            })
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        """Serialize records and append them to the log"""
+        f = open(self.path, "ab")
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                try:
+                    # Bodies that are not JSON failed validation anyway
+                    record["body"] = json.loads(record["body"])
+                except ValueError:
+                    self.skipped += 1
+                    continue
+
+                f.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+                self.captured += 1
+                if self._queue.empty():
+                    f.flush()
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    os.replace(self.path, f"{self.path}.1")
+                    f = open(self.path, "ab")
+        except OSError as e:
+            logger.error(f"Traffic capture stopped: {str(e)}")
+            # Records still queued will never be written
+            while True:
+                try:
+                    if self._queue.get_nowait() is not None:
+                        self.dropped += 1
+                except queue.Empty:
+                    break
+        finally:
+            f.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get capture counters"""
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "writing": self._writer is not None and self._writer.is_alive(),
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "queued": self._queue.qsize()
+        }
+
+
+class TrafficCaptureMiddleware:
+    """Pure ASGI middleware feeding sampled request bodies to a TrafficCapture
+
+    Unsampled requests pass straight through; for sampled ones the body
+    chunks are kept as the application reads them.
+    """
+
+    def __init__(self, app, capture: TrafficCapture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.capture.should_capture(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        chunks = []
+        size = 0
+        status_code = 500
+
+        async def receive_and_keep():
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request":
+                size += len(message.get("body", b""))
+                if size <= MAX_CAPTURED_BODY_BYTES:
+                    chunks.append(message.get("body", b""))
+            return message
+
+        async def send_and_note_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_keep, send_and_note_status)
+        finally:
+            if size > MAX_CAPTURED_BODY_BYTES:
+                self.capture.skipped += 1
+            else:
+                self.capture.record(
+                    scope["path"],
+                    scope.get("query_string", b"").decode("latin-1"),
+                    status_code,
+                    time.perf_counter() - started,
+                    b"".join(chunks)
+                )
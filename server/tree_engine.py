@@ -0,0 +1,366 @@
+"""
+Flat Tree Engine for Retail Price Sensitivity Prediction
+Vectorized inference for tree ensembles compiled into contiguous NumPy arrays
+"""
+
+import io
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FlatForest:
+    """Tree ensemble stored as flat node arrays and scored for all trees at once
+
+    Nodes of every tree are concatenated into one set of arrays. Leaves point
+    to themselves, so each traversal step can move every (row, tree) pair
+    without checking which ones already reached a leaf.
+    """
+
+    TRANSFORMS = ("mean", "softmax", "sigmoid")
+
+    def __init__(
+        self,
+        roots: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        missing_left: np.ndarray,
+        value: np.ndarray,
+        max_depth: int,
+        classes: np.ndarray,
+        transform: str = "mean",
+        base_margin: Optional[np.ndarray] = None
+    ):
+        """
+        Args:
+            roots: Root node index of each tree
+            feature: Split feature per node
+            threshold: Split threshold per node, rows with x <= threshold go left
+            children: Right and left child of node i at 2*i and 2*i+1, the node itself for leaves
+            missing_left: Whether rows with a missing value go left, per node
+            value: Per-node contribution to each class output, shape (classes, nodes)
+            max_depth: Number of traversal steps that reaches every leaf
+            classes: Class labels returned by predict
+            transform: "mean" for leaf probabilities averaged over trees, "softmax"/"sigmoid" for summed margins
+            base_margin: Margin added to the summed leaf values before the transform
+        """
+        if transform not in self.TRANSFORMS:
+            raise ValueError(f"Unknown transform: {transform}. Expected one of {self.TRANSFORMS}")
+
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.transform = transform
+        self.base_margin = base_margin if base_margin is not None else np.zeros(value.shape[0])
+        self.has_missing = bool(missing_left.any())
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Find the leaf reached in every tree
+
+        Args:
+            X: Feature matrix, shape (rows, features)
+
+        Returns:
+            Global leaf node indices, shape (rows, trees)
+        """
+        # Trees are trained on float32 inputs, so compare in float32 like they do
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        nodes = np.repeat(self.roots[None, :], n_rows, axis=0)
+
+        # take() on 1-D arrays is markedly cheaper than 2-D fancy indexing
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self.feature.take(nodes))
+            go_left = x <= self.threshold.take(nodes)
+            if self.has_missing:
+                # NaN compares False, so missing values follow the node's default branch
+                go_left |= np.isnan(x) & self.missing_left.take(nodes)
+            nodes = self.children.take(nodes * 2 + go_left)
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, shape (rows, classes)"""
+        # Trees along axis 0 are summed one after another, in the same order as sklearn,
+        # so ties between classes break the same way
+        leaves = self.apply(X).T
+        raw = np.column_stack([class_value.take(leaves).sum(axis=0) for class_value in self.value])
+        raw += self.base_margin
+
+        if self.transform == "softmax":
+            raw = np.exp(raw - raw.max(axis=1, keepdims=True))
+            return raw / raw.sum(axis=1, keepdims=True)
+        if self.transform == "sigmoid":
+            # Binary margin lives in the positive-class column
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 1]))
+            return np.column_stack([1.0 - positive, positive])
+        return raw / self.n_trees
+
+    def predict(self, X) -> np.ndarray:
+        """Predicted class labels"""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def to_bytes(self) -> bytes:
+        """Serialize as an uncompressed joblib dump that loads with mmap_mode="r" """
+        import joblib
+        
+        buffer = io.BytesIO()
+        joblib.dump(self, buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_trees(cls, trees: List[Dict[str, np.ndarray]], classes, **kwargs) -> "FlatForest":
+        """
+        Concatenate per-tree node arrays into one forest
+
+        Each tree dict holds feature, threshold, left, right (-1 for leaves),
+        missing_left, value and depth, with node indices local to the tree.
+        """
+        roots, features, thresholds, children, missing, values = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            n_nodes = len(tree["feature"])
+            node_ids = np.arange(offset, offset + n_nodes)
+            is_leaf = tree["left"] < 0
+
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree["feature"]))
+            thresholds.append(np.where(is_leaf, np.inf, tree["threshold"]))
+            children.append(np.column_stack([
+                np.where(is_leaf, node_ids, tree["right"] + offset),
+                np.where(is_leaf, node_ids, tree["left"] + offset)
+            ]).ravel())
+            missing.append(tree["missing_left"])
+            values.append(tree["value"])
+            max_depth = max(max_depth, int(tree["depth"]))
+            offset += n_nodes
+
+        return cls(
+            roots=np.asarray(roots, dtype=np.intp),
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float32),
+            children=np.concatenate(children).astype(np.intp),
+            missing_left=np.concatenate(missing).astype(bool),
+            value=np.ascontiguousarray(np.concatenate(values).T, dtype=np.float64),
+            max_depth=max_depth,
+            classes=np.asarray(classes),
+            **kwargs
+        )
+
+
+def _sklearn_tree_arrays(tree) -> Dict[str, np.ndarray]:
+    """Node arrays of one fitted sklearn classification tree"""
+    tree_ = tree.tree_
+    # Leaf class weights, normalized to probabilities
+    value = tree_.value[:, 0, :].astype(np.float64)
+    totals = value.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+    value = value / totals
+
+    # Thresholds are float64 but inputs are cast to float32; rounding down keeps x <= t exact
+    threshold = tree_.threshold.astype(np.float32)
+    rounded_up = threshold.astype(np.float64) > tree_.threshold
+    threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+
+    missing_go_to_left = getattr(tree_, "missing_go_to_left", None)
+    if missing_go_to_left is None:
+        missing_go_to_left = np.zeros(tree_.node_count, dtype=bool)
+
+    return {
+        "feature": tree_.feature,
+        "threshold": threshold,
+        "left": tree_.children_left,
+        "right": tree_.children_right,
+        "missing_left": np.asarray(missing_go_to_left, dtype=bool),
+        "value": value,
+        "depth": tree_.max_depth
+    }
+
+
+def compile_sklearn(model) -> FlatForest:
+    """Compile a fitted sklearn RandomForest/ExtraTrees or DecisionTree classifier"""
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        estimators = [model]
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise TypeError("Multi-output forests are not supported by the flat engine")
+
+    trees = [_sklearn_tree_arrays(tree) for tree in estimators]
+    return FlatForest.from_trees(trees, model.classes_, transform="mean")
+
+
+def compile_xgboost(model) -> FlatForest:
+    """Compile a fitted XGBClassifier or a multi:softprob / binary:logistic Booster"""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    config = json.loads(booster.save_config())
+    objective = config["learner"]["objective"]["name"]
+    learner_params = config["learner"]["learner_model_param"]
+
+    if objective in ("multi:softprob", "multi:softmax"):
+        n_classes = int(learner_params["num_class"])
+        transform = "softmax"
+        # A shared base margin does not change softmax outputs
+        base_margin = np.zeros(n_classes)
+    elif objective == "binary:logistic":
+        n_classes = 2
+        transform = "sigmoid"
+        base_score = float(learner_params["base_score"])
+        base_margin = np.array([0.0, np.log(base_score / (1.0 - base_score))])
+    else:
+        raise TypeError(f"XGBoost objective {objective} is not supported by the flat engine")
+
+    feature_index = {name: idx for idx, name in enumerate(booster.feature_names or [])}
+    frame = booster.trees_to_dataframe()
+    if "Category" in frame and frame["Category"].notna().any():
+        raise TypeError("Categorical splits are not supported by the flat engine")
+
+    trees = []
+    for tree_id, nodes in frame.groupby("Tree", sort=True):
+        nodes = nodes.sort_values("Node")
+        local = {node_id: idx for idx, node_id in enumerate(nodes["ID"])}
+        is_leaf = (nodes["Feature"] == "Leaf").to_numpy()
+
+        # Features are named after the training columns, or f0, f1, ... without names
+        feature = np.array([
+            0 if leaf else feature_index[name] if feature_index else int(name[1:])
+            for name, leaf in zip(nodes["Feature"], is_leaf)
+        ])
+        left = np.array([-1 if leaf else local[node] for node, leaf in zip(nodes["Yes"], is_leaf)])
+        right = np.array([-1 if leaf else local[node] for node, leaf in zip(nodes["No"], is_leaf)])
+        missing_left = np.array([
+            False if leaf else missing == yes
+            for missing, yes, leaf in zip(nodes["Missing"], nodes["Yes"], is_leaf)
+        ])
+
+        # XGBoost sends x < split left; in float32 that is x <= the next float below split
+        split = np.nan_to_num(nodes["Split"].to_numpy(dtype=np.float64)).astype(np.float32)
+        threshold = np.nextafter(split, np.float32(-np.inf))
+
+        # Leaf margins feed the output of the class this tree was boosted for
+        value = np.zeros((len(nodes), n_classes))
+        column = tree_id % n_classes if transform == "softmax" else 1
+        value[is_leaf, column] = nodes["Gain"].to_numpy(dtype=np.float64)[is_leaf]
+
+        trees.append({
+            "feature": feature,
+            "threshold": threshold,
+            "left": left,
+            "right": right,
+            "missing_left": missing_left,
+            "value": value,
+            "depth": _tree_depth(left, right)
+        })
+
+    classes = getattr(model, "classes_", np.arange(n_classes))
+    return FlatForest.from_trees(trees, classes, transform=transform, base_margin=base_margin)
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Depth of a tree given local child indices, -1 for leaves"""
+    depth = 0
+    level = [0]
+    while True:
+        children = [child for node in level for child in (left[node], right[node]) if child >= 0]
+        if not children:
+            return depth
+        depth += 1
+        level = children
+
+
+def compile_model(model) -> FlatForest:
+    """
+    Compile a fitted tree ensemble into a FlatForest
+
+    Raises:
+        TypeError: If the model type is not supported
+    """
+    if isinstance(model, FlatForest):
+        return model
+
+    module = type(model).__module__
+    if module.startswith("sklearn") and hasattr(model, "classes_"):
+        if hasattr(model, "tree_") or all(hasattr(tree, "tree_") for tree in getattr(model, "estimators_", [])):
+            return compile_sklearn(model)
+    if module.startswith("xgboost"):
+        return compile_xgboost(model)
+    raise TypeError(f"{type(model).__name__} is not supported by the flat engine")
+
+
+def check_parity(model, flat: FlatForest, X, atol: float = 1e-6) -> Dict[str, Any]:
+    """Compare flat-engine probabilities and labels with the original model"""
+    expected = model.predict_proba(X)
+    actual = flat.predict_proba(X)
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    return {
+        "rows": len(X),
+        "max_abs_diff": max_abs_diff,
+        "label_agreement": float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1))),
+        "within_tolerance": max_abs_diff <= atol
+    }
+
+
+def benchmark(model, flat: FlatForest, X, batch_sizes=(1, 10, 50, 1000), repeats: int = 50) -> Dict[str, Any]:
+    """Mean predict_proba latency in milliseconds of both engines per batch size"""
+    results = {}
+    for batch_size in batch_sizes:
+        batch = X[:batch_size]
+        timings = {}
+        for name, engine in (("sklearn", model), ("flat", flat)):
+            engine.predict_proba(batch)
+            started = time.perf_counter()
+            for _ in range(repeats):
+                engine.predict_proba(batch)
+            timings[name] = round((time.perf_counter() - started) / repeats * 1000, 4)
+        timings["speedup"] = round(timings["sklearn"] / timings["flat"], 2)
+        results[batch_size] = timings
+    return results
+
+
+if __name__ == "__main__":
+    # Parity check and benchmark against a forest shaped like the production model
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(42)
+    X = np.column_stack([
+        rng.integers(0, 3, 5000),
+        rng.integers(0, 4, 5000),
+        rng.integers(0, 4, 5000),
+        rng.integers(0, 3, 5000),
+        rng.gamma(2.0, 60.0, 5000),
+        rng.integers(1, 20, 5000),
+        rng.integers(0, 30, 5000),
+        rng.integers(0, 50, 5000)
+    ]).astype(np.float64)
+    y = np.digitize(X[:, 4] * 0.34 + X[:, 5] * 0.18 + rng.normal(0, 10, 5000), [75, 200])
+
+    model = RandomForestClassifier(n_estimators=100, max_depth=12, random_state=42).fit(X[:4000], y[:4000])
+    flat = compile_model(model)
+
+    print(json.dumps({
+        "trees": flat.n_trees,
+        "nodes": flat.n_nodes,
+        "max_depth": flat.max_depth,
+        "parity": check_parity(model, flat, X[4000:]),
+        "latency_ms": benchmark(model, flat, X[4000:])
+    }, indent=2))
@@ -0,0 +1,163 @@
+"""
+Startup Warm-up for Retail Price Sensitivity Prediction
+Pays first-call costs before the pod is marked ready and pre-fills the prediction cache
+"""
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+
+logger = logging.getLogger(__name__)
+
+# Value outside every vocabulary, so the unknown-code path is exercised too
+UNSEEN_VALUE = "__warmup__"
+
+# Snapshot rows scored per prefill call
+PREFILL_CHUNK_SIZE = 1000
+
+
+def warmup_rows(encoder: FeatureEncoder, n_rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Synthetic requests covering every known category value and an unseen one
+
+    Args:
+        encoder: Encoder whose vocabularies the rows should cover
+        n_rows: Number of rows
+        seed: Seed for the numeric features
+    """
+    rng = np.random.default_rng(seed)
+    values = {
+        name: encoder.vocabularies.get(name, []) + [UNSEEN_VALUE]
+        for name in FeatureEncoder.CATEGORICAL_FEATURES
+    }
+    values["BASKET_SIZE"] = ["S", "M", "L"]
+    values["STORE_FORMAT"] = ["SS", "LS"]
+
+    spend = np.round(rng.gamma(2.0, 60.0, n_rows) + 0.01, 2)
+    quantity = rng.integers(1, 40, n_rows)
+    return [
+        {
+            **{name: choices[idx % len(choices)] for name, choices in values.items()},
+            "SPEND": float(spend[idx]),
+            "QUANTITY": int(quantity[idx])
+        }
+        for idx in range(n_rows)
+    ]
+
+
+def load_snapshot(path: str, max_rows: int, feature_names: List[str]) -> List[Dict[str, Any]]:
+    """
+    Read hot feature rows for cache prefill
+
+    Accepts NDJSON of feature dictionaries (GET /admin/cache/snapshot) or a
+    traffic capture log, whose records carry the request under "body".
+    Rows missing a feature are skipped.
+    """
+    rows = []
+    with open(path) as f:
+        for line in f:
+            if len(rows) >= max_rows:
+                break
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            body = record.get("body", record) if isinstance(record, dict) else None
+            for row in body if isinstance(body, list) else [body]:
+                if isinstance(row, dict) and all(name in row for name in feature_names):
+                    rows.append({name: row[name] for name in feature_names})
+    return rows[:max_rows]
+
+
+class Warmup:
+    """Warm-up state behind /ready
+
+    Not ready until run() finishes. A failed synthetic batch keeps the pod
+    out of rotation; a missing or unreadable snapshot only skips the prefill.
+    """
+
+    def __init__(self, enabled: bool = True, batch_size: int = 256, rounds: int = 3,
+                 snapshot_path: Optional[str] = None, snapshot_max_rows: int = 10000):
+        """
+        Args:
+            enabled: Without warm-up the server is ready as soon as it starts
+            batch_size: Rows in the synthetic batch
+            rounds: Times the synthetic batch is scored; the first one is the cold call
+            snapshot_path: Hot-key snapshot used to pre-fill the prediction cache
+            snapshot_max_rows: Most snapshot rows scored
+        """
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.rounds = max(rounds, 1)
+        self.snapshot_path = snapshot_path
+        self.snapshot_max_rows = snapshot_max_rows
+
+        self.ready = not enabled
+        self.error: Optional[str] = None
+        self.report: Dict[str, Any] = {}
+
+    async def run(self, inference_executor, prediction_service):
+        """
+        Score the synthetic batch on every pool worker, then pre-fill the cache
+
+        Args:
+            inference_executor: Started InferenceExecutor
+            prediction_service: Service providing the model snapshot and feature names
+        """
+        if not self.enabled:
+            return
+        started = time.perf_counter()
+        try:
+            encoder = prediction_service.model_loader.get_snapshot().encoder
+            rows = warmup_rows(encoder, self.batch_size)
+
+            # Per-round wall time; each round keeps every worker busy once
+            rounds_ms = []
+            for _ in range(self.rounds):
+                round_started = time.perf_counter()
+                await inference_executor.warm_up(rows)
+                rounds_ms.append(round((time.perf_counter() - round_started) * 1000, 3))
+
+            prefilled = await self._prefill(inference_executor, prediction_service.FEATURE_NAMES)
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Warm-up failed, staying not ready: {str(e)}")
+            return
+
+        self.report = {
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "batch_size": self.batch_size,
+            "rounds_ms": rounds_ms,
+            "first_inference_ms": rounds_ms[0],
+            "steady_inference_ms": min(rounds_ms),
+            "prefilled_rows": prefilled
+        }
+        self.ready = True
+        logger.info(
+            f"Warm-up finished in {self.report['duration_ms']:.0f}ms "
+            f"(first batch {rounds_ms[0]:.1f}ms, steady {min(rounds_ms):.1f}ms, {prefilled} rows prefilled)"
+        )
+
+    async def _prefill(self, inference_executor, feature_names: List[str]) -> int:
+        """Score the snapshot rows through the normal path so they land in the caches"""
+        if not self.snapshot_path:
+            return 0
+        try:
+            rows = load_snapshot(self.snapshot_path, self.snapshot_max_rows, feature_names)
+        except OSError as e:
+            logger.warning(f"Cache prefill skipped, cannot read {self.snapshot_path}: {str(e)}")
+            return 0
+
+        for start in range(0, len(rows), PREFILL_CHUNK_SIZE):
+            await inference_executor.predict_many(rows[start:start + PREFILL_CHUNK_SIZE])
+        return len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get warm-up status and timings"""
+        return {"enabled": self.enabled, "ready": self.ready, "error": self.error, **self.report}